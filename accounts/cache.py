@@ -0,0 +1,123 @@
+import hashlib
+import json
+import threading
+import time
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+
+from .models import EngineeringSpecialization
+
+VERSION_KEY = 'accounts:specializations:version'
+# How often a process re-reads the shared version to notice changes made by
+# other processes. Changes made in this process invalidate immediately.
+VERSION_CHECK_SECONDS = 5
+
+
+class SpecializationCache:
+    """Process-wide copy of the EngineeringSpecialization table.
+
+    The table is small and effectively static, so every process keeps all rows
+    in memory, indexed by id and code, together with their serialized form and
+    an ETag. A version number in the shared Django cache is bumped whenever a
+    row is saved or deleted; each process reloads when it sees a new version.
+    A lookup that misses checks the database once, so a row another process
+    has just created is found before this process's next version check.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked_at = 0.0
+        self._rows = []
+        self._by_id = {}
+        self._by_code = {}
+        self._data = {}
+        self._etag = None
+
+    def invalidate(self):
+        with self._lock:
+            self._version = None
+        cache.add(VERSION_KEY, 0, None)
+        try:
+            cache.incr(VERSION_KEY)
+        except ValueError:
+            # Evicted between add() and incr(); any fresh value forces a reload.
+            cache.set(VERSION_KEY, time.time_ns(), None)
+
+    def _ensure_loaded(self):
+        now = time.monotonic()
+        if self._version is not None and now - self._checked_at < VERSION_CHECK_SECONDS:
+            return
+        version = cache.get(VERSION_KEY)
+        if version is None:
+            cache.add(VERSION_KEY, 0, None)
+            version = cache.get(VERSION_KEY, 0)
+        if version != self._version:
+            self._load(version)
+        self._checked_at = now
+
+    def _load(self, version):
+        from .serializers import EngineeringSpecializationSerializer
+
+        rows = list(EngineeringSpecialization.objects.all())
+        data = EngineeringSpecializationSerializer(rows, many=True).data
+        digest = hashlib.md5(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+        with self._lock:
+            self._rows = rows
+            self._by_id = {str(row.id): row for row in rows}
+            self._by_code = {row.code: row for row in rows}
+            self._data = {str(item['id']): dict(item) for item in data}
+            self._etag = f'"{digest}"'
+            self._version = version
+
+    def _reload_if_exists(self, **lookup):
+        try:
+            exists = EngineeringSpecialization.objects.filter(**lookup).exists()
+        except (ValueError, ValidationError):
+            return False
+        if exists:
+            self._load(cache.get(VERSION_KEY, 0))
+        return exists
+
+    def all(self):
+        self._ensure_loaded()
+        return list(self._rows)
+
+    def get(self, pk):
+        if pk is None:
+            return None
+        self._ensure_loaded()
+        row = self._by_id.get(str(pk))
+        if row is None and self._reload_if_exists(pk=pk):
+            row = self._by_id.get(str(pk))
+        return row
+
+    def get_by_code(self, code):
+        self._ensure_loaded()
+        row = self._by_code.get(code)
+        if row is None and self._reload_if_exists(code=code):
+            row = self._by_code.get(code)
+        return row
+
+    def data(self, pk):
+        """Serialized form of one specialization, as EngineeringSpecializationSerializer renders it."""
+        if pk is None:
+            return None
+        self._ensure_loaded()
+        item = self._data.get(str(pk))
+        if item is None and self._reload_if_exists(pk=pk):
+            item = self._data.get(str(pk))
+        return dict(item) if item is not None else None
+
+    def data_list(self):
+        self._ensure_loaded()
+        return [dict(self._data[str(row.id)]) for row in self._rows]
+
+    @property
+    def etag(self):
+        self._ensure_loaded()
+        return self._etag
+
+
+specialization_cache = SpecializationCache()
@@ -2,6 +2,8 @@
 from rest_framework import serializers
 from django.contrib.auth.password_validation import validate_password
 from django.contrib.auth import get_user_model, authenticate
+from drf_spectacular.utils import extend_schema_field
+from .cache import specialization_cache
 from .models import CustomUser, EngineeringSpecialization
 
 class EngineeringSpecializationSerializer(serializers.ModelSerializer):
@@ -9,8 +11,29 @@ class EngineeringSpecializationSerializer(serializers.ModelSerializer):
         model = EngineeringSpecialization
         fields = ('id', 'name', 'code', 'description')
 
+@extend_schema_field(EngineeringSpecializationSerializer)
+class CachedSpecializationField(serializers.Field):
+    """Read-only nested specialization rendered from the process cache, so the FK is never loaded."""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('source', 'specialization_id')
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return specialization_cache.data(value)
+
+class CachedSpecializationRelatedField(serializers.PrimaryKeyRelatedField):
+    """Writable specialization id validated against the process cache instead of the database."""
+
+    def to_internal_value(self, data):
+        specialization = specialization_cache.get(data)
+        if specialization is None:
+            self.fail('does_not_exist', pk_value=data)
+        return specialization
+
 class CustomUserSerializer(serializers.ModelSerializer):
-    specialization = EngineeringSpecializationSerializer(read_only=True)
+    specialization = CachedSpecializationField()
 
     class Meta:
         model = CustomUser
@@ -20,7 +43,7 @@ class CustomUserSerializer(serializers.ModelSerializer):
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True, validators=[validate_password])
     password2 = serializers.CharField(write_only=True, required=True)
-    specialization = serializers.PrimaryKeyRelatedField(
+    specialization = CachedSpecializationRelatedField(
         queryset=EngineeringSpecialization.objects.all(),
         required=False,
         allow_null=True
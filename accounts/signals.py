@@ -0,0 +1,14 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import specialization_cache
+from .models import EngineeringSpecialization
+
+
+@receiver(post_save, sender=EngineeringSpecialization)
+@receiver(post_delete, sender=EngineeringSpecialization)
+def invalidate_specialization_cache(sender, **kwargs):
+    # Until the write commits, other processes would reload the old rows
+    # under the new version and keep them.
+    transaction.on_commit(specialization_cache.invalidate)
@@ -1,3 +1,88 @@
 from django.test import TestCase
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from rest_framework import status
+from .cache import specialization_cache
+from .models import EngineeringSpecialization
 
-# Create your tests here.
+User = get_user_model()
+
+
+class AccountQueryBudgetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.specs = [
+            EngineeringSpecialization.objects.create(name=f'Specialization {i}', code=f'S{i}')
+            for i in range(17)
+        ]
+        self.user = User.objects.create_user(
+            email='student@test.com', password='password', role='student', specialization=self.specs[0]
+        )
+        # Test transactions never commit, so announce the new rows by hand.
+        specialization_cache.invalidate()
+        specialization_cache.all()
+
+    def test_specialization_list_budget(self):
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/accounts/specializations/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 17)
+
+    def test_profile_budget(self):
+        # Authentication hands the view a freshly loaded user, as JWTAuthentication does.
+        self.client.force_authenticate(user=User.objects.get(pk=self.user.pk))
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/accounts/profile/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['specialization']['code'], 'S0')
+
+
+class SpecializationCacheTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.spec = EngineeringSpecialization.objects.create(name='Mining Engineering', code='MN')
+
+    def test_conditional_get_returns_304_until_a_row_changes(self):
+        response = self.client.get('/api/accounts/specializations/')
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/accounts/specializations/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.spec.description = 'Mining operations and resources'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.spec.save()
+        response = self.client.get('/api/accounts/specializations/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['results'][0]['description'], 'Mining operations and resources')
+
+    def test_lookup_by_id_and_code_follows_deletes(self):
+        self.assertEqual(specialization_cache.get(self.spec.id), self.spec)
+        self.assertEqual(specialization_cache.get_by_code('MN'), self.spec)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.spec.delete()
+        self.assertIsNone(specialization_cache.get_by_code('MN'))
+
+    def test_invalidates_on_commit_and_finds_rows_created_elsewhere(self):
+        etag = specialization_cache.etag
+        with self.captureOnCommitCallbacks() as callbacks:
+            created = EngineeringSpecialization.objects.create(name='Petroleum Engineering', code='PE')
+        # Nothing is announced before the commit ...
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(specialization_cache.etag, etag)
+        # ... but a miss is checked against the database, as for a row another process created.
+        self.assertEqual(specialization_cache.get(created.id), created)
+        self.assertEqual(specialization_cache.data(created.id)['code'], 'PE')
+        self.assertIsNone(specialization_cache.get('not-a-uuid'))
+
+    def test_registration_validates_specialization_from_cache(self):
+        specialization_cache.all()
+        response = self.client.post('/api/accounts/register/', {
+            'email': 'new@test.com', 'first_name': 'New', 'last_name': 'Student',
+            'password': 'x7!Kq92vLm', 'password2': 'x7!Kq92vLm',
+            'role': 'student', 'specialization': str(self.spec.id),
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['user']['specialization']['code'], 'MN')
+        self.assertEqual(User.objects.get(email='new@test.com').specialization_id, self.spec.id)
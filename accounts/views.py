@@ -1,10 +1,12 @@
 
+from django.utils.cache import get_conditional_response
 from rest_framework import generics, permissions
 from rest_framework.response import Response
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.tokens import RefreshToken
 from .serializers import CustomUserSerializer, UserRegistrationSerializer, EngineeringSpecializationSerializer
 from .models import CustomUser, EngineeringSpecialization
+from .cache import specialization_cache
 
 class UserRegisterView(generics.CreateAPIView):
     queryset = CustomUser.objects.all()
@@ -34,3 +36,14 @@ class SpecializationListView(generics.ListAPIView):
     queryset = EngineeringSpecialization.objects.all()
     serializer_class = EngineeringSpecializationSerializer
     permission_classes = (permissions.AllowAny,)
+
+    def list(self, request, *args, **kwargs):
+        # Served from the process cache; clients revalidate with If-None-Match.
+        etag = specialization_cache.etag
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+        page = self.paginate_queryset(specialization_cache.data_list())
+        response = self.get_paginated_response(page)
+        response['ETag'] = etag
+        return response
@@ -11,6 +11,7 @@ class QuestionAdmin(admin.ModelAdmin):
     list_display = ('question_text', 'exam', 'question_type', 'points', 'order_index')
     list_filter = ('question_type', 'exam__specialization')
     search_fields = ('question_text', 'exam__title')
+    raw_id_fields = ('source',)
     inlines = [QuestionOptionInline]
 
 @admin.register(Exam)
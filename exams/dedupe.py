@@ -0,0 +1,132 @@
+"""
+Near-duplicate detection for the question library with MinHash and LSH.
+
+Each question is reduced to a set of word shingles over its normalized text
+and option texts. Digits are masked and options are sorted, so questions that
+differ only in their numbers or in option order share most shingles. A MinHash
+signature of ``NUM_PERM`` values estimates the Jaccard similarity of two
+shingle sets as the fraction of positions where the signatures agree.
+
+Locality-sensitive hashing splits every signature into ``BANDS`` bands. Two
+questions become candidates when any band matches exactly, which happens with
+high probability above roughly ``(1 / BANDS) ** (1 / rows)`` similarity (about
+0.7 with the defaults). Bucketing is done with one sort per band, so the cost
+grows with the number of questions rather than the number of pairs. Each
+bucket is checked as a star around its first member, never pairwise.
+Candidates at or above ``threshold`` are merged into clusters.
+"""
+import hashlib
+import re
+import zlib
+
+import numpy as np
+
+NUM_PERM = 128
+BANDS = 16
+SHINGLE_SIZE = 3
+DEFAULT_THRESHOLD = 0.8
+
+# The smallest prime above 2**32; with multipliers below 2**31 the products
+# stay inside uint64.
+_PRIME = np.uint64(4294967311)
+_rng = np.random.default_rng(20240501)
+_A = _rng.integers(1, 2 ** 31, NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, 2 ** 31, NUM_PERM, dtype=np.uint64)
+
+_DIGITS = re.compile(r'\d+(?:[.,]\d+)*')
+_NON_WORD = re.compile(r'[^\w#]+', re.UNICODE)
+
+
+def normalize(question_text, option_texts=()):
+    parts = [question_text or ''] + sorted(text or '' for text in option_texts)
+    text = ' '.join(parts).lower()
+    text = _DIGITS.sub('#', text)
+    return _NON_WORD.sub(' ', text).split()
+
+
+def shingles(words):
+    if len(words) < SHINGLE_SIZE:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def text_digest(words):
+    return hashlib.md5(' '.join(words).encode()).hexdigest()
+
+
+def signature(words):
+    """MinHash signature as ``NUM_PERM`` uint32 values."""
+    tokens = shingles(words)
+    if not tokens:
+        return np.full(NUM_PERM, 0xFFFFFFFF, dtype=np.uint32)
+    hashes = np.fromiter((zlib.crc32(token.encode()) for token in tokens), dtype=np.uint64, count=len(tokens))
+    permuted = (_A[:, None] * hashes[None, :] + _B[:, None]) % _PRIME
+    return (permuted.min(axis=1) & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+
+
+def to_bytes(sig):
+    return sig.astype('<u4').tobytes()
+
+
+def from_bytes(data):
+    return np.frombuffer(bytes(data), dtype='<u4')
+
+
+class _DisjointSet:
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+    def find(self, i):
+        root = i
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[i] != root:
+            self.parent[i], i = root, self.parent[i]
+        return root
+
+    def union(self, i, j):
+        ri, rj = self.find(i), self.find(j)
+        if ri != rj:
+            self.parent[max(ri, rj)] = min(ri, rj)
+
+
+def _groups(keys):
+    """Yield arrays of row indexes sharing a key, for groups of two or more."""
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    starts = np.flatnonzero(np.concatenate(([True], sorted_keys[1:] != sorted_keys[:-1])))
+    ends = np.append(starts[1:], len(keys))
+    for start, end in zip(starts[ends - starts > 1], ends[ends - starts > 1]):
+        yield order[start:end]
+
+
+def clusters(signatures, threshold=DEFAULT_THRESHOLD, bands=BANDS):
+    """Group rows of an ``(n, NUM_PERM)`` signature matrix into near-duplicate clusters.
+
+    Returns ``[(members, similarities), ...]`` for clusters of two or more,
+    where ``members`` are row indexes with the representative first and
+    ``similarities`` are each member's estimated Jaccard similarity to it.
+    """
+    count = len(signatures)
+    if count < 2:
+        return []
+    rows = signatures.shape[1] // bands
+    # Folds a band into one uint64 (wrapping); a rare collision only adds a
+    # candidate, which the similarity check then rejects.
+    mix = np.random.default_rng(rows).integers(1, 2 ** 63, rows, dtype=np.uint64) | np.uint64(1)
+    sets = _DisjointSet(count)
+    for band in range(bands):
+        block = signatures[:, band * rows:(band + 1) * rows].astype(np.uint64)
+        for bucket in _groups((block * mix).sum(axis=1)):
+            head = bucket[0]
+            agreement = (signatures[bucket[1:]] == signatures[head]).mean(axis=1)
+            for member in bucket[1:][agreement >= threshold]:
+                sets.union(int(head), int(member))
+
+    roots = np.fromiter((sets.find(i) for i in range(count)), dtype=np.int64, count=count)
+    result = []
+    for members in _groups(roots):
+        head = members[0]
+        similarity = (signatures[members] == signatures[head]).mean(axis=1)
+        result.append((members.tolist(), similarity.tolist()))
+    return result
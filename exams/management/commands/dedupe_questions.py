@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from exams import dedupe
+from exams.services import QuestionDedupeService
+
+
+class Command(BaseCommand):
+    help = (
+        'Refresh MinHash signatures for new and edited questions, then regroup the library into '
+        'near-duplicate clusters (served by /api/questions/duplicates/).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threshold', type=float, default=dedupe.DEFAULT_THRESHOLD,
+            help='Minimum estimated Jaccard similarity to the cluster representative.',
+        )
+        parser.add_argument('--batch-size', type=int, default=2000, help='Questions per signature batch.')
+        parser.add_argument('--signatures-only', action='store_true', help='Refresh signatures without reclustering.')
+
+    def handle(self, *args, **options):
+        if not 0 < options['threshold'] <= 1:
+            raise CommandError('--threshold must be in (0, 1].')
+        started = time.perf_counter()
+        refreshed = QuestionDedupeService.refresh_signatures(options['batch_size'])
+        self.stdout.write(f'Signatures refreshed: {refreshed} ({time.perf_counter() - started:.1f}s)')
+        if options['signatures_only']:
+            return
+
+        started = time.perf_counter()
+        clusters, questions = QuestionDedupeService.assign_clusters(options['threshold'], options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{clusters} near-duplicate clusters covering {questions} questions ({time.perf_counter() - started:.1f}s)'
+        ))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from exams.models import Exam
+from exams.services import ExamPrewarmService
+
+
+class Command(BaseCommand):
+    help = (
+        'Cache the row and papers of exams about to start, so the '
+        'start_exam spike is served from cache. Schedule it every few minutes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('exam_ids', nargs='*', help='Exams to pre-warm now, whatever their schedule.')
+        parser.add_argument('--minutes', type=int, default=15,
+                            help='Pre-warm template exams scheduled to start within this many minutes.')
+
+    def handle(self, *args, **options):
+        if options['exam_ids']:
+            exams = Exam.objects.filter(id__in=options['exam_ids'])
+        else:
+            exams = ExamPrewarmService.due(options['minutes'])
+        for exam_id, title in exams.values_list('id', 'title'):
+            ExamPrewarmService.prewarm(exam_id)
+            self.stdout.write(f'{title}: pre-warmed.')
+        self.stdout.write(self.style.SUCCESS('Pre-warm complete.'))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from exams.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the SQLite full-text index over questions from exams_question. migrate already '
+        'does this when a migration dropped its triggers; PostgreSQL keeps its index itself.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Database alias to rebuild.')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'sqlite':
+            self.stdout.write(f'Nothing to do on {connection.vendor}.')
+            return
+        rebuild_index(connection)
+        self.stdout.write(self.style.SUCCESS('Question search index rebuilt.'))
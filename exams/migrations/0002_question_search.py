@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+def create_index(apps, schema_editor):
+    from exams.search import create_index
+    create_index(schema_editor.connection)
+
+
+def drop_index(apps, schema_editor):
+    from exams.search import drop_index
+    drop_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
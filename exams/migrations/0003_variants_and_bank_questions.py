@@ -0,0 +1,24 @@
+# Generated by Django 5.0 on 2026-10-19 17:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0002_question_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exam',
+            name='parent',
+            field=models.ForeignKey(blank=True, help_text='Template exam this per-student variant was generated from.', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='variants', to='exams.exam'),
+        ),
+        migrations.AddField(
+            model_name='questionbank',
+            name='questions',
+            field=models.ManyToManyField(blank=True, related_name='banks', to='exams.question'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.0 on 2026-10-19 17:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0003_variants_and_bank_questions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionSignature',
+            fields=[
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='signature', serialize=False, to='exams.question')),
+                ('digest', models.CharField(help_text='MD5 of the normalized text the signature was built from.', max_length=32)),
+                ('minhash', models.BinaryField()),
+                ('cluster', models.UUIDField(blank=True, db_index=True, help_text='Representative question of the near-duplicate cluster.', null=True)),
+                ('similarity', models.FloatField(blank=True, help_text='Estimated Jaccard similarity to the representative.', null=True)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
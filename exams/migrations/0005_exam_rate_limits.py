@@ -0,0 +1,23 @@
+# Generated by Django 5.0 on 2026-10-19 17:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0004_question_signature'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exam',
+            name='activity_rate_limit',
+            field=models.PositiveIntegerField(blank=True, help_text='Proctoring events per minute per attempt; blank uses ACTIVITY_RATE_PER_MINUTE, 0 disables.', null=True),
+        ),
+        migrations.AddField(
+            model_name='exam',
+            name='answer_rate_limit',
+            field=models.PositiveIntegerField(blank=True, help_text='Answer saves per minute per attempt; blank uses ANSWER_RATE_PER_MINUTE, 0 disables.', null=True),
+        ),
+    ]
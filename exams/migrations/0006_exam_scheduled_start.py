@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-19 18:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0005_exam_rate_limits'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exam',
+            name='scheduled_start',
+            field=models.DateTimeField(blank=True, db_index=True, help_text='When students are expected to start; used to pre-warm caches.', null=True),
+        ),
+    ]
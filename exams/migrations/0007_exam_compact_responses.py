@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-19 18:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0006_exam_scheduled_start'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exam',
+            name='compact_responses',
+            field=models.BooleanField(default=False, help_text='Keep in-progress answers in one document per attempt; rows are written at submit.'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.0 on 2026-10-19 18:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('exams', '0007_exam_compact_responses'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='exam',
+            name='exams_exam_instruc_0a0350_idx',
+        ),
+        migrations.AddIndex(
+            model_name='exam',
+            index=models.Index(fields=['instructor', '-created_at'], name='exams_exam_instruc_b8dcd0_idx'),
+        ),
+    ]
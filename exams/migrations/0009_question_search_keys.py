@@ -0,0 +1,18 @@
+from django.db import migrations
+
+
+def rebuild_index(apps, schema_editor):
+    from exams.search import rebuild_index
+    rebuild_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+    """Key the SQLite search index on question ids instead of exams_question's rowid."""
+
+    dependencies = [
+        ('exams', '0008_hot_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_index, rebuild_index),
+    ]
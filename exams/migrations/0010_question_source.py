@@ -0,0 +1,19 @@
+# Generated by Django 5.0 on 2026-10-19 18:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0009_question_search_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='source',
+            field=models.ForeignKey(blank=True, help_text='Bank question this was copied from when a variant was generated.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='copies', to='exams.question'),
+        ),
+    ]
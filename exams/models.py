@@ -1,7 +1,9 @@
 
 import uuid
 from django.db import models
+from django.db.models import F
 from django.conf import settings
+from django.utils import timezone
 from accounts.models import EngineeringSpecialization
 
 class Exam(models.Model):
@@ -21,20 +23,45 @@ class Exam(models.Model):
     enable_proctoring = models.BooleanField(default=False)
     enable_camera = models.BooleanField(default=False)
     browser_lockdown = models.BooleanField(default=False)
+    answer_rate_limit = models.PositiveIntegerField(
+        null=True, blank=True, help_text="Answer saves per minute per attempt; blank uses ANSWER_RATE_PER_MINUTE, 0 disables.",
+    )
+    activity_rate_limit = models.PositiveIntegerField(
+        null=True, blank=True,
+        help_text="Proctoring events per minute per attempt; blank uses ACTIVITY_RATE_PER_MINUTE, 0 disables.",
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     version = models.IntegerField(default=1)
+    parent = models.ForeignKey(
+        'self', on_delete=models.CASCADE, null=True, blank=True, related_name='variants',
+        help_text="Template exam this per-student variant was generated from.",
+    )
+    compact_responses = models.BooleanField(
+        default=False,
+        help_text="Keep in-progress answers in one document per attempt; rows are written at submit.",
+    )
+    scheduled_start = models.DateTimeField(
+        null=True, blank=True, db_index=True, help_text="When students are expected to start; used to pre-warm caches.",
+    )
 
     class Meta:
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['instructor']),
+            models.Index(fields=['instructor', '-created_at']),
             models.Index(fields=['specialization']),
         ]
 
     def __str__(self):
         return self.title
 
+    def bump_version(self):
+        """Mark the paper as changed; cached copies and ETags are keyed on version."""
+        from .services import ExamPrewarmService
+
+        Exam.objects.filter(pk=self.pk).update(version=F('version') + 1, updated_at=timezone.now())
+        ExamPrewarmService.forget(self.pk)
+
 class Question(models.Model):
     class QuestionType(models.TextChoices):
         MULTIPLE_CHOICE = 'multiple_choice', 'Multiple Choice'
@@ -51,6 +78,10 @@ class Question(models.Model):
     image_url = models.URLField(blank=True)
     order_index = models.IntegerField()
     is_required = models.BooleanField(default=True)
+    source = models.ForeignKey(
+        'self', on_delete=models.SET_NULL, null=True, blank=True, related_name='copies',
+        help_text="Bank question this was copied from when a variant was generated.",
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -92,8 +123,21 @@ class QuestionBank(models.Model):
     description = models.TextField(blank=True)
     topic = models.CharField(max_length=100, blank=True)
     difficulty_level = models.CharField(max_length=10, choices=Difficulty.choices, blank=True)
+    questions = models.ManyToManyField(Question, related_name='banks', blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
+
+class QuestionSignature(models.Model):
+    """MinHash signature of a library question, kept by the dedupe indexer."""
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, primary_key=True, related_name='signature')
+    digest = models.CharField(max_length=32, help_text="MD5 of the normalized text the signature was built from.")
+    minhash = models.BinaryField()
+    cluster = models.UUIDField(null=True, blank=True, db_index=True, help_text="Representative question of the near-duplicate cluster.")
+    similarity = models.FloatField(null=True, blank=True, help_text="Estimated Jaccard similarity to the representative.")
+    computed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Signature of {self.question_id}"
@@ -0,0 +1,175 @@
+"""
+Full-text search over the question library.
+
+The index is kept by the database itself, so every write path (the API,
+bulk_create in fixtures and generate_dataset, the admin) stays searchable
+without application hooks:
+
+* SQLite: ``exams_question_fts``, a standalone FTS5 table kept in step by
+  insert/update/delete triggers on ``exams_question``. Questions have UUID
+  keys, so ``exams_question_fts_keys`` gives each one an ``INTEGER PRIMARY
+  KEY`` that serves as its FTS rowid; unlike the implicit rowid of
+  ``exams_question`` it survives ``VACUUM``. A migration that makes SQLite
+  remake ``exams_question`` drops the triggers, so ``ensure_index`` runs after
+  every ``migrate`` and rebuilds the index when any of them is missing.
+* PostgreSQL: a stored generated ``tsvector`` column on ``exams_question``
+  with a GIN index.
+* Anything else falls back to unranked ``icontains`` matching.
+
+The tables are created by migrations ``0002_question_search`` and
+``0009_question_search_keys``.
+"""
+import re
+import uuid
+
+from django.db import connections, router
+from django.db.models import Q
+
+from .models import Question
+
+# Matches beyond this are not ranked or paginated.
+MAX_RESULTS = 1000
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+SQLITE_TABLE = 'exams_question_fts'
+SQLITE_KEYS = 'exams_question_fts_keys'
+SQLITE_TRIGGERS = (f'{SQLITE_TABLE}_ai', f'{SQLITE_TABLE}_ad', f'{SQLITE_TABLE}_au')
+
+# The index rowid of a question, by its id.
+_KEY = f'(SELECT id FROM {SQLITE_KEYS} WHERE question_id = {{}}.id)'
+
+SQLITE_SCHEMA = [
+    f'CREATE TABLE {SQLITE_KEYS} (id INTEGER PRIMARY KEY, question_id char(32) NOT NULL UNIQUE)',
+    f"""CREATE VIRTUAL TABLE {SQLITE_TABLE} USING fts5(
+        question_text, explanation, tokenize='porter unicode61'
+    )""",
+    f"""CREATE TRIGGER {SQLITE_TABLE}_ai AFTER INSERT ON exams_question BEGIN
+        INSERT INTO {SQLITE_KEYS}(question_id) VALUES (new.id);
+        INSERT INTO {SQLITE_TABLE}(rowid, question_text, explanation)
+        VALUES ({_KEY.format('new')}, new.question_text, new.explanation);
+    END""",
+    f"""CREATE TRIGGER {SQLITE_TABLE}_ad AFTER DELETE ON exams_question BEGIN
+        DELETE FROM {SQLITE_TABLE} WHERE rowid = {_KEY.format('old')};
+        DELETE FROM {SQLITE_KEYS} WHERE question_id = old.id;
+    END""",
+    f"""CREATE TRIGGER {SQLITE_TABLE}_au AFTER UPDATE OF question_text, explanation ON exams_question BEGIN
+        UPDATE {SQLITE_TABLE} SET question_text = new.question_text, explanation = new.explanation
+        WHERE rowid = {_KEY.format('new')};
+    END""",
+    f'INSERT INTO {SQLITE_KEYS}(question_id) SELECT id FROM exams_question',
+    f"""INSERT INTO {SQLITE_TABLE}(rowid, question_text, explanation)
+        SELECT k.id, q.question_text, q.explanation
+        FROM exams_question q JOIN {SQLITE_KEYS} k ON k.question_id = q.id""",
+]
+
+SQLITE_DROP = [
+    *(f'DROP TRIGGER IF EXISTS {name}' for name in SQLITE_TRIGGERS),
+    f'DROP TABLE IF EXISTS {SQLITE_TABLE}',
+    f'DROP TABLE IF EXISTS {SQLITE_KEYS}',
+]
+
+POSTGRES_SCHEMA = [
+    """ALTER TABLE exams_question ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(question_text, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(explanation, '')), 'B')
+    ) STORED""",
+    'CREATE INDEX exams_question_search_gin ON exams_question USING GIN (search_vector)',
+]
+
+POSTGRES_DROP = [
+    'DROP INDEX IF EXISTS exams_question_search_gin',
+    'ALTER TABLE exams_question DROP COLUMN IF EXISTS search_vector',
+]
+
+
+def create_index(connection):
+    statements = {'sqlite': SQLITE_SCHEMA, 'postgresql': POSTGRES_SCHEMA}.get(connection.vendor, [])
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def drop_index(connection):
+    statements = {'sqlite': SQLITE_DROP, 'postgresql': POSTGRES_DROP}.get(connection.vendor, [])
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def rebuild_index(connection):
+    """Recreate the SQLite tables and triggers from exams_question; PostgreSQL needs no rebuild."""
+    if connection.vendor == 'sqlite':
+        drop_index(connection)
+        create_index(connection)
+
+
+def ensure_index(using, **kwargs):
+    """``post_migrate`` receiver: rebuild the SQLite index if a migration dropped any part of it."""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT name FROM sqlite_master WHERE name IN (%s, %s, %s, %s, %s, %s)',
+            ['exams_question', SQLITE_TABLE, SQLITE_KEYS, *SQLITE_TRIGGERS],
+        )
+        present = {name for name, in cursor.fetchall()}
+    # Before 0002 (or after migrating exams to zero) there is nothing to index.
+    if 'exams_question' in present and SQLITE_TABLE in present and len(present) < 6:
+        rebuild_index(connection)
+
+
+class QuestionSearch:
+    """Ranks questions matching free text, within an already filtered queryset."""
+
+    @staticmethod
+    def terms(text):
+        return WORD_RE.findall(text or '')
+
+    @staticmethod
+    def search(queryset, text, limit=MAX_RESULTS):
+        """Return ``[(question_id, rank), ...]`` best match first.
+
+        ``queryset`` carries the caller's scoping and filters; it is compiled
+        into the search statement as a subquery so ranking and filtering happen
+        in one round trip.
+        """
+        terms = QuestionSearch.terms(text)
+        if not terms:
+            return []
+        alias = router.db_for_read(Question)
+        connection = connections[alias]
+        subquery, params = queryset.using(alias).order_by().values('pk').query.sql_with_params()
+
+        if connection.vendor == 'sqlite':
+            # Every term must match; the last may be a prefix (search as you type).
+            match = ' AND '.join(f'"{term}"' for term in terms) + '*'
+            sql = (
+                f'SELECT k.question_id, bm25({SQLITE_TABLE}, 10.0, 1.0) AS rank '
+                f'FROM {SQLITE_TABLE} JOIN {SQLITE_KEYS} k ON k.id = {SQLITE_TABLE}.rowid '
+                f'WHERE {SQLITE_TABLE} MATCH %s AND k.question_id IN ({subquery}) '
+                f'ORDER BY rank LIMIT %s'
+            )
+            params = (match, *params, limit)
+        elif connection.vendor == 'postgresql':
+            sql = (
+                'SELECT q.id, ts_rank(q.search_vector, query) AS rank '
+                "FROM exams_question q, websearch_to_tsquery('english', %s) query "
+                f'WHERE q.search_vector @@ query AND q.id IN ({subquery}) '
+                'ORDER BY rank DESC LIMIT %s'
+            )
+            params = (' '.join(terms), *params, limit)
+        else:
+            condition = Q()
+            for term in terms:
+                condition &= Q(question_text__icontains=term) | Q(explanation__icontains=term)
+            return [(pk, None) for pk in queryset.filter(condition).values_list('pk', flat=True)[:limit]]
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        # SQLite hands back UUIDs as hex text; bm25 is lower-is-better, so flip it.
+        if connection.vendor == 'sqlite':
+            return [(uuid.UUID(pk), -rank) for pk, rank in rows]
+        return [(pk, rank) for pk, rank in rows]
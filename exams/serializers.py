@@ -1,8 +1,10 @@
 
 
+from django.db.models import F
 from rest_framework import serializers
 from .models import Exam, Question, QuestionOption, QuestionBank
-from accounts.serializers import EngineeringSpecializationSerializer, CustomUserSerializer
+from accounts.cache import specialization_cache
+from accounts.serializers import CachedSpecializationField, CachedSpecializationRelatedField, CustomUserSerializer
 from accounts.models import EngineeringSpecialization
 
 class QuestionOptionSerializer(serializers.ModelSerializer):
@@ -21,10 +23,14 @@ class QuestionSerializer(serializers.ModelSerializer):
         """Explicitly include options in the serialized output"""
         ret = super().to_representation(instance)
         ret['options'] = QuestionOptionSerializer(instance.options.all(), many=True).data
+        if self.context.get('hide_answers'):
+            ret.pop('explanation', None)
+            for option in ret['options']:
+                option.pop('is_correct', None)
         return ret
 
 class ExamListSerializer(serializers.ModelSerializer):
-    specialization = EngineeringSpecializationSerializer(read_only=True)
+    specialization = CachedSpecializationField()
     instructor = CustomUserSerializer(read_only=True)
     question_count = serializers.SerializerMethodField()
 
@@ -33,11 +39,14 @@ class ExamListSerializer(serializers.ModelSerializer):
         fields = ('id', 'title', 'specialization', 'duration_minutes', 'total_points', 'question_count', 'instructor')
     
     def get_question_count(self, obj):
+        # ExamViewSet annotates the count on list; fall back to a query for bare instances.
+        if hasattr(obj, 'question_count'):
+            return obj.question_count
         return obj.questions.count()
 
 class ExamDetailSerializer(serializers.ModelSerializer):
     questions = QuestionSerializer(many=True, required=False)
-    specialization = serializers.PrimaryKeyRelatedField(
+    specialization = CachedSpecializationRelatedField(
         queryset=EngineeringSpecialization.objects.all()
     )
     instructor = CustomUserSerializer(read_only=True)
@@ -50,10 +59,10 @@ class ExamDetailSerializer(serializers.ModelSerializer):
     def to_representation(self, instance):
         """Use nested serializer for reading"""
         ret = super().to_representation(instance)
-        ret['specialization'] = EngineeringSpecializationSerializer(instance.specialization).data
+        ret['specialization'] = specialization_cache.data(instance.specialization_id)
         ret['instructor'] = CustomUserSerializer(instance.instructor).data
         # Ensure questions are represented with their own serializer logic, including options
-        ret['questions'] = QuestionSerializer(instance.questions.all(), many=True).data
+        ret['questions'] = QuestionSerializer(instance.questions.all(), many=True, context=self.context).data
         return ret
 
     def create(self, validated_data):
@@ -121,14 +130,38 @@ class ExamDetailSerializer(serializers.ModelSerializer):
 
         # Recalculate total points after all updates
         instance.total_points = sum(q.points for q in instance.questions.all())
+        instance.version = F('version') + 1
         instance.save()
+        instance.refresh_from_db(fields=['version', 'updated_at'])
         
         return instance
 
 class QuestionBankSerializer(serializers.ModelSerializer):
-    specialization = EngineeringSpecializationSerializer(read_only=True)
+    specialization = CachedSpecializationField()
     instructor = CustomUserSerializer(read_only=True)
+    question_count = serializers.SerializerMethodField()
 
     class Meta:
         model = QuestionBank
-        fields = '__all__'
+        # Membership can run to thousands of ids; it is managed through the
+        # add_questions/remove_questions actions instead.
+        exclude = ('questions',)
+
+    def get_question_count(self, obj):
+        if hasattr(obj, 'question_count'):
+            return obj.question_count
+        return obj.questions.count()
+
+
+class BlueprintStratumSerializer(serializers.Serializer):
+    topic = serializers.CharField(allow_blank=True, default='')
+    difficulty = serializers.ChoiceField(choices=QuestionBank.Difficulty.choices, allow_blank=True, default='')
+    count = serializers.IntegerField(min_value=1)
+
+
+class VariantGenerationSerializer(serializers.Serializer):
+    blueprint = BlueprintStratumSerializer(many=True, allow_empty=False)
+    bank_ids = serializers.ListField(child=serializers.UUIDField(), required=False)
+    student_ids = serializers.ListField(child=serializers.UUIDField(), required=False)
+    seed = serializers.IntegerField(required=False)
+    background = serializers.BooleanField(default=False)
@@ -0,0 +1,334 @@
+import json
+import random
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from accounts.models import CustomUser
+from mysite.bulk import RowWriter
+
+from . import dedupe
+from .models import Exam, Question, QuestionBank, QuestionOption, QuestionSignature
+
+
+class ExamPaperService:
+    """Serialized exam papers cached per (exam id, version, answer visibility).
+
+    Students and instructors get different payloads (students never see
+    is_correct or explanations), so the visibility is part of the key. Any
+    change to the paper bumps Exam.version, which retires old entries;
+    question and option writes do so from ``exams.signals`` once they commit.
+    """
+
+    @staticmethod
+    def answers_visible(user):
+        return user.is_staff or user.role in (CustomUser.Role.INSTRUCTOR, CustomUser.Role.ADMIN)
+
+    @staticmethod
+    def variant(hide_answers):
+        return 'redacted' if hide_answers else 'full'
+
+    @staticmethod
+    def etag(exam_id, version, hide_answers):
+        return f'"{exam_id}-{version}-{ExamPaperService.variant(hide_answers)}"'
+
+    @staticmethod
+    def cache_key(exam_id, version, hide_answers):
+        return f'exams:paper:{exam_id}:{version}:{ExamPaperService.variant(hide_answers)}'
+
+    @staticmethod
+    def get_paper(exam_id, version, hide_answers, load_exam):
+        """Return the cached paper, building it from load_exam() on a miss."""
+        key = ExamPaperService.cache_key(exam_id, version, hide_answers)
+        data = cache.get(key)
+        if data is None:
+            exam = load_exam()
+            data = ExamPaperService.render(exam, hide_answers)
+            cache.set(ExamPaperService.cache_key(exam.id, exam.version, hide_answers), data,
+                      settings.EXAM_PAPER_CACHE_SECONDS)
+        return data
+
+    @staticmethod
+    def render(exam, hide_answers):
+        from .serializers import ExamDetailSerializer
+
+        serialized = ExamDetailSerializer(exam, context={'hide_answers': hide_answers}).data
+        # Round-trip through JSON so the cache holds plain data, not serializer-bound ReturnDicts.
+        return json.loads(JSONRenderer().render(serialized))
+
+
+class ExamPrewarmService:
+    """Readies an exam for the spike of start_exam calls at its scheduled start.
+
+    ``prewarm`` caches the exam row and both renderings of its paper, so
+    ``ExamAssignmentService.start_exam`` can admit a student and return the
+    paper without reading the exam; the student is the already-loaded request
+    user. Entries live until ``EXAM_PREWARM_SECONDS`` after the scheduled
+    start. Editing the exam drops the cached row.
+    """
+
+    @staticmethod
+    def exam_key(exam_id):
+        return f'exams:start:{exam_id}'
+
+    @staticmethod
+    def cached_exam(exam_id):
+        return cache.get(ExamPrewarmService.exam_key(exam_id))
+
+    @staticmethod
+    def forget(exam_id):
+        cache.delete(ExamPrewarmService.exam_key(exam_id))
+
+    @staticmethod
+    def due(minutes):
+        """Template exams scheduled to start within the next ``minutes``."""
+        now = timezone.now()
+        return Exam.objects.filter(
+            parent__isnull=True, scheduled_start__gte=now, scheduled_start__lte=now + timedelta(minutes=minutes)
+        )
+
+    @staticmethod
+    def prewarm(exam_id):
+        """Cache the exam and its papers."""
+        exam = Exam.objects.prefetch_related('questions__options').get(pk=exam_id)
+        now = timezone.now()
+        start = exam.scheduled_start if exam.scheduled_start and exam.scheduled_start > now else now
+        timeout = int((start - now).total_seconds()) + settings.EXAM_PREWARM_SECONDS
+
+        for hide_answers in (True, False):
+            cache.set(ExamPaperService.cache_key(exam.id, exam.version, hide_answers),
+                      ExamPaperService.render(exam, hide_answers), timeout)
+        row = Exam.objects.get(pk=exam.pk)
+        cache.set(ExamPrewarmService.exam_key(exam.id), row, timeout)
+
+
+class ExamGeneratorService:
+    """Assembles per-student exam variants by stratified sampling from question banks.
+
+    A blueprint is a list of ``((topic, difficulty), count)`` pairs. Bank
+    membership is read once into a tuple of question ids per stratum, so each
+    student's draw is a handful of ``random.sample`` calls with no queries.
+    Variants are child exams of the template (``Exam.parent``) holding copies
+    of the drawn questions, and are written with bulk inserts in chunks of
+    students.
+    """
+
+    # Copied from the template onto every variant; the rest are per-variant.
+    EXAM_SKIP_FIELDS = frozenset({'id', 'parent', 'version', 'total_points', 'created_at', 'updated_at'})
+    QUESTION_COPY_FIELDS = ('question_text', 'question_type', 'points', 'explanation', 'image_url', 'is_required')
+    OPTION_COPY_FIELDS = ('option_text', 'option_image_url', 'is_correct', 'partial_credit_points', 'order_index')
+
+    @staticmethod
+    def build_strata(banks):
+        """Map ``(topic, difficulty)`` to the sorted tuple of member question ids."""
+        strata = defaultdict(set)
+        rows = QuestionBank.questions.through.objects.filter(questionbank__in=banks).values_list(
+            'questionbank__topic', 'questionbank__difficulty_level', 'question_id'
+        )
+        for topic, difficulty, question_id in rows:
+            strata[(topic, difficulty)].add(question_id)
+        # Sorted so a given seed draws the same questions regardless of row order.
+        return {key: tuple(sorted(ids)) for key, ids in strata.items()}
+
+    @staticmethod
+    def check_blueprint(strata, blueprint):
+        for (topic, difficulty), count in blueprint:
+            available = len(strata.get((topic, difficulty), ()))
+            if count > available:
+                raise ValidationError(
+                    f"Stratum {topic or '-'}/{difficulty or '-'} has {available} questions, {count} requested."
+                )
+
+    @staticmethod
+    def sample(strata, blueprint, rng):
+        """Draw question ids for one variant; a question in several strata is used once."""
+        picked = []
+        seen = set()
+        for key, count in blueprint:
+            pool = strata[key]
+            chosen = [question_id for question_id in rng.sample(pool, count) if question_id not in seen]
+            if len(chosen) < count:
+                remaining = [question_id for question_id in pool if question_id not in seen and question_id not in chosen]
+                if len(remaining) < count - len(chosen):
+                    raise ValidationError("Overlapping banks leave too few distinct questions for the blueprint.")
+                chosen += rng.sample(remaining, count - len(chosen))
+            seen.update(chosen)
+            picked.extend(chosen)
+        return picked
+
+    @staticmethod
+    def generate(template, blueprint, banks, students, seed, chunk_size=250):
+        """Create a variant and a NOT_STARTED assignment for each student who lacks one.
+
+        Returns ``(created, skipped)``.
+        """
+        from submissions.models import ExamAssignment
+        from submissions.services import StatisticsService
+
+        strata = ExamGeneratorService.build_strata(banks)
+        ExamGeneratorService.check_blueprint(strata, blueprint)
+
+        wanted = {question_id for key, _ in blueprint for question_id in strata[key]}
+        source = Question.objects.filter(id__in=wanted).prefetch_related('options').in_bulk()
+        existing = set(
+            ExamAssignment.objects.filter(exam__parent=template, student__in=students).values_list('student_id', flat=True)
+        )
+        pending = [student for student in students if student.id not in existing]
+        exam_fields = [
+            field.attname for field in Exam._meta.concrete_fields
+            if field.name not in ExamGeneratorService.EXAM_SKIP_FIELDS
+        ]
+
+        # Questions and options dominate the row count, so they are written as
+        # tuples; everything copied from a source row is adapted once, up front.
+        question_rows = RowWriter(Question, ('id', 'exam', 'order_index', 'created_at', 'updated_at', 'source')
+                                  + ExamGeneratorService.QUESTION_COPY_FIELDS)
+        option_rows = RowWriter(QuestionOption, ('id', 'question', 'created_at')
+                                + ExamGeneratorService.OPTION_COPY_FIELDS)
+        now = timezone.now()
+        question_now = question_rows.prepare('created_at', now)
+        option_now = option_rows.prepare('created_at', now)
+        copied = {
+            question_id: (
+                # Copies point at the original, so answers to one bank question
+                # can be compared across variants.
+                (question_rows.uuid(question.source_id or question.id),)
+                + tuple(question_rows.prepare(name, getattr(question, name))
+                        for name in ExamGeneratorService.QUESTION_COPY_FIELDS),
+                [tuple(option_rows.prepare(name, getattr(option, name))
+                       for name in ExamGeneratorService.OPTION_COPY_FIELDS)
+                 for option in question.options.all()],
+                question.points,
+            )
+            for question_id, question in source.items()
+        }
+
+        with transaction.atomic():
+            for start in range(0, len(pending), chunk_size):
+                exams, assignments, questions, options = [], [], [], []
+                for student in pending[start:start + chunk_size]:
+                    student_seed = f'{seed}:{student.id}'
+                    rng = random.Random(student_seed)
+                    picked = ExamGeneratorService.sample(strata, blueprint, rng)
+                    if template.randomize_questions:
+                        rng.shuffle(picked)
+
+                    exam = Exam(parent=template, **{name: getattr(template, name) for name in exam_fields})
+                    exam_key = question_rows.uuid(exam.id)
+                    total = 0
+                    for index, question_id in enumerate(picked):
+                        question_values, option_values, points = copied[question_id]
+                        question_key = question_rows.uuid(uuid.uuid4())
+                        questions.append((question_key, exam_key, index, question_now, question_now) + question_values)
+                        options.extend(
+                            (option_rows.uuid(uuid.uuid4()), question_key, option_now) + values
+                            for values in option_values
+                        )
+                        total += points
+                    exam.total_points = int(total)
+                    exams.append(exam)
+                    assignments.append(ExamAssignment(
+                        exam=exam, student=student,
+                        status=ExamAssignment.Status.NOT_STARTED,
+                        question_randomization_seed=student_seed,
+                    ))
+
+                Exam.objects.bulk_create(exams)
+                question_rows.write(questions)
+                option_rows.write(options)
+                ExamAssignment.objects.bulk_create(assignments)
+            StatisticsService.record_assigned(template, len(pending))
+
+        return len(pending), len(existing)
+
+    @staticmethod
+    def generate_for(template, blueprint_data, seed, bank_ids=None, student_ids=None):
+        """Resolve banks and students from ids and run ``generate``; returns ``(created, skipped)``.
+
+        Students default to every active student of the template's
+        specialization, banks to the instructor's banks for it. Takes only
+        JSON-friendly arguments, so the same call serves the request and the
+        ``exams.generate_variants`` job.
+        """
+        banks = QuestionBank.objects.filter(instructor_id=template.instructor_id, specialization_id=template.specialization_id)
+        if bank_ids is not None:
+            banks = banks.filter(id__in=bank_ids)
+        students = CustomUser.objects.filter(
+            role=CustomUser.Role.STUDENT, is_active=True, specialization_id=template.specialization_id
+        ).only('id')
+        if student_ids is not None:
+            students = students.filter(id__in=student_ids)
+        blueprint = [((item['topic'], item['difficulty']), item['count']) for item in blueprint_data]
+        return ExamGeneratorService.generate(template, blueprint, banks, list(students), seed)
+
+
+class QuestionDedupeService:
+    """Keeps MinHash signatures current and groups near-duplicate questions.
+
+    Generated variants are copies by design and are left out.
+    """
+
+    @staticmethod
+    def stale_questions():
+        """Library questions with no signature or edited since it was computed.
+
+        Option edits count: ``exams.signals`` touches the question's ``updated_at``.
+        """
+        return Question.objects.filter(exam__parent__isnull=True).filter(
+            Q(signature__isnull=True) | Q(updated_at__gt=F('signature__computed_at'))
+        )
+
+    @staticmethod
+    def refresh_signatures(batch_size=2000):
+        """Compute signatures for new and edited questions; returns how many were written."""
+        written = 0
+        stale = QuestionDedupeService.stale_questions().order_by('pk').prefetch_related('options')
+        last = None
+        while True:
+            batch = list((stale if last is None else stale.filter(pk__gt=last))[:batch_size])
+            if not batch:
+                return written
+            last = batch[-1].pk
+            rows = []
+            for question in batch:
+                words = dedupe.normalize(question.question_text, [o.option_text for o in question.options.all()])
+                rows.append(QuestionSignature(
+                    question=question,
+                    digest=dedupe.text_digest(words),
+                    minhash=dedupe.to_bytes(dedupe.signature(words)),
+                ))
+            QuestionSignature.objects.bulk_create(
+                rows, update_conflicts=True, unique_fields=['question'],
+                update_fields=['digest', 'minhash', 'computed_at'],
+            )
+            written += len(rows)
+
+    @staticmethod
+    def assign_clusters(threshold=dedupe.DEFAULT_THRESHOLD, batch_size=2000):
+        """Recluster every signature; returns ``(clusters, questions in clusters)``."""
+        ids, blobs = [], []
+        for question_id, minhash in QuestionSignature.objects.values_list('question_id', 'minhash').iterator(chunk_size=10000):
+            ids.append(question_id)
+            blobs.append(bytes(minhash))
+        if not ids:
+            return 0, 0
+        matrix = dedupe.from_bytes(b''.join(blobs)).reshape(len(ids), dedupe.NUM_PERM)
+        found = dedupe.clusters(matrix, threshold)
+
+        updates = [
+            QuestionSignature(question_id=ids[index], cluster=ids[members[0]], similarity=similarity)
+            for members, similarities in found
+            for index, similarity in zip(members, similarities)
+        ]
+        with transaction.atomic():
+            QuestionSignature.objects.filter(cluster__isnull=False).update(cluster=None, similarity=None)
+            QuestionSignature.objects.bulk_update(updates, ['cluster', 'similarity'], batch_size=batch_size)
+        return len(found), len(updates)
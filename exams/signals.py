@@ -0,0 +1,59 @@
+import threading
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Exam, Question, QuestionOption
+
+# Exams whose paper changed in this thread and has not been bumped yet, and
+# questions whose options changed. One edit can save dozens of questions and
+# options; each is handled once per commit. Ids left by a rolled-back
+# transaction are handled on the next commit, which costs a cache miss (or a
+# needless signature refresh) and nothing else.
+_pending = threading.local()
+
+
+def _take(name):
+    ids = getattr(_pending, name, set())
+    setattr(_pending, name, set())
+    return ids
+
+
+def _flush():
+    question_ids = _take('question_ids')
+    if question_ids:
+        # Option text is part of the dedupe signature, which is refreshed for
+        # questions updated since it was computed.
+        Question.objects.filter(pk__in=question_ids).update(updated_at=timezone.now())
+    for exam_id in _take('exam_ids'):
+        Exam(pk=exam_id).bump_version()
+
+
+def paper_changed(exam_id, question_id=None):
+    """Bump ``exam_id`` (and touch ``question_id``) once the current transaction commits."""
+    for name, pk in (('exam_ids', exam_id), ('question_ids', question_id)):
+        if pk is None:
+            continue
+        if not hasattr(_pending, name):
+            setattr(_pending, name, set())
+        getattr(_pending, name).add(pk)
+    transaction.on_commit(_flush)
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def question_changed(sender, instance, **kwargs):
+    paper_changed(instance.exam_id)
+
+
+@receiver(post_save, sender=QuestionOption)
+@receiver(post_delete, sender=QuestionOption)
+def option_changed(sender, instance, **kwargs):
+    if QuestionOption.question.is_cached(instance):
+        exam_id = instance.question.exam_id
+    else:
+        exam_id = Question.objects.filter(pk=instance.question_id).values_list('exam_id', flat=True).first()
+    if exam_id is not None:
+        paper_changed(exam_id, instance.question_id)
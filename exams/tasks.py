@@ -0,0 +1,21 @@
+from jobs.registry import task
+
+from . import dedupe
+from .models import Exam
+from .services import ExamGeneratorService, QuestionDedupeService
+
+
+@task('exams.generate_variants')
+def generate_variants(exam_id, blueprint, seed, bank_ids=None, student_ids=None):
+    # Students who got a variant on an earlier attempt are skipped, so a retry
+    # picks up where a failed run stopped.
+    template = Exam.objects.get(pk=exam_id, parent__isnull=True)
+    created, skipped = ExamGeneratorService.generate_for(template, blueprint, seed, bank_ids, student_ids)
+    return {'created': created, 'skipped': skipped, 'seed': seed}
+
+
+@task('exams.dedupe_questions')
+def dedupe_questions(threshold=dedupe.DEFAULT_THRESHOLD, batch_size=2000):
+    refreshed = QuestionDedupeService.refresh_signatures(batch_size)
+    clusters, questions = QuestionDedupeService.assign_clusters(threshold, batch_size)
+    return {'signatures_refreshed': refreshed, 'clusters': clusters, 'questions': questions}
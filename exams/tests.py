@@ -1,3 +1,366 @@
+from io import StringIO
+from unittest import skipUnless
+
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connection
 from django.test import TestCase
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from rest_framework import status
+from accounts.cache import specialization_cache
+from accounts.models import EngineeringSpecialization
+from submissions.services import ExamAssignmentService
+from . import search
+from .models import Exam, Question, QuestionOption, QuestionBank, QuestionSignature
+from .search import ensure_index
+from .services import QuestionDedupeService
+
+User = get_user_model()
+
+
+class ExamFixtureMixin:
+    """Builds a realistically sized exam library for query-budget tests."""
+
+    def create_exams(self, instructor, specialization, exams=3, questions=5, options=4, start=0):
+        created = []
+        for i in range(start, start + exams):
+            exam = Exam.objects.create(
+                title=f'Exam {i}',
+                instructor=instructor,
+                specialization=specialization,
+                duration_minutes=60,
+            )
+            self.add_questions(exam, questions, options)
+            created.append(exam)
+        return created
+
+    def add_questions(self, exam, questions=5, options=4):
+        offset = exam.questions.count()
+        rows = Question.objects.bulk_create([
+            Question(
+                exam=exam,
+                question_text=f'Question {offset + i}',
+                question_type=Question.QuestionType.MULTIPLE_CHOICE,
+                points=1,
+                order_index=offset + i,
+            )
+            for i in range(questions)
+        ])
+        QuestionOption.objects.bulk_create([
+            QuestionOption(question=question, option_text=f'Option {j}', is_correct=(j == 0), order_index=j)
+            for question in rows
+            for j in range(options)
+        ])
+        return rows
+
+
+class ExamQueryBudgetTests(ExamFixtureMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.spec = EngineeringSpecialization.objects.create(name='Civil Engineering', code='CV')
+        self.instructor = User.objects.create_user(
+            email='inst@test.com', password='password', role='instructor', specialization=self.spec
+        )
+        self.other_instructor = User.objects.create_user(email='inst2@test.com', password='password', role='instructor')
+        self.exams = self.create_exams(self.instructor, self.spec, exams=5)
+        self.create_exams(self.other_instructor, self.spec, exams=5, start=5)
+        for i in range(5):
+            QuestionBank.objects.create(
+                instructor=self.instructor if i % 2 else self.other_instructor,
+                specialization=self.spec,
+                name=f'Bank {i}',
+            )
+        # Test transactions never commit, so announce the new rows by hand.
+        specialization_cache.invalidate()
+        specialization_cache.all()
+        self.client.force_authenticate(user=self.instructor)
+
+    def assertQueryBudget(self, url, budget):
+        with self.assertNumQueries(budget):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_exam_list_budget_is_constant(self):
+        self.assertQueryBudget('/api/exams/', 2)
+        self.create_exams(self.other_instructor, self.spec, exams=20, questions=10, start=10)
+        response = self.assertQueryBudget('/api/exams/', 2)
+        self.assertEqual(len(response.data['results']), 20)
+
+    def test_exam_detail_budget_is_constant(self):
+        exam = self.exams[0]
+        # Version lookup plus exam, questions and options on a cold paper cache.
+        self.assertQueryBudget(f'/api/exams/{exam.id}/', 4)
+        self.assertQueryBudget(f'/api/exams/{exam.id}/', 1)
+        self.add_questions(exam, questions=40, options=5)
+        exam.bump_version()
+        response = self.assertQueryBudget(f'/api/exams/{exam.id}/', 4)
+        self.assertEqual(len(response.data['questions']), 45)
+
+    def test_question_list_budget_is_constant(self):
+        self.assertQueryBudget('/api/questions/', 3)
+        self.add_questions(self.exams[0], questions=40, options=6)
+        self.assertQueryBudget('/api/questions/', 3)
+
+    def test_question_bank_list_budget_is_constant(self):
+        self.assertQueryBudget('/api/question-banks/', 2)
+        for i in range(5, 30):
+            QuestionBank.objects.create(instructor=self.instructor, specialization=self.spec, name=f'Bank {i}')
+        self.assertQueryBudget('/api/question-banks/', 2)
+
+
+class ExamDetailCachingTests(ExamFixtureMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.spec = EngineeringSpecialization.objects.create(name='Petroleum Engineering', code='PE')
+        self.instructor = User.objects.create_user(email='inst@test.com', password='password', role='instructor')
+        self.student = User.objects.create_user(
+            email='student@test.com', password='password', role='student', specialization=self.spec
+        )
+        self.exam = self.create_exams(self.instructor, self.spec, exams=1)[0]
+        self.url = f'/api/exams/{self.exam.id}/'
+
+    def test_unchanged_exam_returns_304_with_one_query(self):
+        self.client.force_authenticate(user=self.instructor)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('Last-Modified', response)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_editing_a_question_changes_the_etag(self):
+        self.client.force_authenticate(user=self.instructor)
+        etag = self.client.get(self.url)['ETag']
+        question = self.exam.questions.first()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f'/api/questions/{question.id}/', {'question_text': 'Edited'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['questions'][0]['question_text'], 'Edited')
+
+    def test_option_edits_outside_the_api_change_the_etag(self):
+        self.client.force_authenticate(user=self.instructor)
+        etag = self.client.get(self.url)['ETag']
+        option = QuestionOption.objects.filter(question__exam=self.exam).first()
+        option.option_text = 'Edited in the admin'
+        with self.captureOnCommitCallbacks(execute=True):
+            option.save()
+            option.question.options.exclude(pk=option.pk).first().save()
+        self.exam.refresh_from_db()
+        # Both saves commit together and bump the version once.
+        self.assertEqual(self.exam.version, 2)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('Edited in the admin', [o['option_text'] for q in response.data['questions'] for o in q['options']])
+
+    def test_students_and_instructors_get_separate_payloads(self):
+        self.client.force_authenticate(user=self.instructor)
+        instructor_response = self.client.get(self.url)
+        self.client.force_authenticate(user=self.student)
+        student_response = self.client.get(self.url)
+
+        self.assertNotEqual(instructor_response['ETag'], student_response['ETag'])
+        self.assertIn('is_correct', instructor_response.data['questions'][0]['options'][0])
+        self.assertNotIn('is_correct', student_response.data['questions'][0]['options'][0])
+        self.assertNotIn('explanation', student_response.data['questions'][0])
+
+
+class QuestionSearchTests(ExamFixtureMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.spec = EngineeringSpecialization.objects.create(name='Structural Engineering', code='ST')
+        self.other_spec = EngineeringSpecialization.objects.create(name='Electrical Engineering', code='EL')
+        self.instructor = User.objects.create_user(email='inst@test.com', password='password', role='instructor')
+        self.other_instructor = User.objects.create_user(email='inst2@test.com', password='password', role='instructor')
+        self.exam = self.create_exams(self.instructor, self.spec, exams=1, questions=0)[0]
+        self.other_exam = self.create_exams(self.instructor, self.other_spec, exams=1, questions=0)[0]
+        self.beam = self.question(self.exam, 'Compute the deflection of a cantilever beam.')
+        self.mention = self.question(self.other_exam, 'Name a load path.', explanation='Loads travel through each beam.')
+        self.essay = self.question(self.exam, 'Discuss beam failure modes.', Question.QuestionType.ESSAY)
+        self.question(self.create_exams(self.other_instructor, self.spec, exams=1, questions=0)[0], 'Beam theory basics.')
+        self.client.force_authenticate(user=self.instructor)
+
+    def question(self, exam, text, question_type=Question.QuestionType.MULTIPLE_CHOICE, explanation=''):
+        return Question.objects.create(
+            exam=exam, question_text=text, question_type=question_type,
+            explanation=explanation, points=1, order_index=0,
+        )
+
+    def search(self, **params):
+        response = self.client.get('/api/questions/search/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item['id'] for item in response.data['results']]
+
+    def test_ranks_own_questions_and_applies_filters(self):
+        results = self.search(q='beam')
+        self.assertEqual(set(results), {str(self.beam.id), str(self.mention.id), str(self.essay.id)})
+        self.assertEqual(results[-1], str(self.mention.id))
+        self.assertEqual(self.search(q='beam', question_type='essay'), [str(self.essay.id)])
+        self.assertEqual(self.search(q='beam', specialization='EL'), [str(self.mention.id)])
+        self.assertEqual(self.search(q='cantil'), [str(self.beam.id)])
+
+    def test_index_follows_edits_and_deletes(self):
+        response = self.client.patch(f'/api/questions/{self.beam.id}/', {'question_text': 'Size a steel column.'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.search(q='column'), [str(self.beam.id)])
+        self.assertNotIn(str(self.beam.id), self.search(q='cantilever'))
+
+        self.essay.delete()
+        self.assertEqual(self.search(q='failure'), [])
+
+    @skipUnless(connection.vendor == 'sqlite', 'Exercises the SQLite FTS5 index.')
+    def test_index_survives_renumbered_rows_and_dropped_triggers(self):
+        with connection.cursor() as cursor:
+            # What VACUUM may do to a table without an INTEGER PRIMARY KEY.
+            cursor.execute('UPDATE exams_question SET rowid = 1000 - rowid')
+            self.assertEqual(self.search(q='cantilever'), [str(self.beam.id)])
+            # What SQLite's table remake in a migration does to the triggers.
+            cursor.execute(f'DROP TRIGGER {search.SQLITE_TABLE}_ai')
+        ensure_index(DEFAULT_DB_ALIAS)
+        column = self.question(self.exam, 'Size a steel column.')
+        self.assertEqual(self.search(q='column'), [str(column.id)])
+
+    def test_students_cannot_search(self):
+        self.client.force_authenticate(user=User.objects.create_user(email='s@test.com', password='password', role='student'))
+        response = self.client.get('/api/questions/search/', {'q': 'beam'})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class ExamGeneratorTests(ExamFixtureMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.spec = EngineeringSpecialization.objects.create(name='Aerospace Engineering', code='AE')
+        self.instructor = User.objects.create_user(email='inst@test.com', password='password', role='instructor')
+        self.students = [
+            User.objects.create_user(email=f'student{i}@test.com', password='password', role='student', specialization=self.spec)
+            for i in range(6)
+        ]
+        library = self.create_exams(self.instructor, self.spec, exams=1, questions=0)[0]
+        self.template = self.create_exams(self.instructor, self.spec, exams=1, questions=0)[0]
+        self.strata = {}
+        for topic in ('lift', 'drag'):
+            for difficulty in ('easy', 'hard'):
+                bank = QuestionBank.objects.create(
+                    instructor=self.instructor, specialization=self.spec,
+                    name=f'{topic}-{difficulty}', topic=topic, difficulty_level=difficulty,
+                )
+                questions = self.add_questions(library, questions=5, options=3)
+                Question.objects.filter(id__in=[q.id for q in questions]).update(question_text=f'{topic} {difficulty}')
+                self.client.force_authenticate(user=self.instructor)
+                response = self.client.post(
+                    f'/api/question-banks/{bank.id}/add_questions/',
+                    {'question_ids': [str(q.id) for q in questions]}, format='json',
+                )
+                self.assertEqual(response.data['question_count'], 5)
+        self.url = f'/api/exams/{self.template.id}/generate_variants/'
+        self.blueprint = [
+            {'topic': 'lift', 'difficulty': 'easy', 'count': 3},
+            {'topic': 'lift', 'difficulty': 'hard', 'count': 1},
+            {'topic': 'drag', 'difficulty': 'hard', 'count': 2},
+        ]
+
+    def test_generates_one_stratified_variant_per_student(self):
+        response = self.client.post(self.url, {'blueprint': self.blueprint, 'seed': 5}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 6)
+
+        variants = Exam.objects.filter(parent=self.template)
+        self.assertEqual(variants.count(), 6)
+        for variant in variants.prefetch_related('questions__options', 'assignments'):
+            texts = [q.question_text for q in variant.questions.all()]
+            self.assertEqual(texts, ['lift easy'] * 3 + ['lift hard'] + ['drag hard'] * 2)
+            self.assertEqual(variant.total_points, 6)
+            self.assertTrue(all(q.options.count() == 3 for q in variant.questions.all()))
+            self.assertEqual(len(variant.assignments.all()), 1)
+
+        response = self.client.post(self.url, {'blueprint': self.blueprint, 'seed': 5}, format='json')
+        self.assertEqual((response.data['created'], response.data['skipped']), (0, 6))
+        self.assertNotIn(str(variants[0].id), [e['id'] for e in self.client.get('/api/exams/').data['results']])
+
+    def test_variants_are_private_to_their_student(self):
+        self.client.post(self.url, {'blueprint': self.blueprint}, format='json')
+        variant = Exam.objects.get(parent=self.template, assignments__student=self.students[0])
+        self.assertEqual(ExamAssignmentService.start_exam(variant.id, self.students[0].id).status, 'in_progress')
+        with self.assertRaises(ValidationError):
+            ExamAssignmentService.start_exam(variant.id, self.students[1].id)
+
+    def test_students_with_a_variant_cannot_start_the_template(self):
+        self.client.post(self.url, {'blueprint': self.blueprint, 'student_ids': [str(self.students[0].id)]}, format='json')
+        with self.assertRaisesMessage(ValidationError, 'generated for you'):
+            ExamAssignmentService.start_exam(self.template.id, self.students[0].id)
+        self.assertFalse(self.template.assignments.exists())
+        # Students left out of the generation still take the template itself.
+        self.assertEqual(ExamAssignmentService.start_exam(self.template.id, self.students[1].id).status, 'in_progress')
+
+    def test_rejects_blueprint_larger_than_stratum(self):
+        blueprint = [{'topic': 'drag', 'difficulty': 'easy', 'count': 6}]
+        response = self.client.post(self.url, {'blueprint': blueprint}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Exam.objects.filter(parent=self.template).exists())
+
+    def test_search_filters_by_bank_difficulty(self):
+        response = self.client.get('/api/questions/search/', {'q': 'lift', 'difficulty': 'hard'})
+        self.assertEqual({item['question_text'] for item in response.data['results']}, {'lift hard'})
+        self.assertEqual(response.data['count'], 5)
+
+
+class DuplicateDetectionTests(ExamFixtureMixin, TestCase):
+    TEXT = 'A steel rod of diameter {} mm carries an axial load of {} kN. What is the normal stress in the rod?'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.spec = EngineeringSpecialization.objects.create(name='Materials Engineering', code='MT')
+        self.instructor = User.objects.create_user(email='inst@test.com', password='password', role='instructor')
+        self.other_instructor = User.objects.create_user(email='inst2@test.com', password='password', role='instructor')
+        exam = self.create_exams(self.instructor, self.spec, exams=1, questions=0)[0]
+        other_exam = self.create_exams(self.other_instructor, self.spec, exams=1, questions=0)[0]
+        # Committed as a real write would be, so their option changes are settled.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.original = self.question(exam, self.TEXT.format(20, 10), ['31.8 MPa', '15.9 MPa', '63.7 MPa'])
+            self.reworded = self.question(other_exam, self.TEXT.format(25, 12), ['48.9 MPa', '24.4 MPa', '12.2 MPa'])
+            self.unrelated = self.question(exam, 'Which crystal structure does austenite have at room temperature?', ['FCC', 'BCC'])
+        self.client.force_authenticate(user=self.instructor)
+
+    def question(self, exam, text, options):
+        question = Question.objects.create(
+            exam=exam, question_text=text, question_type=Question.QuestionType.MULTIPLE_CHOICE, points=1, order_index=0,
+        )
+        for i, option in enumerate(options):
+            QuestionOption.objects.create(question=question, option_text=option, is_correct=(i == 0), order_index=i)
+        return question
+
+    def test_clusters_questions_that_differ_only_in_numbers(self):
+        call_command('dedupe_questions', stdout=StringIO())
+        response = self.client.get('/api/questions/duplicates/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 1)
+        cluster = response.data['results'][0]
+        self.assertEqual({q['id'] for q in cluster['questions']}, {self.original.id, self.reworded.id})
+        self.assertTrue(all(q['similarity'] >= 0.8 for q in cluster['questions']))
+
+        self.client.force_authenticate(user=User.objects.create_user(email='inst3@test.com', password='password', role='instructor'))
+        self.assertEqual(self.client.get('/api/questions/duplicates/').data['count'], 0)
+
+    def test_only_edited_questions_are_reindexed(self):
+        call_command('dedupe_questions', stdout=StringIO())
+        self.assertEqual(QuestionSignature.objects.count(), 3)
+        self.assertFalse(QuestionDedupeService.stale_questions().exists())
+
+        self.reworded.question_text = 'Describe the creep mechanisms of nickel superalloys.'
+        self.reworded.save()
+        self.assertEqual(list(QuestionDedupeService.stale_questions()), [self.reworded])
+        call_command('dedupe_questions', stdout=StringIO())
+        self.assertEqual(self.client.get('/api/questions/duplicates/').data['count'], 0)
 
-# Create your tests here.
+        # Options are part of the signature, so editing one alone makes the question stale.
+        option = self.unrelated.options.first()
+        option.option_text = 'HCP'
+        with self.captureOnCommitCallbacks(execute=True):
+            option.save()
+        self.assertEqual(list(QuestionDedupeService.stale_questions()), [self.unrelated])
@@ -1,29 +1,226 @@
 
-from rest_framework import viewsets, permissions
-from .models import Exam, Question, QuestionBank
-from .serializers import ExamListSerializer, ExamDetailSerializer, QuestionBankSerializer, QuestionSerializer
+import random
+
+from django.core.exceptions import ValidationError
+from django.db.models import Count
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from rest_framework import viewsets, permissions, status
+from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
+from rest_framework.response import Response
+from .models import Exam, Question, QuestionBank, QuestionSignature
+from .serializers import (ExamListSerializer, ExamDetailSerializer, QuestionBankSerializer, QuestionSerializer,
+                          VariantGenerationSerializer)
+from accounts.cache import specialization_cache
+from accounts.models import CustomUser
+from .search import QuestionSearch
+from .services import ExamGeneratorService, ExamPaperService, ExamPrewarmService
+from jobs.services import JobService
+from submissions.services import StatisticsService
 
 class ExamViewSet(viewsets.ModelViewSet):
     queryset = Exam.objects.all()
     permission_classes = [permissions.IsAuthenticated]
 
+    def get_queryset(self):
+        queryset = Exam.objects.select_related('instructor')
+        if self.action == 'list':
+            # Per-student variants are reached through assignments, not the library.
+            return queryset.filter(parent__isnull=True).annotate(question_count=Count('questions'))
+        if self.action == 'retrieve':
+            return queryset.prefetch_related('questions__options')
+        return queryset
+
     def get_serializer_class(self):
         if self.action == 'list':
             return ExamListSerializer
         return ExamDetailSerializer
 
+    def retrieve(self, request, *args, **kwargs):
+        # Validators come from one narrow query; nothing is serialized for a 304.
+        pk = kwargs[self.lookup_field]
+        version, updated_at = get_object_or_404(Exam.objects.values_list('version', 'updated_at'), pk=pk)
+        hide_answers = not ExamPaperService.answers_visible(request.user)
+        etag = ExamPaperService.etag(pk, version, hide_answers)
+
+        response = get_conditional_response(request, etag=etag, last_modified=int(updated_at.timestamp()))
+        if response is None:
+            response = Response(ExamPaperService.get_paper(pk, version, hide_answers, self.get_object))
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(updated_at.timestamp())
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ['Authorization'])
+        return response
+
     def perform_create(self, serializer):
         serializer.save(instructor=self.request.user)
 
+    def perform_update(self, serializer):
+        ExamPrewarmService.forget(serializer.save().pk)
+
+    @action(detail=True, methods=['post'])
+    def generate_variants(self, request, pk=None):
+        """Give each student a variant drawn from question banks by (topic, difficulty).
+
+        Students default to every active student of the exam's specialization,
+        banks to the instructor's banks for that specialization. Students who
+        already have a variant are skipped. With ``background`` the work is
+        queued as a job and its id returned for ``/api/jobs/<id>/``.
+        """
+        template = self.get_object()
+        if template.instructor_id != request.user.id or template.parent_id is not None:
+            return Response({'error': 'Only the owner can generate variants of a template exam.'}, status=status.HTTP_403_FORBIDDEN)
+        serializer = VariantGenerationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        seed = data.get('seed', random.getrandbits(32))
+        bank_ids = [str(pk) for pk in data['bank_ids']] if 'bank_ids' in data else None
+        student_ids = [str(pk) for pk in data['student_ids']] if 'student_ids' in data else None
+
+        if data['background']:
+            job = JobService.enqueue(
+                'exams.generate_variants', created_by=request.user, exam_id=str(template.id),
+                blueprint=[dict(item) for item in data['blueprint']], seed=seed,
+                bank_ids=bank_ids, student_ids=student_ids,
+            )
+            return Response({'job': job.id, 'seed': seed}, status=status.HTTP_202_ACCEPTED)
+        try:
+            created, skipped = ExamGeneratorService.generate_for(template, data['blueprint'], seed, bank_ids, student_ids)
+        except ValidationError as e:
+            return Response({'error': e.messages[0]}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'created': created, 'skipped': skipped, 'seed': seed}, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['get'])
+    def statistics(self, request, pk=None):
+        """Score summary across the exam and its variants, read from ExamStatistics."""
+        exam = self.get_object()
+        user = request.user
+        if exam.instructor_id != user.id and not (user.role == 'admin' or user.is_staff):
+            return Response({'error': 'Only the owner can view exam statistics.'}, status=status.HTTP_403_FORBIDDEN)
+        return Response(StatisticsService.summary(exam))
+
 class QuestionViewSet(viewsets.ModelViewSet):
-    queryset = Question.objects.all()
+    queryset = Question.objects.prefetch_related('options')
     serializer_class = QuestionSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Ranked full-text search over the caller's question library.
+
+        ``q`` is required; ``question_type``, ``specialization`` (id or code) and
+        the bank ``difficulty`` and ``topic`` narrow the results. Instructors search their own exams, admins all.
+        """
+        user = request.user
+        if not (user.is_staff or user.role in (CustomUser.Role.INSTRUCTOR, CustomUser.Role.ADMIN)):
+            return Response({'error': 'Only instructors can search the question library.'}, status=status.HTTP_403_FORBIDDEN)
+
+        queryset = Question.objects.filter(exam__parent__isnull=True)
+        if not (user.is_staff or user.role == CustomUser.Role.ADMIN):
+            queryset = queryset.filter(exam__instructor=user)
+        if request.query_params.get('question_type'):
+            queryset = queryset.filter(question_type=request.query_params['question_type'])
+        if request.query_params.get('specialization'):
+            value = request.query_params['specialization']
+            specialization = specialization_cache.get_by_code(value) or specialization_cache.get(value)
+            if specialization is None:
+                return Response({'error': 'Unknown specialization.'}, status=status.HTTP_400_BAD_REQUEST)
+            queryset = queryset.filter(exam__specialization_id=specialization.id)
+        if request.query_params.get('difficulty'):
+            queryset = queryset.filter(banks__difficulty_level=request.query_params['difficulty'])
+        if request.query_params.get('topic'):
+            queryset = queryset.filter(banks__topic__iexact=request.query_params['topic'])
+
+        ranked = self.paginate_queryset(QuestionSearch.search(queryset, request.query_params.get('q')))
+        questions = Question.objects.prefetch_related('options').in_bulk([pk for pk, _ in ranked])
+        results = []
+        for pk, rank in ranked:
+            if pk in questions:
+                item = self.get_serializer(questions[pk]).data
+                item['exam'] = questions[pk].exam_id
+                item['rank'] = rank
+                results.append(item)
+        return self.get_paginated_response(results)
+
+    @action(detail=False, methods=['get'])
+    def duplicates(self, request):
+        """Near-duplicate clusters found by ``dedupe_questions``, largest first.
+
+        Instructors see clusters containing at least one of their questions;
+        ``specialization`` (id or code) narrows by the representative's exam.
+        """
+        user = request.user
+        if not (user.is_staff or user.role in (CustomUser.Role.INSTRUCTOR, CustomUser.Role.ADMIN)):
+            return Response({'error': 'Only instructors can review duplicates.'}, status=status.HTTP_403_FORBIDDEN)
+
+        signatures = QuestionSignature.objects.filter(cluster__isnull=False)
+        clusters = signatures
+        if not (user.is_staff or user.role == CustomUser.Role.ADMIN):
+            clusters = clusters.filter(cluster__in=signatures.filter(question__exam__instructor=user).values('cluster'))
+        if request.query_params.get('specialization'):
+            value = request.query_params['specialization']
+            specialization = specialization_cache.get_by_code(value) or specialization_cache.get(value)
+            if specialization is None:
+                return Response({'error': 'Unknown specialization.'}, status=status.HTTP_400_BAD_REQUEST)
+            clusters = clusters.filter(question__exam__specialization_id=specialization.id)
+        clusters = clusters.values('cluster').annotate(size=Count('pk')).order_by('-size', 'cluster')
+
+        page = self.paginate_queryset(clusters)
+        members = signatures.filter(cluster__in=[row['cluster'] for row in page]).values(
+            'cluster', 'similarity', 'question_id', 'question__question_text',
+            'question__exam_id', 'question__exam__title', 'question__exam__instructor_id',
+        ).order_by('cluster', '-similarity')
+        grouped = {row['cluster']: [] for row in page}
+        for row in members:
+            grouped[row['cluster']].append({
+                'id': row['question_id'],
+                'question_text': row['question__question_text'],
+                'exam': row['question__exam_id'],
+                'exam_title': row['question__exam__title'],
+                'instructor': row['question__exam__instructor_id'],
+                'similarity': round(row['similarity'], 3),
+            })
+        return self.get_paginated_response([
+            {'cluster': cluster, 'size': len(questions), 'questions': questions}
+            for cluster, questions in grouped.items()
+        ])
+
 class QuestionBankViewSet(viewsets.ModelViewSet):
-    queryset = QuestionBank.objects.all()
+    queryset = QuestionBank.objects.select_related('instructor')
     serializer_class = QuestionBankSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    def get_queryset(self):
+        return QuestionBank.objects.select_related('instructor').annotate(question_count=Count('questions'))
+
     def perform_create(self, serializer):
         serializer.save(instructor=self.request.user)
+
+    def _member_questions(self, request):
+        bank = self.get_object()
+        if bank.instructor_id != request.user.id:
+            return bank, None
+        ids = request.data.get('question_ids')
+        if not isinstance(ids, list):
+            return bank, []
+        return bank, Question.objects.filter(
+            id__in=ids, exam__instructor=request.user, exam__parent__isnull=True
+        ).values_list('id', flat=True)
+
+    @action(detail=True, methods=['post'])
+    def add_questions(self, request, pk=None):
+        bank, questions = self._member_questions(request)
+        if questions is None:
+            return Response({'error': 'Only the owner can change a bank.'}, status=status.HTTP_403_FORBIDDEN)
+        bank.questions.add(*questions)
+        return Response({'question_count': bank.questions.count()})
+
+    @action(detail=True, methods=['post'])
+    def remove_questions(self, request, pk=None):
+        bank, questions = self._member_questions(request)
+        if questions is None:
+            return Response({'error': 'Only the owner can change a bank.'}, status=status.HTTP_403_FORBIDDEN)
+        bank.questions.remove(*questions)
+        return Response({'question_count': bank.questions.count()})
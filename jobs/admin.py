@@ -0,0 +1,11 @@
+from django.contrib import admin
+from .models import Job
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('task', 'status', 'attempts', 'max_attempts', 'created_by', 'created_at', 'finished_at')
+    list_filter = ('status', 'task')
+    list_select_related = ('created_by',)
+    search_fields = ('task', 'id')
+    raw_id_fields = ('created_by',)
+    readonly_fields = ('attempts', 'locked_by', 'locked_at', 'result', 'error', 'started_at', 'finished_at')
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from jobs import registry
+from jobs.worker import POOLS, Worker
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (see jobs/registry.py) until stopped with SIGINT or SIGTERM.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4, help='Jobs run at the same time.')
+        parser.add_argument(
+            '--pool', choices=POOLS, default='thread',
+            help='thread for I/O-bound tasks, process for CPU-bound ones, inline to run one job at a time in this process.',
+        )
+        parser.add_argument('--poll', type=float, help='Seconds between polls when idle; defaults to JOBS_POLL_SECONDS.')
+        parser.add_argument('--once', action='store_true', help='Exit once no job is due instead of waiting for more.')
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1:
+            raise CommandError('--concurrency must be at least 1.')
+        self.stdout.write(f"Registered tasks: {', '.join(sorted(registry.tasks)) or 'none'}")
+        worker = Worker(
+            concurrency=options['concurrency'], pool=options['pool'], poll_seconds=options['poll'],
+            once=options['once'], log=self.stdout.write,
+        )
+        processed = worker.run()
+        self.stdout.write(self.style.SUCCESS(f'Worker {worker.name} stopped after {processed} jobs.'))
@@ -0,0 +1,50 @@
+"""
+Tasks that can run as background jobs.
+
+A task is a function of JSON-serializable keyword arguments that returns a
+JSON-serializable result (or None). Apps register theirs in ``tasks.py``,
+which ``JobsConfig.ready`` imports::
+
+    @task('exams.dedupe_questions')
+    def dedupe_questions(threshold=0.8):
+        ...
+
+and callers queue a run with ``JobService.enqueue('exams.dedupe_questions',
+threshold=0.9)``. A failed run is retried up to ``max_attempts`` times in
+all, waiting ``retry_delay`` seconds (``JOBS_RETRY_DELAY_SECONDS`` by
+default) before the second attempt and twice as long before each next one.
+Tasks must therefore be safe to run again after a partial failure. A task
+that raises ``django.core.exceptions.ValidationError`` is failed at once
+with its messages, since bad arguments will not improve on retry.
+"""
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from django.core.exceptions import ImproperlyConfigured
+
+
+@dataclass(frozen=True)
+class Task:
+    name: str
+    func: Callable
+    max_attempts: int = 3
+    retry_delay: Optional[int] = None
+
+
+tasks = {}
+
+
+def task(name, max_attempts=3, retry_delay=None):
+    def register(func):
+        if name in tasks and tasks[name].func is not func:
+            raise ImproperlyConfigured(f'Task {name!r} is registered twice.')
+        tasks[name] = Task(name, func, max_attempts, retry_delay)
+        return func
+    return register
+
+
+def get(name):
+    try:
+        return tasks[name]
+    except KeyError:
+        raise LookupError(f'No task named {name!r} is registered.')
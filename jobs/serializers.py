@@ -0,0 +1,8 @@
+from rest_framework import serializers
+from .models import Job
+
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = ('id', 'task', 'kwargs', 'status', 'priority', 'attempts', 'max_attempts', 'run_after',
+                  'result', 'error', 'created_at', 'started_at', 'finished_at')
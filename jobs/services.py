@@ -0,0 +1,120 @@
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connections, router, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import registry
+from .models import Job
+
+
+class JobService:
+    """Queues, claims and records runs of registered tasks.
+
+    Workers claim due jobs with ``SELECT ... FOR UPDATE SKIP LOCKED`` where the
+    database has it, so concurrent workers never wait on or take the same
+    row. SQLite has no row locks; there each candidate is taken with a
+    conditional UPDATE (``status = 'queued'``) and only the rows that update
+    belong to the worker. A running job's ``locked_at`` is refreshed by its
+    worker; a job whose lease (``JOBS_LEASE_SECONDS``) runs out is assumed
+    lost with its worker and is queued again or failed.
+    """
+
+    @staticmethod
+    def enqueue(task_name, created_by=None, priority=0, delay=0, **kwargs):
+        task = registry.get(task_name)
+        return Job.objects.create(
+            task=task.name, kwargs=kwargs, priority=priority, max_attempts=task.max_attempts,
+            run_after=timezone.now() + timedelta(seconds=delay), created_by=created_by,
+        )
+
+    @staticmethod
+    def claim(worker, limit=1):
+        """Mark up to ``limit`` due jobs as running for ``worker`` and return them."""
+        now = timezone.now()
+        due = Job.objects.filter(status=Job.Status.QUEUED, run_after__lte=now).order_by('-priority', 'run_after')
+        taken = {
+            'status': Job.Status.RUNNING, 'locked_by': worker, 'locked_at': now, 'started_at': now,
+            'attempts': F('attempts') + 1,
+        }
+        connection = connections[router.db_for_write(Job)]
+        if connection.features.has_select_for_update_skip_locked:
+            with transaction.atomic(using=connection.alias):
+                ids = list(due.select_for_update(skip_locked=True).values_list('id', flat=True)[:limit])
+                Job.objects.filter(id__in=ids).update(**taken)
+        else:
+            ids = []
+            for job_id in due.values_list('id', flat=True)[:limit * 2]:
+                if Job.objects.filter(id=job_id, status=Job.Status.QUEUED).update(**taken):
+                    ids.append(job_id)
+                    if len(ids) == limit:
+                        break
+        return list(Job.objects.filter(id__in=ids).order_by('-priority', 'run_after'))
+
+    @staticmethod
+    def run(job):
+        """Run a claimed job's task and record its result or failure."""
+        task = registry.tasks.get(job.task)
+        try:
+            if task is None:
+                raise LookupError(f'No task named {job.task!r} is registered.')
+            result = task.func(**job.kwargs)
+        except ValidationError as e:
+            # Bad input fails the same way on every attempt.
+            JobService.failed(job, '; '.join(e.messages), retry=False)
+            return False
+        except Exception:
+            JobService.failed(job, traceback.format_exc(), retry=task is not None)
+            return False
+        try:
+            JobService._owned(job).update(
+                status=Job.Status.SUCCEEDED, result=result, error='', finished_at=timezone.now(), locked_by='', locked_at=None,
+            )
+        except TypeError:
+            JobService.failed(job, f'{job.task} returned a result that is not JSON serializable.', retry=False)
+            return False
+        return True
+
+    @staticmethod
+    def failed(job, error, retry=True):
+        task = registry.tasks.get(job.task)
+        now = timezone.now()
+        if retry and job.attempts < job.max_attempts:
+            delay = (task.retry_delay if task and task.retry_delay is not None else settings.JOBS_RETRY_DELAY_SECONDS)
+            JobService._owned(job).update(
+                status=Job.Status.QUEUED, run_after=now + timedelta(seconds=delay * 2 ** (job.attempts - 1)),
+                error=error, locked_by='', locked_at=None,
+            )
+        else:
+            JobService._owned(job).update(
+                status=Job.Status.FAILED, error=error, finished_at=now, locked_by='', locked_at=None,
+            )
+
+    @staticmethod
+    def _owned(job):
+        # A job whose lease expired may have been claimed again; only its
+        # current holder records the outcome.
+        return Job.objects.filter(pk=job.pk, status=Job.Status.RUNNING, locked_by=job.locked_by)
+
+    @staticmethod
+    def heartbeat(worker, job_ids):
+        return Job.objects.filter(id__in=job_ids, status=Job.Status.RUNNING, locked_by=worker).update(
+            locked_at=timezone.now()
+        )
+
+    @staticmethod
+    def requeue_expired():
+        """Queue again (or fail, when out of attempts) running jobs whose worker stopped refreshing them."""
+        now = timezone.now()
+        expired = Job.objects.filter(
+            status=Job.Status.RUNNING, locked_at__lt=now - timedelta(seconds=settings.JOBS_LEASE_SECONDS)
+        )
+        lost = 'The worker running this job stopped responding.'
+        requeued = expired.filter(attempts__lt=F('max_attempts')).update(
+            status=Job.Status.QUEUED, run_after=now, error=lost, locked_by='', locked_at=None,
+        )
+        failed = expired.update(status=Job.Status.FAILED, error=lost, finished_at=now, locked_by='', locked_at=None)
+        return requeued, failed
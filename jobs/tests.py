@@ -0,0 +1,133 @@
+import os
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from accounts.models import EngineeringSpecialization
+from exams.models import Exam
+from .models import Job
+from . import registry
+from .registry import task
+from .services import JobService
+from .worker import Worker
+
+User = get_user_model()
+
+
+@task('tests.add')
+def add(a, b):
+    return {'sum': a + b}
+
+
+@task('tests.broken', max_attempts=3, retry_delay=10)
+def broken():
+    raise RuntimeError('boom')
+
+
+@task('tests.slow')
+def slow(seconds):
+    time.sleep(seconds)
+
+
+def run_in_child(name, **kwargs):
+    from django.apps import apps
+    return os.getpid(), apps.ready, registry.get(name).func(**kwargs)
+
+
+def crash(job_id, own_connection=True):
+    os._exit(1)
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.spec = EngineeringSpecialization.objects.create(name='Civil Engineering', code='CE')
+        self.instructor = User.objects.create_user(email='inst@test.com', password='password', role='instructor')
+        self.other = User.objects.create_user(email='other@test.com', password='password', role='instructor')
+
+    def work(self):
+        call_command('runworker', pool='inline', once=True, stdout=StringIO())
+
+    def test_worker_runs_jobs_and_retries_with_backoff(self):
+        ok = JobService.enqueue('tests.add', a=2, b=3)
+        bad = JobService.enqueue('tests.broken')
+        self.work()
+        ok.refresh_from_db()
+        self.assertEqual((ok.status, ok.result, ok.attempts), (Job.Status.SUCCEEDED, {'sum': 5}, 1))
+
+        for attempt, delay in ((1, 10), (2, 20)):
+            bad.refresh_from_db()
+            self.assertEqual((bad.status, bad.attempts), (Job.Status.QUEUED, attempt))
+            self.assertIn('RuntimeError: boom', bad.error)
+            self.assertAlmostEqual((bad.run_after - timezone.now()).total_seconds(), delay, delta=5)
+            Job.objects.filter(pk=bad.pk).update(run_after=timezone.now())
+            self.work()
+        bad.refresh_from_db()
+        self.assertEqual((bad.status, bad.attempts), (Job.Status.FAILED, 3))
+
+    def test_claimed_jobs_are_not_claimed_again_until_their_lease_expires(self):
+        job = JobService.enqueue('tests.add', a=1, b=1)
+        self.assertEqual([claimed.id for claimed in JobService.claim('a', 5)], [job.id])
+        self.assertEqual(JobService.claim('b', 5), [])
+
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(JobService.requeue_expired(), (1, 0))
+        self.assertEqual([claimed.id for claimed in JobService.claim('b', 5)], [job.id])
+
+    def test_inline_jobs_keep_their_lease_while_they_run(self):
+        job = JobService.enqueue('tests.slow', seconds=0.3)
+        worker = Worker(pool='inline', once=True)
+        worker.beat_every = 0.05
+        with mock.patch.object(JobService, 'heartbeat') as heartbeat:
+            self.assertEqual(worker.run(), 1)
+        self.assertIn(mock.call(worker.name, [str(job.id)]), heartbeat.call_args_list)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.SUCCEEDED)
+
+    def test_process_pool_runs_tasks_in_spawned_children(self):
+        executor = Worker(pool='process', concurrency=1).executor()
+        try:
+            pid, ready, result = executor.submit(run_in_child, 'tests.add', a=2, b=3).result(timeout=60)
+        finally:
+            executor.shutdown()
+        self.assertNotEqual(pid, os.getpid())
+        self.assertTrue(ready)
+        self.assertEqual(result, {'sum': 5})
+
+        # A child that dies takes the pool down; its job is retried, not lost.
+        job = JobService.enqueue('tests.add', a=1, b=1)
+        with mock.patch('jobs.worker.execute', crash):
+            call_command('runworker', pool='process', concurrency=1, once=True, stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.Status.QUEUED, 1))
+        self.assertIn('BrokenProcessPool', job.error)
+
+    def test_background_variant_generation_reports_through_the_owners_job(self):
+        template = Exam.objects.create(
+            title='Template', instructor=self.instructor, specialization=self.spec, duration_minutes=60,
+        )
+        self.client.force_authenticate(user=self.instructor)
+        response = self.client.post(
+            f'/api/exams/{template.id}/generate_variants/',
+            {'blueprint': [{'topic': 'soil', 'count': 2}], 'seed': 7, 'background': True}, format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        job_id = response.data['job']
+        self.work()
+
+        response = self.client.get(f'/api/jobs/{job_id}/')
+        self.assertEqual(response.data['task'], 'exams.generate_variants')
+        # Bad input is failed at once rather than retried.
+        self.assertEqual((response.data['status'], response.data['attempts']), (Job.Status.FAILED, 1))
+        self.assertIn('has 0 questions, 2 requested', response.data['error'])
+
+        self.client.force_authenticate(user=self.other)
+        self.assertEqual(self.client.get(f'/api/jobs/{job_id}/').status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get('/api/jobs/').data['results'], [])
@@ -0,0 +1,25 @@
+from rest_framework import viewsets, permissions
+from accounts.models import CustomUser
+from .models import Job
+from .serializers import JobSerializer
+
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    """Status of background jobs: a user's own, or every job for staff and admins.
+
+    ``?status=queued|running|succeeded|failed`` and ``?task=`` filter the list.
+    """
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        user = self.request.user
+        queryset = Job.objects.all()
+        if not (user.is_staff or user.role == CustomUser.Role.ADMIN):
+            queryset = queryset.filter(created_by=user)
+        if self.action == 'list':
+            for field in ('status', 'task'):
+                value = self.request.query_params.get(field)
+                if value:
+                    queryset = queryset.filter(**{field: value})
+        return queryset
@@ -0,0 +1,152 @@
+"""
+The ``runworker`` loop.
+
+The main thread claims jobs, hands them to a pool and keeps their leases
+fresh; it never runs tasks itself except with the ``inline`` pool, where a
+helper thread refreshes the lease instead. Thread pools suit tasks that
+mostly wait on the database or network; process pools (started with
+``spawn``, so children set Django up from scratch and share no connections
+with the parent) suit CPU-bound ones. SIGINT/SIGTERM stop
+claiming and wait for running jobs to finish.
+"""
+import os
+import signal
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from multiprocessing import get_context
+
+import django
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+POOLS = ('thread', 'process', 'inline')
+
+
+def execute(job_id, own_connection=True):
+    """Run one claimed job by id; the pool's entry point.
+
+    Pool threads and processes hold their own connections and drop stale ones
+    around each job; the inline pool shares the worker's.
+    """
+    from .models import Job
+    from .services import JobService
+
+    if own_connection:
+        close_old_connections()
+    try:
+        return JobService.run(Job.objects.get(pk=job_id))
+    finally:
+        if own_connection:
+            close_old_connections()
+
+
+def _setup_process():
+    django.setup()
+
+
+class _InlineExecutor:
+    """Run each job in the worker's own thread.
+
+    The loop that refreshes leases is blocked meanwhile, so a helper thread
+    keeps the running job's lease fresh until it returns; otherwise another
+    worker would requeue a job that outlasts ``JOBS_LEASE_SECONDS``.
+    """
+
+    def __init__(self, worker, beat_every):
+        self.worker = worker
+        self.beat_every = beat_every
+
+    def submit(self, fn, job_id, *args):
+        future = Future()
+        done = threading.Event()
+        beat = threading.Thread(target=self.beat, args=(job_id, done), name='job-heartbeat', daemon=True)
+        beat.start()
+        try:
+            future.set_result(fn(job_id, *args))
+        except BaseException as exc:
+            future.set_exception(exc)
+        finally:
+            done.set()
+            beat.join()
+        return future
+
+    def beat(self, job_id, done):
+        from .services import JobService
+
+        try:
+            while not done.wait(self.beat_every):
+                JobService.heartbeat(self.worker, [job_id])
+        finally:
+            connections.close_all()
+
+    def shutdown(self, wait=True):
+        pass
+
+
+class Worker:
+    def __init__(self, concurrency=4, pool='thread', poll_seconds=None, once=False, log=None):
+        self.name = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}'
+        self.concurrency = 1 if pool == 'inline' else concurrency
+        self.pool = pool
+        self.poll_seconds = settings.JOBS_POLL_SECONDS if poll_seconds is None else poll_seconds
+        self.once = once
+        self.log = log or (lambda message: None)
+        self.stopping = threading.Event()
+        self.processed = 0
+        self.beat_every = max(1, settings.JOBS_LEASE_SECONDS / 3)
+
+    def executor(self):
+        if self.pool == 'process':
+            return ProcessPoolExecutor(self.concurrency, mp_context=get_context('spawn'), initializer=_setup_process)
+        if self.pool == 'thread':
+            return ThreadPoolExecutor(self.concurrency, thread_name_prefix='job')
+        return _InlineExecutor(self.name, self.beat_every)
+
+    def stop(self, *args):
+        self.stopping.set()
+
+    def run(self):
+        from .services import JobService
+
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGINT, self.stop)
+            signal.signal(signal.SIGTERM, self.stop)
+        self.log(f'Worker {self.name}: {self.pool} pool of {self.concurrency}.')
+        running = {}
+        last_beat = 0
+        executor = self.executor()
+        try:
+            while not self.stopping.is_set():
+                if time.monotonic() - last_beat >= self.beat_every:
+                    JobService.heartbeat(self.name, [job.id for job in running.values()])
+                    JobService.requeue_expired()
+                    last_beat = time.monotonic()
+
+                claimed = []
+                if len(running) < self.concurrency:
+                    claimed = JobService.claim(self.name, self.concurrency - len(running))
+                    for job in claimed:
+                        self.log(f'{job.task} {job.id}: attempt {job.attempts} of {job.max_attempts}')
+                        running[executor.submit(execute, str(job.id), self.pool != 'inline')] = job
+
+                if running:
+                    done, _ = wait(list(running), timeout=0 if claimed else self.poll_seconds,
+                                   return_when=FIRST_COMPLETED)
+                    for future in done:
+                        job = running.pop(future)
+                        self.processed += 1
+                        error = future.exception()
+                        if error is not None:
+                            # The pool itself failed (e.g. a crashed process); the task never reported.
+                            self.log(f'{job.task} {job.id}: {error!r}')
+                            JobService.failed(job, repr(error))
+                elif self.once and not claimed:
+                    break
+                elif not claimed:
+                    self.stopping.wait(self.poll_seconds)
+        finally:
+            executor.shutdown(wait=True)
+        return self.processed
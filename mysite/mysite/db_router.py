@@ -0,0 +1,112 @@
+"""
+Primary/replica database routing.
+
+When ``REPLICA_DATABASE_URL`` is set, ``settings.DATABASES`` gains a ``replica``
+alias. ``ReplicaRoutingMiddleware`` decides per request whether reads may go to
+the replica; ``PrimaryReplicaRouter`` applies that decision to every query.
+
+A request reads from the replica when it is a safe-method request (list,
+retrieve and GET actions on the viewsets) and nothing has pinned it to the
+primary. A request is pinned as soon as it writes, so read-your-writes holds
+for the rest of it, and the response carries a short-lived cookie that keeps the
+client's following requests (e.g. ``submit_answer`` -> ``retrieve``) on the
+primary while the replica catches up.
+"""
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+REPLICA_ALIAS = 'replica'
+PIN_COOKIE = 'db_pinned'
+
+
+class RoutingState:
+    def __init__(self):
+        self.use_replica = False
+        self.wrote = False
+
+
+_state = ContextVar('db_routing_state', default=None)
+
+
+def replica_configured():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+def pin_to_primary():
+    """Send the remaining queries of the current request to the primary."""
+    state = _state.get()
+    if state is not None:
+        state.use_replica = False
+        state.wrote = True
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is not None and state.use_replica and replica_configured():
+            return REPLICA_ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        pin_to_primary()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Allowed everywhere so a local replica file can be built with
+        # `migrate --database replica`.
+        return True
+
+
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        token = _state.set(RoutingState())
+        try:
+            response = self.get_response(request)
+            return self.process_response(request, response)
+        finally:
+            _state.reset(token)
+
+    async def __acall__(self, request):
+        token = _state.set(RoutingState())
+        try:
+            response = await self.get_response(request)
+            return self.process_response(request, response)
+        finally:
+            _state.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = _state.get()
+        if state is None or not replica_configured() or request.COOKIES.get(PIN_COOKIE):
+            return None
+        state.use_replica = request.method in SAFE_METHODS
+        return None
+
+    def process_response(self, request, response):
+        state = _state.get()
+        if state is not None and state.wrote and replica_configured():
+            response.set_cookie(
+                PIN_COOKIE, '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax',
+                secure=request.is_secure(),
+            )
+        return response
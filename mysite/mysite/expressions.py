@@ -0,0 +1,44 @@
+"""
+Database expressions Django does not ship.
+"""
+import json
+
+from django.db import NotSupportedError
+from django.db.models import Expression, F, JSONField
+
+
+class JSONSet(Expression):
+    """Set one top-level key of a JSON column in place: ``update(doc=JSONSet('doc', key, value))``.
+
+    The whole write is one UPDATE, so concurrent writers to different keys of
+    the same row do not lose each other's changes. SQLite and PostgreSQL only.
+    """
+    output_field = JSONField()
+
+    def __init__(self, field, key, value):
+        super().__init__()
+        self.target = F(field) if isinstance(field, str) else field
+        self.key = str(key)
+        self.value = json.dumps(value)
+
+    def get_source_expressions(self):
+        return [self.target]
+
+    def set_source_expressions(self, exprs):
+        (self.target,) = exprs
+
+    def resolve_expression(self, query=None, allow_joins=True, reuse=None, summarize=False, for_save=False):
+        clone = self.copy()
+        clone.target = self.target.resolve_expression(query, allow_joins, reuse, summarize, for_save)
+        return clone
+
+    def as_sql(self, compiler, connection):
+        raise NotSupportedError(f'JSONSet is not supported on {connection.vendor}.')
+
+    def as_sqlite(self, compiler, connection):
+        field, params = compiler.compile(self.target)
+        return f'JSON_SET({field}, %s, JSON(%s))', (*params, f'$."{self.key}"', self.value)
+
+    def as_postgresql(self, compiler, connection):
+        field, params = compiler.compile(self.target)
+        return f'JSONB_SET({field}, %s::text[], %s::jsonb, true)', (*params, f'{{{self.key}}}', self.value)
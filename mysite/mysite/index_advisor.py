@@ -0,0 +1,247 @@
+"""
+Index proposals from captured queries (see ``mysite.querylog``).
+
+For each expensive query the advisor reads the WHERE and ORDER BY clauses of
+the slowest execution and derives, per table, the index an index-only plan
+would want: equality columns first, then one range column or, without one,
+the ORDER BY columns when they all belong to the query's main table. The
+query is then run through EXPLAIN with its captured parameters. A candidate
+is proposed when the plan shows a full scan, a separate sort step or an
+index that leaves part of the filter unindexed for that table, and no
+existing index (Meta.indexes, unique_together, unique or indexed fields)
+already starts with the same columns. Lookups that a unique key already
+pins to one row are skipped. Existing Meta.indexes that are a prefix of a
+proposal become redundant and are proposed for removal.
+
+Only tables of installed models are considered, and the SQL parsing is
+deliberately narrow: it understands the SQL Django generates, not SQL in
+general.
+"""
+import re
+from dataclasses import dataclass, field
+
+from django.apps import apps
+from django.db import connections, models
+from django.db.migrations import AddIndex, Migration, RemoveIndex
+from django.db.migrations.autodetector import MigrationAutodetector
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.writer import MigrationWriter
+
+_ALIAS = re.compile(r'(?:FROM|JOIN) "(\w+)"(?: AS)? "?([A-Z]\d+)"?')
+_TABLE = re.compile(r'\bFROM "(\w+)"')
+_PREDICATE = re.compile(r'"(\w+)"\."(\w+)"\s*(=|IN\b|IS\b|<=|>=|<|>|BETWEEN\b|LIKE\b|\)|AND\b|OR\b|$)')
+_ORDER_COLUMN = re.compile(r'"(\w+)"\."(\w+)"\s*(ASC|DESC)')
+_CLAUSE_END = re.compile(r'\b(?:GROUP BY|ORDER BY|LIMIT|HAVING)\b')
+_RANGE = {'<', '>', '<=', '>=', 'BETWEEN', 'LIKE'}
+
+
+@dataclass
+class Proposal:
+    model: type
+    fields: list
+    queries: list = field(default_factory=list)
+    reasons: set = field(default_factory=set)
+    redundant: list = field(default_factory=list)
+
+    @property
+    def index(self):
+        index = models.Index(fields=self.fields)
+        index.set_name_with_model(self.model)
+        return index
+
+    def meta_line(self):
+        return f"models.Index(fields={self.fields!r}),"
+
+
+def _models_by_table():
+    return {model._meta.db_table: model for model in apps.get_models()}
+
+
+def _resolve(table, aliases):
+    return aliases.get(table, table)
+
+
+def _field_name(model, column):
+    for model_field in model._meta.concrete_fields:
+        if model_field.column == column:
+            return model_field.name
+    return None
+
+
+def candidates(sql):
+    """``{table: [field columns, '-' prefixed when descending]}`` a query's filters and ordering want."""
+    if not sql.lstrip().upper().startswith('SELECT'):
+        return {}
+    aliases = {alias: table for table, alias in _ALIAS.findall(sql)}
+    main = _TABLE.search(sql)
+    where_at = sql.find(' WHERE ')
+    order_at = sql.rfind(' ORDER BY ')
+
+    equality, ranges = {}, {}
+    if where_at != -1:
+        where = sql[where_at:]
+        end = _CLAUSE_END.search(where)
+        where = where[:end.start()] if end else where
+        for table, column, operator in _PREDICATE.findall(where):
+            table = _resolve(table, aliases)
+            target = ranges if operator.upper() in _RANGE else equality
+            columns = target.setdefault(table, [])
+            if column not in columns:
+                columns.append(column)
+
+    ordering = []
+    if order_at != -1:
+        ordering = [(_resolve(table, aliases), column, direction)
+                    for table, column, direction in _ORDER_COLUMN.findall(sql[order_at:])]
+
+    wanted = {}
+    for table in set(equality) | set(ranges):
+        columns = list(equality.get(table, []))
+        columns += [column for column in ranges.get(table, [])[:1] if column not in columns]
+        wanted[table] = columns
+    # An index can only return rows in ORDER BY order when every column before
+    # the ordering columns is matched by equality.
+    if main and ordering and main.group(1) not in ranges and all(table == main.group(1) for table, _, _ in ordering):
+        columns = wanted.setdefault(main.group(1), [])
+        for _, column, direction in ordering:
+            if column not in columns:
+                columns.append(('-' if direction == 'DESC' else '') + column)
+    return wanted
+
+
+def explain(sql, params, alias='default'):
+    connection = connections[alias]
+    with connection.cursor() as cursor:
+        cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+        rows = cursor.fetchall()
+    if connection.vendor == 'sqlite':
+        return [row[-1] for row in rows]
+    return [row[0] for row in rows]
+
+
+def plan_problems(plan, table, columns, vendor):
+    """Why ``plan`` could use a better index on ``table``; empty when it looks fine."""
+    problems = set()
+    text = '\n'.join(plan)
+    names = rf'(?:{re.escape(table)}|[A-Z]\d+)'
+    if vendor == 'sqlite':
+        if re.search(rf'\bSCAN {names}\b(?! USING (?:COVERING )?INDEX)', text):
+            problems.add('full scan')
+        if 'TEMP B-TREE FOR ORDER BY' in text:
+            problems.add('sort')
+        for used in re.findall(rf'\bSEARCH {names}\b.*USING (?:COVERING )?INDEX \w+ \(([^)]*)\)', text):
+            if used.count('?') < len([c for c in columns if not c.startswith('-')]):
+                problems.add('partial index')
+    else:
+        if re.search(rf'Seq Scan on {re.escape(table)}\b', text):
+            problems.add('full scan')
+        if re.search(r'^\s*(?:->\s*)?Sort\b', text, re.MULTILINE):
+            problems.add('sort')
+        if re.search(rf'Index Scan(?: Backward)? using \w+ on {re.escape(table)}\b[^\n]*\n(?:[^\n]*\n)*?\s*Filter:', text):
+            problems.add('partial index')
+    return problems
+
+
+def existing_prefixes(model):
+    """Field lists of every index the model's table already has, directions dropped."""
+    meta = model._meta
+    indexed = [[index_field.lstrip('-') for index_field in index.fields] for index in meta.indexes]
+    indexed += [list(fields) for fields in meta.unique_together]
+    indexed += [[constraint_field for constraint_field in constraint.fields]
+                for constraint in meta.constraints if getattr(constraint, 'fields', None)]
+    indexed += [[model_field.name] for model_field in meta.concrete_fields
+                if model_field.primary_key or model_field.unique or model_field.db_index]
+    return indexed
+
+
+def unique_lookup(model, fields):
+    """Whether equality on ``fields`` already pins at most one row through a unique index."""
+    meta = model._meta
+    names = set(fields)
+    keys = [{model_field.name} for model_field in meta.concrete_fields if model_field.primary_key or model_field.unique]
+    keys += [set(fields) for fields in meta.unique_together]
+    keys += [set(constraint.fields) for constraint in meta.constraints
+             if isinstance(constraint, models.UniqueConstraint) and constraint.fields and constraint.condition is None]
+    return any(key <= names for key in keys)
+
+
+def covered(model, fields):
+    plain = [name.lstrip('-') for name in fields]
+    return any(index[:len(plain)] == plain for index in existing_prefixes(model))
+
+
+def propose(groups):
+    """Proposals for the given query groups (``QueryStats.top()``), best first."""
+    tables = _models_by_table()
+    proposals = {}
+    for group in groups:
+        wanted = candidates(group['sql'])
+        if not wanted:
+            continue
+        vendor = connections[group['alias']].vendor
+        try:
+            plan = explain(group['sql'], group['params'], group['alias'])
+        except Exception as exc:
+            plan = [f'EXPLAIN failed: {exc}']
+        group['plan'] = plan
+        for table, columns in wanted.items():
+            model = tables.get(table)
+            if model is None:
+                continue
+            fields = []
+            for column in columns:
+                name = _field_name(model, column.lstrip('-'))
+                if name is None:
+                    break
+                fields.append(('-' if column.startswith('-') else '') + name)
+            if not fields or unique_lookup(model, fields) or covered(model, fields):
+                continue
+            problems = plan_problems(plan, table, columns, vendor)
+            if not problems:
+                continue
+            key = (model, tuple(fields))
+            proposal = proposals.setdefault(key, Proposal(model, fields))
+            proposal.queries.append(group)
+            proposal.reasons |= problems
+
+    # A proposal that is a prefix of another on the same model is subsumed by it.
+    result = []
+    for (model, fields), proposal in proposals.items():
+        longer = [other for (other_model, other_fields), other in proposals.items()
+                  if other_model is model and len(other_fields) > len(fields)
+                  and [f.lstrip('-') for f in other_fields[:len(fields)]] == [f.lstrip('-') for f in fields]]
+        if longer:
+            longer[0].queries += proposal.queries
+            longer[0].reasons |= proposal.reasons
+            continue
+        proposal.redundant = [
+            index for index in model._meta.indexes
+            if index.name and [f.lstrip('-') for f in index.fields] == [f.lstrip('-') for f in fields[:len(index.fields)]]
+        ]
+        result.append(proposal)
+    return sorted(result, key=lambda p: sum(group['total_ms'] for group in p.queries), reverse=True)
+
+
+def migrations(proposals, name='advised_indexes'):
+    """One unapplied ``(Migration, MigrationWriter)`` per app, after the app's latest migration."""
+    loader = MigrationLoader(None, ignore_no_migrations=True)
+    by_app = {}
+    for proposal in proposals:
+        by_app.setdefault(proposal.model._meta.app_label, []).append(proposal)
+
+    result = []
+    removed = set()
+    for app_label, app_proposals in sorted(by_app.items()):
+        leaves = loader.graph.leaf_nodes(app_label)
+        number = max((MigrationAutodetector.parse_number(leaf) or 0 for _, leaf in leaves), default=0) + 1
+        migration = Migration(f'{number:04d}_{name}', app_label)
+        migration.dependencies = leaves
+        for proposal in app_proposals:
+            model_name = proposal.model._meta.model_name
+            migration.operations.append(AddIndex(model_name=model_name, index=proposal.index))
+            for index in proposal.redundant:
+                if index.name not in removed:
+                    removed.add(index.name)
+                    migration.operations.append(RemoveIndex(model_name=model_name, name=index.name))
+        result.append((migration, MigrationWriter(migration)))
+    return result
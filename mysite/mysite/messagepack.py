@@ -0,0 +1,97 @@
+"""
+MessagePack support for the API.
+
+Clients opt in with ``Accept: application/msgpack`` and/or
+``Content-Type: application/msgpack``; JSON stays the default.
+
+Two extension types keep exam payloads compact:
+
+* ``1`` - a UUID as its 16 raw bytes (canonical UUID strings are 36 bytes).
+* ``2`` - a decimal as a packed ``[unscaled, exponent]`` pair, e.g. ``"12.50"``
+  becomes ``[1250, -2]``. Applied to the decimal score/points fields, which DRF
+  otherwise renders as strings.
+
+The parser turns both back into the strings the serializers already accept,
+so views see the same input as with JSON.
+"""
+import datetime
+import re
+import uuid
+from decimal import Decimal, InvalidOperation
+
+import msgpack
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+
+EXT_UUID = 1
+EXT_DECIMAL = 2
+
+UUID_RE = re.compile(r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$')
+
+# DecimalField names rendered by StudentResponseSerializer, ExamAssignmentSerializer
+# and the exam paper serializers.
+DECIMAL_FIELDS = frozenset({'points', 'score', 'auto_score', 'manual_score', 'partial_credit_points'})
+
+
+def _decimal_ext(value):
+    sign, digits, exponent = value.as_tuple()
+    if not isinstance(exponent, int):
+        # NaN and infinities have no compact form.
+        return str(value)
+    unscaled = int(''.join(map(str, digits)) or '0')
+    return msgpack.ExtType(EXT_DECIMAL, msgpack.packb([-unscaled if sign else unscaled, exponent]))
+
+
+def encode(obj, key=None):
+    if isinstance(obj, dict):
+        return {k: encode(v, k) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [encode(v, key) for v in obj]
+    if isinstance(obj, str):
+        if len(obj) == 36 and UUID_RE.match(obj):
+            return msgpack.ExtType(EXT_UUID, uuid.UUID(obj).bytes)
+        if key in DECIMAL_FIELDS:
+            try:
+                return _decimal_ext(Decimal(obj))
+            except InvalidOperation:
+                return obj
+        return obj
+    if isinstance(obj, uuid.UUID):
+        return msgpack.ExtType(EXT_UUID, obj.bytes)
+    if isinstance(obj, Decimal):
+        return _decimal_ext(obj)
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    return obj
+
+
+def decode_ext(code, data):
+    if code == EXT_UUID:
+        return str(uuid.UUID(bytes=data))
+    if code == EXT_DECIMAL:
+        unscaled, exponent = msgpack.unpackb(data)
+        return str(Decimal(unscaled).scaleb(exponent))
+    return msgpack.ExtType(code, data)
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(encode(data), use_bin_type=True, default=str)
+
+
+class MessagePackParser(BaseParser):
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False, ext_hook=decode_ext)
+        except (ValueError, TypeError, msgpack.UnpackException) as exc:
+            raise ParseError(f'MessagePack parse error - {exc}')
@@ -0,0 +1,125 @@
+"""
+Capture of executed SQL for the index advisor (``advise_indexes``).
+
+Queries are grouped by their normalized text: literals and placeholders
+become ``?`` and ``IN`` lists collapse to ``IN (...)``, so every execution of
+the same ORM query lands in one group with its count, total and maximum
+time, and the parameters of its slowest execution for EXPLAIN.
+
+Two ways to collect them:
+
+* ``capture(stats)`` wraps every connection for the duration of a block; the
+  advisor uses it around an in-process benchmark run.
+* With ``QUERY_CAPTURE_PATH`` set, every new connection appends one JSON line
+  per sampled query (``QUERY_CAPTURE_SAMPLE``) to that file, in any process:
+  a test run, a staging server or a canary in production. ``load()`` reads the
+  file back.
+"""
+import json
+import random
+import re
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'(?<![\w."])-?\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s|\?')
+_IN_LIST = re.compile(r'\bIN \((?:\?(?:, )?)+\)')
+_SPACE = re.compile(r'\s+')
+
+
+def normalize(sql):
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+class QueryStats:
+    """Executions grouped by normalized SQL."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.groups = {}
+
+    def add(self, sql, params, ms, alias='default'):
+        key = normalize(sql)
+        with self._lock:
+            group = self.groups.get(key)
+            if group is None:
+                group = self.groups[key] = {
+                    'normalized': key, 'count': 0, 'total_ms': 0.0, 'max_ms': -1.0,
+                    'sql': sql, 'params': params, 'alias': alias,
+                }
+            group['count'] += 1
+            group['total_ms'] += ms
+            if ms > group['max_ms']:
+                group.update(max_ms=ms, sql=sql, params=params, alias=alias)
+
+    def top(self, limit, min_count=1):
+        """The most expensive groups by total time."""
+        groups = [group for group in self.groups.values() if group['count'] >= min_count]
+        return sorted(groups, key=lambda group: group['total_ms'], reverse=True)[:limit]
+
+
+def _plain(params):
+    return json.loads(json.dumps(list(params or ()), default=str))
+
+
+def _timed(record, alias):
+    def wrapper(execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if not many:
+                record(sql, params, (time.perf_counter() - started) * 1000, alias)
+    return wrapper
+
+
+@contextmanager
+def capture(stats):
+    """Add every query run on any connection inside the block to ``stats``."""
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(_timed(stats.add, connection.alias)))
+        yield stats
+
+
+def load(path, stats):
+    with open(path) as log:
+        for line in log:
+            if line.strip():
+                entry = json.loads(line)
+                stats.add(entry['sql'], entry['params'], entry['ms'], entry.get('alias', 'default'))
+    return stats
+
+
+class FileRecorder:
+    def __init__(self, path, sample=1.0):
+        self.path = path
+        self.sample = sample
+        self._lock = threading.Lock()
+
+    def __call__(self, sql, params, ms, alias):
+        if self.sample < 1 and random.random() >= self.sample:
+            return
+        line = json.dumps({'sql': sql, 'params': _plain(params), 'ms': round(ms, 3), 'alias': alias})
+        with self._lock, open(self.path, 'a') as log:
+            log.write(line + '\n')
+
+
+def install(path, sample=1.0):
+    """Record queries of every connection opened from now on to ``path``."""
+    recorder = FileRecorder(path, sample)
+
+    def on_connection_created(sender, connection, **kwargs):
+        connection.execute_wrappers.append(_timed(recorder, connection.alias))
+
+    connection_created.connect(on_connection_created, weak=False, dispatch_uid='mysite.querylog')
+    return recorder
@@ -41,6 +41,7 @@ INSTALLED_APPS = [
     'submissions',
     'questions',
     'security',
+    'jobs',
 ]
 
 AUTH_USER_MODEL = 'accounts.CustomUser'
@@ -54,6 +55,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'mysite.db_router.ReplicaRoutingMiddleware',
 ]
 
 ROOT_URLCONF = 'mysite.urls'
@@ -87,6 +89,30 @@ DATABASES = {
 }
 DATABASES['default']['CONN_MAX_AGE'] = 600 # 10 minutes
 
+# Optional read replica. Safe-method API requests read from it; see mysite/db_router.py.
+REPLICA_DATABASE_URL = config('REPLICA_DATABASE_URL', default='')
+if REPLICA_DATABASE_URL:
+    DATABASES['replica'] = dj_database_url.parse(REPLICA_DATABASE_URL)
+    DATABASES['replica']['CONN_MAX_AGE'] = 600
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ['mysite.db_router.PrimaryReplicaRouter']
+# How long a client stays pinned to the primary after a write (replication lag allowance).
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=30, cast=int)
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/ref/settings/#caches
+# Throttle buckets, idempotency keys and the version keys that tell other
+# processes to reload (accounts/cache.py, submissions/ranking.py) must be
+# shared by every worker process, so deployments running more than one set
+# CACHE_URL to a Redis server, e.g. redis://localhost:6379/1. Without it each
+# process has its own local-memory cache, which only suits a single process.
+CACHE_URL = config('CACHE_URL', default='')
+if CACHE_URL:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': CACHE_URL}}
+else:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -113,6 +139,18 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # JSON stays the default; MessagePack is negotiated via Accept/Content-Type.
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'mysite.messagepack.MessagePackRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+        'mysite.messagepack.MessagePackParser',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_FILTER_BACKENDS': [
@@ -122,6 +160,49 @@ REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
 
+# Serialized exam papers are cached per exam version; see exams/services.py.
+EXAM_PAPER_CACHE_SECONDS = config('EXAM_PAPER_CACHE_SECONDS', default=600, cast=int)
+
+# prewarm_exams keeps an exam's row and papers cached until this long after
+# its scheduled start.
+EXAM_PREWARM_SECONDS = config('EXAM_PREWARM_SECONDS', default=900, cast=int)
+# Concurrent start_exam requests per worker process, and how long excess
+# requests wait for a slot before getting 503.
+START_EXAM_CONCURRENCY = config('START_EXAM_CONCURRENCY', default=8, cast=int)
+START_EXAM_QUEUE_SECONDS = config('START_EXAM_QUEUE_SECONDS', default=5, cast=float)
+
+# archive_attempts writes compressed segments of old graded attempts here.
+ARCHIVE_ROOT = config('ARCHIVE_ROOT', default=str(BASE_DIR / 'archive'))
+
+# Token-bucket limits for answer autosave and proctoring ingestion; see
+# submissions/throttling.py. Per-attempt rates can be overridden on each exam.
+ANSWER_RATE_PER_MINUTE = config('ANSWER_RATE_PER_MINUTE', default=60, cast=int)
+ANSWER_USER_RATE_PER_MINUTE = config('ANSWER_USER_RATE_PER_MINUTE', default=120, cast=int)
+ACTIVITY_RATE_PER_MINUTE = config('ACTIVITY_RATE_PER_MINUTE', default=30, cast=int)
+ACTIVITY_USER_RATE_PER_MINUTE = config('ACTIVITY_USER_RATE_PER_MINUTE', default=60, cast=int)
+# A full bucket holds this many seconds' worth of requests.
+THROTTLE_BURST_SECONDS = config('THROTTLE_BURST_SECONDS', default=30, cast=int)
+
+# Responses to exam-taking requests sent with an Idempotency-Key are replayed
+# to retries for this long; see submissions/idempotency.py.
+IDEMPOTENCY_TTL_SECONDS = config('IDEMPOTENCY_TTL_SECONDS', default=300, cast=int)
+
+# Offline answer uploads (upload_answers) are accepted until this long after
+# the attempt's deadline; answers saved after the deadline are still rejected.
+OFFLINE_UPLOAD_GRACE_SECONDS = config('OFFLINE_UPLOAD_GRACE_SECONDS', default=900, cast=int)
+
+# Background jobs run by `manage.py runworker`; see jobs/services.py. A running
+# job whose worker has not refreshed it for JOBS_LEASE_SECONDS is queued again.
+JOBS_POLL_SECONDS = config('JOBS_POLL_SECONDS', default=1.0, cast=float)
+JOBS_LEASE_SECONDS = config('JOBS_LEASE_SECONDS', default=300, cast=int)
+# First retry delay; doubled for each later attempt.
+JOBS_RETRY_DELAY_SECONDS = config('JOBS_RETRY_DELAY_SECONDS', default=30, cast=int)
+
+# When set, every query is appended to this JSON Lines file for
+# advise_indexes; see mysite/querylog.py. Sample a fraction outside tests.
+QUERY_CAPTURE_PATH = config('QUERY_CAPTURE_PATH', default='')
+QUERY_CAPTURE_SAMPLE = config('QUERY_CAPTURE_SAMPLE', default=1.0, cast=float)
+
 # Simple JWT
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=24),
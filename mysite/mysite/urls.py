@@ -10,6 +10,7 @@ urlpatterns = [
     path('api/accounts/', include('accounts.urls')),
     path('api/', include('exams.urls')),
     path('api/submissions/', include('submissions.urls')),
+    path('api/jobs/', include('jobs.urls')),
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
 ]
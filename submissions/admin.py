@@ -1,34 +1,131 @@
 
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections, router
+from django.forms.models import BaseInlineFormSet
+from django.urls import reverse
+from django.utils.functional import cached_property
+from django.utils.html import format_html
 from .models import ExamAssignment, StudentResponse, SuspiciousActivity, AuditLog
 
+# Unfiltered changelists of tables at least this large show the planner's row
+# estimate instead of running COUNT(*).
+ESTIMATE_THRESHOLD = 10000
+
+
+def estimated_count(model):
+    """The planner's row estimate for ``model``'s table, or None where there is none."""
+    connection = connections[router.db_for_read(model)]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [model._meta.db_table])
+        row = cursor.fetchone()
+    # reltuples is -1 (or 0) until the table is first analyzed.
+    return row[0] if row and row[0] > 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_count(queryset.model)
+            if estimate is not None and estimate >= ESTIMATE_THRESHOLD:
+                return estimate
+        return super().count
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    # Skip the second, unfiltered COUNT(*) the changelist runs for "x of y".
+    show_full_result_count = False
+
+
+class PaginatedInlineFormSet(BaseInlineFormSet):
+    per_page = 50
+    page_number = 1
+
+    def get_queryset(self):
+        if not hasattr(self, '_page_objects'):
+            self.page = Paginator(super().get_queryset(), self.per_page).get_page(self.page_number)
+            self._page_objects = list(self.page.object_list)
+        return self._page_objects
+
+
 class StudentResponseInline(admin.TabularInline):
+    """One page of an assignment's responses, read-only; ``?responses_page=`` picks the page."""
     model = StudentResponse
+    formset = PaginatedInlineFormSet
+    per_page = 50
     extra = 0
-    readonly_fields = ('student', 'question', 'answer_text', 'answer_options', 'auto_score', 'manual_score')
+    fields = readonly_fields = ('question', 'answer_text', 'answer_options', 'auto_score', 'manual_score')
+    show_change_link = True
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('question')
+
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+        return type(formset.__name__, (formset,), {
+            'per_page': self.per_page,
+            'page_number': request.GET.get('responses_page', 1),
+        })
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
 
 @admin.register(ExamAssignment)
-class ExamAssignmentAdmin(admin.ModelAdmin):
+class ExamAssignmentAdmin(LargeTableAdmin):
     list_display = ('exam', 'student', 'status', 'score', 'started_at', 'submitted_at')
     list_filter = ('status', 'exam__specialization')
+    list_select_related = ('exam', 'student')
     search_fields = ('student__email', 'exam__title')
+    autocomplete_fields = ('exam',)
+    raw_id_fields = ('student',)
+    readonly_fields = ('response_pages',)
     inlines = [StudentResponseInline]
 
+    @admin.display(description='Responses')
+    def response_pages(self, obj):
+        if obj.pk is None:
+            return '-'
+        total = obj.responses.count()
+        pages = max(1, -(-total // StudentResponseInline.per_page))
+        changelist = reverse('admin:submissions_studentresponse_changelist')
+        return format_html(
+            '{} responses in {} pages of {} (add <code>?responses_page=N</code> to this URL); '
+            '<a href="{}?exam_assignment__id__exact={}">open in the response list</a>',
+            total, pages, StudentResponseInline.per_page, changelist, obj.pk,
+        )
+
 @admin.register(StudentResponse)
-class StudentResponseAdmin(admin.ModelAdmin):
+class StudentResponseAdmin(LargeTableAdmin):
     list_display = ('student', 'question', 'exam_assignment', 'is_answered', 'auto_score', 'manual_score')
     list_filter = ('is_answered', 'is_flagged')
+    list_select_related = ('student', 'question', 'exam_assignment__exam', 'exam_assignment__student')
     search_fields = ('student__email', 'question__question_text')
+    autocomplete_fields = ('question',)
+    raw_id_fields = ('exam_assignment', 'student')
 
 @admin.register(SuspiciousActivity)
-class SuspiciousActivityAdmin(admin.ModelAdmin):
+class SuspiciousActivityAdmin(LargeTableAdmin):
     list_display = ('student', 'exam_assignment', 'activity_type', 'severity', 'timestamp')
     list_filter = ('activity_type', 'severity', 'instructor_reviewed')
+    list_select_related = ('student', 'exam_assignment__exam', 'exam_assignment__student')
     search_fields = ('student__email', 'exam_assignment__exam__title')
+    raw_id_fields = ('exam_assignment', 'student')
 
 @admin.register(AuditLog)
-class AuditLogAdmin(admin.ModelAdmin):
+class AuditLogAdmin(LargeTableAdmin):
     list_display = ('user', 'action', 'entity_type', 'entity_id', 'timestamp')
-    list_filter = ('action', 'entity_type', 'user')
+    list_filter = ('action', 'entity_type')
+    list_select_related = ('user',)
     search_fields = ('user__email', 'entity_id')
-
+    raw_id_fields = ('user',)
@@ -0,0 +1,40 @@
+"""
+Per-process admission control for bursty endpoints.
+
+At an exam's scheduled start every student calls ``start_exam`` within a few
+seconds. ``AdmissionGate`` lets at most ``limit`` of those run at once in a
+worker process; the rest wait up to ``timeout`` seconds for a slot and are
+then turned away with 503 and ``Retry-After``, which the client can honour
+instead of timing out. The gate blocks a thread while waiting, so it suits
+threaded WSGI workers; it does not coordinate across processes.
+"""
+import math
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+
+
+class Overloaded(Exception):
+    def __init__(self, retry_after):
+        super().__init__('The server is busy; retry shortly.')
+        self.retry_after = retry_after
+
+
+class AdmissionGate:
+    def __init__(self, limit, timeout):
+        self.limit = limit
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(limit)
+
+    @contextmanager
+    def admit(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise Overloaded(max(1, math.ceil(self.timeout)))
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+
+start_gate = AdmissionGate(settings.START_EXAM_CONCURRENCY, settings.START_EXAM_QUEUE_SECONDS)
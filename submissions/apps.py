@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class SubmissionsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'submissions'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        if settings.QUERY_CAPTURE_PATH:
+            from mysite import querylog
+            querylog.install(settings.QUERY_CAPTURE_PATH, settings.QUERY_CAPTURE_SAMPLE)
@@ -0,0 +1,55 @@
+"""
+Compressed JSON Lines segments for archived exam attempts.
+
+Each exam has one segment file, ``<exam id>.jsonl.gz`` under
+``ARCHIVE_ROOT``. Every attempt is written as its own gzip member holding
+one JSON line, so the file as a whole still reads with ``zcat`` while a
+single attempt can be read back by seeking to its member's offset. The
+offsets and lengths live in ``ArchivedAssignment``.
+
+Segments are only appended to. Bytes written by a run that failed before
+committing its index rows are unreachable but harmless.
+"""
+import gzip
+import json
+import os
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+def segment_name(exam_id):
+    return f'{exam_id}.jsonl.gz'
+
+
+def segment_path(name):
+    return os.path.join(settings.ARCHIVE_ROOT, name)
+
+
+def append(name, records):
+    """Append ``records`` to a segment; returns ``[(offset, length), ...]`` in order.
+
+    The file is fsynced before returning, so index rows committed afterwards
+    never point at data that could still be lost.
+    """
+    path = segment_path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    slices = []
+    with open(path, 'ab') as segment:
+        offset = segment.seek(0, os.SEEK_END)
+        for record in records:
+            line = json.dumps(record, cls=DjangoJSONEncoder, separators=(',', ':')) + '\n'
+            member = gzip.compress(line.encode(), mtime=0)
+            segment.write(member)
+            slices.append((offset, len(member)))
+            offset += len(member)
+        segment.flush()
+        os.fsync(segment.fileno())
+    return slices
+
+
+def read(name, offset, length):
+    with open(segment_path(name), 'rb') as segment:
+        segment.seek(offset)
+        member = segment.read(length)
+    return json.loads(gzip.decompress(member))
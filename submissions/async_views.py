@@ -0,0 +1,189 @@
+"""
+Async views served under ASGI.
+
+Answer autosave
+---------------
+
+``submit_answer`` is the hottest endpoint during a sitting: every student
+autosaves every few seconds. Under ASGI (``uvicorn mysite.asgi:application``)
+this view runs on the event loop and awaits the async ORM, so a worker is not
+tied up while the database round trips are in flight. It accepts the same body
+as ``ExamAssignmentViewSet.submit_answer`` and returns the same payload; the
+DRF action remains the reference implementation. Both draw from the same
+``submissions.throttling`` buckets and honour the same ``Idempotency-Key``
+entries.
+
+Proctoring stream
+-----------------
+``exam_events`` is a server-sent event stream of an exam's new suspicious
+activity and assignment status changes, fed by ``submissions.events.hub``.
+``EventSource`` cannot send headers, so the access token may be passed as the
+``token`` query parameter.
+
+DRF's views are synchronous, so authentication, parsing and rendering are done
+here directly with the same JWT backend, parsers and renderers.
+"""
+import asyncio
+import io
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework import status
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from mysite.messagepack import MessagePackParser, MessagePackRenderer
+
+from exams.models import Exam
+
+from .events import QUEUE_SIZE, hub
+from .serializers import StudentResponseSerializer
+from .services import ExamAssignmentService
+from . import idempotency, throttling
+
+User = get_user_model()
+
+_jwt = JWTAuthentication()
+
+# Comment frames keep proxies from closing an idle stream.
+HEARTBEAT_SECONDS = 15
+
+
+def _render(request, data, status_code=status.HTTP_200_OK):
+    renderer = JSONRenderer()
+    if MessagePackRenderer.media_type in request.headers.get('Accept', ''):
+        renderer = MessagePackRenderer()
+    content_type = renderer.media_type
+    if renderer.charset:
+        content_type = f'{content_type}; charset={renderer.charset}'
+    return HttpResponse(renderer.render(data), status=status_code, content_type=content_type)
+
+
+def _parse(request):
+    parser = JSONParser()
+    if request.content_type == MessagePackParser.media_type:
+        parser = MessagePackParser()
+    data = parser.parse(io.BytesIO(request.body))
+    if not isinstance(data, dict):
+        raise ParseError('Expected an object.')
+    return data
+
+
+async def _authenticate(request, allow_query_token=False):
+    raw_token = _jwt.get_raw_token(_jwt.get_header(request) or b'')
+    if raw_token is None and allow_query_token and request.GET.get('token'):
+        raw_token = request.GET['token'].encode()
+    if raw_token is None:
+        return None
+    try:
+        token = _jwt.get_validated_token(raw_token)
+    except (InvalidToken, TokenError):
+        return None
+    try:
+        return await User.objects.aget(**{jwt_settings.USER_ID_FIELD: token[jwt_settings.USER_ID_CLAIM], 'is_active': True})
+    except (KeyError, User.DoesNotExist):
+        return None
+
+
+def _unauthorized(request):
+    response = _render(request, {'detail': 'Authentication credentials were not provided.'},
+                       status.HTTP_401_UNAUTHORIZED)
+    response['WWW-Authenticate'] = _jwt.authenticate_header(request)
+    return response
+
+
+@csrf_exempt
+@require_POST
+async def submit_answer(request, pk):
+    user = await _authenticate(request)
+    if user is None:
+        return _unauthorized(request)
+
+    # Same scope as the DRF action, so a retry may land on either path.
+    scope = f'submit_answer:{pk}'
+    key = request.headers.get(idempotency.HEADER)
+    # A retry of a stored request is replayed below and costs no token.
+    stored = key and await sync_to_async(idempotency.existing)(user.id, scope, key)
+    wait = None if stored else await sync_to_async(throttling.check)('answer', user.id, pk)
+    if wait is not None:
+        response = _render(request, {'detail': 'Request was throttled.'}, status.HTTP_429_TOO_MANY_REQUESTS)
+        response['Retry-After'] = str(throttling.retry_after(wait))
+        return response
+
+    try:
+        answer_data = _parse(request)
+    except ParseError as exc:
+        return _render(request, {'detail': str(exc.detail)}, status.HTTP_400_BAD_REQUEST)
+
+    if not key:
+        status_code, data = await _submit_answer(pk, user, answer_data)
+        return _render(request, data, status_code)
+    if len(key) > idempotency.MAX_KEY_LENGTH:
+        entry = idempotency.invalid_key()
+        return _render(request, entry['data'], entry['status'])
+
+    entry_key = idempotency.cache_key(user.id, scope, key)
+    body_fingerprint = idempotency.fingerprint(answer_data)
+    entry = await sync_to_async(idempotency.begin)(entry_key, body_fingerprint)
+    if entry is not None:
+        return idempotency.replayed(_render(request, entry['data'], entry['status']), entry)
+    try:
+        status_code, data = await _submit_answer(pk, user, answer_data)
+    except BaseException:
+        await sync_to_async(cache.delete)(entry_key)
+        raise
+    await sync_to_async(idempotency.finish)(entry_key, body_fingerprint, status_code, data)
+    return _render(request, data, status_code)
+
+
+async def _submit_answer(pk, user, answer_data):
+    try:
+        response = await ExamAssignmentService.asubmit_answer(
+            pk, answer_data.get('question_id'), user.id, answer_data
+        )
+    except (DjangoValidationError, ValueError, TypeError) as e:
+        return status.HTTP_400_BAD_REQUEST, {'error': str(e)}
+    return status.HTTP_200_OK, StudentResponseSerializer(response).data
+
+
+async def _event_stream(exam_id):
+    loop = asyncio.get_running_loop()
+    subscription = hub.subscribe(exam_id, loop, asyncio.Queue(QUEUE_SIZE))
+    try:
+        yield f'retry: {HEARTBEAT_SECONDS * 1000}\n\n'
+        while True:
+            try:
+                event_id, event_type, data = await asyncio.wait_for(subscription.queue.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            yield f'id: {event_id}\nevent: {event_type}\ndata: {data}\n\n'
+    finally:
+        hub.unsubscribe(exam_id, subscription)
+
+
+@require_GET
+async def exam_events(request, exam_id):
+    user = await _authenticate(request, allow_query_token=True)
+    if user is None:
+        return _unauthorized(request)
+
+    exams = Exam.objects.filter(id=exam_id)
+    if not (user.is_staff or user.role == User.Role.ADMIN):
+        exams = exams.filter(instructor=user)
+    if not await exams.aexists():
+        return _render(request, {'detail': 'Not found.'}, status.HTTP_404_NOT_FOUND)
+
+    response = StreamingHttpResponse(_event_stream(exam_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,120 @@
+"""
+In-process publish/subscribe hub for live proctoring events.
+
+Writers publish compact JSON events keyed by exam id once their transaction
+commits; each SSE connection watching that exam holds a bounded queue on its
+own event loop. An event is encoded once and handed to every subscriber, so
+N instructors watching one exam cost a single fan-out instead of N polls of
+``SuspiciousActivityViewSet.list``.
+
+Attempts on a generated variant are published under its template's id, the
+exam its instructor watches, as ``StatisticsService.key`` does for the
+score statistics.
+
+The hub lives in the process that handled the write. Deployments running
+several ASGI worker processes should route an exam's writers and watchers to
+the same process, or accept that a watcher only sees events from its own.
+"""
+import itertools
+import json
+import threading
+from collections import defaultdict
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+# Events held per subscriber before the oldest ones are dropped; a watcher
+# that falls this far behind should re-fetch the list endpoint.
+QUEUE_SIZE = 256
+
+
+class Subscription:
+    def __init__(self, loop, queue):
+        self.loop = loop
+        self.queue = queue
+        self.dropped = 0
+
+    def offer(self, event):
+        # Runs on the subscriber's loop.
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+
+class EventHub:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+        self._ids = itertools.count(1)
+
+    def subscribe(self, exam_id, loop, queue):
+        subscription = Subscription(loop, queue)
+        with self._lock:
+            self._subscribers[str(exam_id)].add(subscription)
+        return subscription
+
+    def unsubscribe(self, exam_id, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(str(exam_id))
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[str(exam_id)]
+
+    def has_subscribers(self, exam_id=None):
+        """Whether anyone watches ``exam_id`` (any exam when it is None) in this process."""
+        if exam_id is None:
+            return bool(self._subscribers)
+        return bool(self._subscribers.get(str(exam_id)))
+
+    def publish(self, exam_id, event_type, payload):
+        """Encode ``payload`` once and queue it for every watcher of the exam.
+
+        Safe to call from any thread; delivery happens on each subscriber's loop.
+        """
+        with self._lock:
+            subscribers = list(self._subscribers.get(str(exam_id), ()))
+        if not subscribers:
+            return None
+        event = (next(self._ids), event_type, json.dumps(payload, cls=DjangoJSONEncoder, separators=(',', ':')))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, event)
+            except RuntimeError:
+                # The subscriber's loop has closed; its stream is gone.
+                self.unsubscribe(exam_id, subscription)
+        return event
+
+
+hub = EventHub()
+
+
+def watched_exam_id(exam):
+    return exam.parent_id or exam.id
+
+
+def publish_activity(activity, exam_id):
+    """Publish ``activity`` to the watchers of ``exam_id``, the ``watched_exam_id`` of its attempt."""
+    payload = {
+        'id': activity.id,
+        'assignment': activity.exam_assignment_id,
+        'student': activity.student_id,
+        'activity_type': activity.activity_type,
+        'severity': activity.severity,
+        'timestamp': activity.timestamp,
+    }
+    transaction.on_commit(lambda: hub.publish(exam_id, 'activity', payload))
+
+
+def publish_assignment(assignment):
+    payload = {
+        'id': assignment.id,
+        'student': assignment.student_id,
+        'status': assignment.status,
+        'score': assignment.score,
+        'started_at': assignment.started_at,
+        'submitted_at': assignment.submitted_at,
+    }
+    exam_id = watched_exam_id(assignment.exam)
+    transaction.on_commit(lambda: hub.publish(exam_id, 'assignment', payload))
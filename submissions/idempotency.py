@@ -0,0 +1,119 @@
+"""
+Replay of exam-taking responses for retried requests.
+
+A client may send an ``Idempotency-Key`` header with ``start_exam``,
+``submit_answer`` and ``submit_exam``. The first request with a key claims it
+in the cache, runs, and stores its status and response data for
+``IDEMPOTENCY_TTL_SECONDS``. A retry with the same key, user, action and
+assignment gets that response back, re-rendered for its own Accept header,
+without the view running at all. While the first request is still running a
+retry gets 409, and a key reused with a different body gets 422. Server
+errors are not stored, so the request can be retried for real.
+"""
+import hashlib
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+# How long a claimed key blocks retries if its request never finishes.
+PENDING_SECONDS = 30
+
+PENDING = 'pending'
+
+
+def cache_key(user_id, scope, key):
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return f'submissions:idempotency:{user_id}:{scope}:{digest}'
+
+
+def fingerprint(data):
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def existing(user_id, scope, key):
+    """The entry already held for ``key``, if any, without claiming it.
+
+    Throttles use it so that a retry, which will be replayed or refused,
+    is not charged for a token.
+    """
+    if not key or len(key) > MAX_KEY_LENGTH:
+        return None
+    return cache.get(cache_key(user_id, scope, key))
+
+
+def action_scope(view):
+    return f"{view.action}:{view.kwargs.get('pk', '')}"
+
+
+def begin(entry_key, body_fingerprint):
+    """Claim ``entry_key``; return None if claimed, else the stored entry or error response data."""
+    if cache.add(entry_key, {'state': PENDING, 'fingerprint': body_fingerprint}, PENDING_SECONDS):
+        return None
+    entry = cache.get(entry_key)
+    if entry is None:
+        # Expired between add() and get(); run the request as new.
+        return None if cache.add(entry_key, {'state': PENDING, 'fingerprint': body_fingerprint}, PENDING_SECONDS) else conflict()
+    if entry['fingerprint'] != body_fingerprint:
+        return {'status': status.HTTP_422_UNPROCESSABLE_ENTITY,
+                'data': {'error': f'{HEADER} was already used with a different request body.'}}
+    if entry['state'] == PENDING:
+        return conflict()
+    return entry
+
+
+def conflict():
+    return {'status': status.HTTP_409_CONFLICT,
+            'data': {'error': f'A request with this {HEADER} is still in progress.'}, 'retry_after': 1}
+
+
+def finish(entry_key, body_fingerprint, status_code, data):
+    if status_code >= 500:
+        cache.delete(entry_key)
+        return
+    cache.set(entry_key, {'state': 'done', 'fingerprint': body_fingerprint, 'status': status_code, 'data': data},
+              settings.IDEMPOTENCY_TTL_SECONDS)
+
+
+def replayed(response, entry):
+    if 'retry_after' in entry:
+        response['Retry-After'] = str(entry['retry_after'])
+    elif entry.get('state') == 'done':
+        response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def invalid_key():
+    return {'status': status.HTTP_400_BAD_REQUEST,
+            'data': {'error': f'{HEADER} must be at most {MAX_KEY_LENGTH} characters.'}}
+
+
+def idempotent(action):
+    """Decorate a ViewSet action so requests carrying ``Idempotency-Key`` are replayed."""
+    @wraps(action)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return action(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            entry = invalid_key()
+            return Response(entry['data'], status=entry['status'])
+
+        entry_key = cache_key(request.user.pk, action_scope(self), key)
+        body_fingerprint = fingerprint(request.data)
+        entry = begin(entry_key, body_fingerprint)
+        if entry is not None:
+            return replayed(Response(entry['data'], status=entry['status']), entry)
+        try:
+            response = action(self, request, *args, **kwargs)
+        except Exception:
+            cache.delete(entry_key)
+            raise
+        finish(entry_key, body_fingerprint, response.status_code, response.data)
+        return response
+    return wrapper
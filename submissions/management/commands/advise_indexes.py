@@ -0,0 +1,78 @@
+import os
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from mysite import index_advisor, querylog
+
+
+class Command(BaseCommand):
+    help = (
+        'Group captured SQL by normalized text, EXPLAIN the most expensive queries and propose '
+        'Meta.indexes changes with a migration to review. Queries come from QUERY_CAPTURE_PATH '
+        'logs (--capture) or from an in-process benchmark_exam_flow run (--benchmark).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--capture', action='append', default=[], help='JSON Lines query log to read.')
+        parser.add_argument('--benchmark', action='store_true', help='Capture a benchmark_exam_flow run.')
+        parser.add_argument('--students', type=int, default=20, help='Students for --benchmark.')
+        parser.add_argument('--top', type=int, default=25, help='Query groups to EXPLAIN, by total time.')
+        parser.add_argument('--min-count', type=int, default=1, help='Ignore groups run fewer times than this.')
+        parser.add_argument(
+            '--write', action='store_true',
+            help="Write the migrations into the apps' migrations packages instead of printing them.",
+        )
+        parser.add_argument('--name', default='advised_indexes', help='Migration name suffix.')
+
+    def handle(self, *args, **options):
+        if not options['capture'] and not options['benchmark']:
+            raise CommandError('Give at least one --capture file or --benchmark.')
+        stats = querylog.QueryStats()
+        for path in options['capture']:
+            if not os.path.exists(path):
+                raise CommandError(f'No such capture file: {path}')
+            querylog.load(path, stats)
+        if options['benchmark']:
+            with open(os.devnull, 'w') as devnull, querylog.capture(stats):
+                call_command('benchmark_exam_flow', students=options['students'], concurrency=1, stdout=devnull)
+
+        groups = stats.top(options['top'], options['min_count'])
+        self.stdout.write(f'{len(stats.groups)} distinct queries; top {len(groups)} by total time:')
+        self.stdout.write(f"{'count':>7}{'total ms':>11}{'max ms':>9}  query")
+        for group in groups:
+            self.stdout.write(
+                f"{group['count']:>7}{group['total_ms']:>11.1f}{group['max_ms']:>9.2f}  {group['normalized'][:160]}"
+            )
+
+        proposals = index_advisor.propose(groups)
+        if not proposals:
+            self.stdout.write(self.style.SUCCESS('No index changes proposed.'))
+            return
+
+        self.stdout.write('')
+        for proposal in proposals:
+            meta = proposal.model._meta
+            self.stdout.write(self.style.WARNING(
+                f"{meta.label}: {proposal.meta_line()}  # {', '.join(sorted(proposal.reasons))}; "
+                f"{sum(group['count'] for group in proposal.queries)} executions, "
+                f"{sum(group['total_ms'] for group in proposal.queries):.1f} ms"
+            ))
+            for group in proposal.queries[:3]:
+                self.stdout.write(f"    {group['normalized'][:160]}")
+                for line in group.get('plan', []):
+                    self.stdout.write(f'      {line}')
+            for index in proposal.redundant:
+                self.stdout.write(f'    replaces models.Index(fields={index.fields!r})')
+
+        self.stdout.write('')
+        for migration, writer in index_advisor.migrations(proposals, options['name']):
+            if options['write']:
+                os.makedirs(os.path.dirname(writer.path), exist_ok=True)
+                with open(writer.path, 'w') as fh:
+                    fh.write(writer.as_string())
+                self.stdout.write(self.style.SUCCESS(f'Wrote {writer.path}'))
+            else:
+                self.stdout.write(f'# {writer.path}')
+                self.stdout.write(writer.as_string())
+        self.stdout.write('Update each model\'s Meta.indexes to match before applying the migrations.')
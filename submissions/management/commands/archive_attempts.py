@@ -0,0 +1,36 @@
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from submissions.services import ArchiveService
+
+
+class Command(BaseCommand):
+    help = (
+        'Move GRADED attempts of old exams, with their responses and proctoring events, into '
+        'compressed per-exam segments under ARCHIVE_ROOT and delete their rows in chunks.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=365, help='Archive exams created more than this many days ago.')
+        parser.add_argument('--before', help='Archive exams created before this date (YYYY-MM-DD); overrides --days.')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Attempts written and deleted per transaction.')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the attempts that would move.')
+
+    def handle(self, *args, **options):
+        if options['before']:
+            try:
+                day = datetime.strptime(options['before'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--before must be a date in YYYY-MM-DD form.')
+            cutoff = timezone.make_aware(datetime.combine(day, time.min))
+        else:
+            cutoff = timezone.now() - timedelta(days=options['days'])
+
+        if options['dry_run']:
+            count = ArchiveService.candidates(cutoff).count()
+            self.stdout.write(f'{count} attempts would be archived.')
+            return
+        moved = ArchiveService.archive(cutoff, chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Archived {moved} attempts.'))
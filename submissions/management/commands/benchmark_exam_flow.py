@@ -0,0 +1,262 @@
+import json
+import random
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.models import EngineeringSpecialization
+from exams.models import Exam, Question, QuestionOption
+
+User = get_user_model()
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class FlowRecorder:
+    """Collects per-endpoint latency and query counts from worker threads."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, endpoint, elapsed, queries, ok):
+        with self._lock:
+            self.samples[endpoint].append((elapsed, queries))
+            if not ok:
+                self.errors[endpoint] += 1
+
+    def summary(self, wall_seconds):
+        endpoints = {}
+        for endpoint, samples in self.samples.items():
+            latencies = sorted(s[0] * 1000 for s in samples)
+            queries = [s[1] for s in samples]
+            endpoints[endpoint] = {
+                'requests': len(samples),
+                'errors': self.errors[endpoint],
+                'throughput_rps': round(len(samples) / wall_seconds, 2) if wall_seconds else None,
+                'latency_ms': {
+                    'mean': round(sum(latencies) / len(latencies), 3),
+                    'p50': round(percentile(latencies, 50), 3),
+                    'p95': round(percentile(latencies, 95), 3),
+                    'p99': round(percentile(latencies, 99), 3),
+                    'max': round(latencies[-1], 3),
+                },
+                'queries_per_request': {
+                    'mean': round(sum(queries) / len(queries), 2),
+                    'max': max(queries),
+                },
+            }
+        return endpoints
+
+
+class Command(BaseCommand):
+    help = (
+        'Simulate concurrent students running start_exam -> submit_answer x Q -> submit_exam '
+        'through the API and report throughput, latency percentiles and queries per request.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=50, help='Number of simulated students.')
+        parser.add_argument('--questions', type=int, default=20, help='Questions in the benchmark exam.')
+        parser.add_argument('--options', type=int, default=4, help='Options per multiple choice question.')
+        parser.add_argument('--concurrency', type=int, default=8, help='Worker threads; 1 runs inline.')
+        parser.add_argument('--seed', type=int, default=1, help='Seed for answer selection.')
+        parser.add_argument(
+            '--async-submit', action='store_true',
+            help='Send answers to the async submit_answer_async view instead of the DRF action.',
+        )
+        parser.add_argument('--output', help='Write the JSON report to this path.')
+        parser.add_argument('--keep-data', action='store_true', help='Do not delete the generated exam and users.')
+
+    def handle(self, *args, **options):
+        run_id = uuid.uuid4().hex[:8]
+        fixture = self.create_fixture(run_id, options)
+        recorder = FlowRecorder()
+        rng = random.Random(options['seed'])
+        answers = {
+            student.id: [
+                (question_id, str(rng.choice(option_ids)))
+                for question_id, option_ids in fixture['questions']
+            ]
+            for student in fixture['students']
+        }
+
+        started_at = timezone.now()
+        wall_start = time.perf_counter()
+        try:
+            if options['concurrency'] <= 1:
+                for student in fixture['students']:
+                    self.run_student(student, fixture['exam'], answers[student.id], recorder, options['async_submit'])
+            else:
+                with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+                    futures = [
+                        pool.submit(
+                            self.run_student_in_thread, student, fixture['exam'], answers[student.id],
+                            recorder, options['async_submit'],
+                        )
+                        for student in fixture['students']
+                    ]
+                    for future in futures:
+                        future.result()
+            wall_seconds = time.perf_counter() - wall_start
+        finally:
+            if not options['keep_data']:
+                self.delete_fixture(fixture)
+
+        total_requests = sum(len(s) for s in recorder.samples.values())
+        report = {
+            'run': {
+                'id': run_id,
+                'started_at': started_at.isoformat(),
+                'database': connection.vendor,
+                'students': options['students'],
+                'questions': options['questions'],
+                'concurrency': options['concurrency'],
+                'async_submit': options['async_submit'],
+                'wall_seconds': round(wall_seconds, 3),
+                'requests': total_requests,
+                'throughput_rps': round(total_requests / wall_seconds, 2) if wall_seconds else None,
+            },
+            'endpoints': recorder.summary(wall_seconds),
+        }
+
+        self.print_report(report)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+
+    def create_fixture(self, run_id, options):
+        spec, spec_created = EngineeringSpecialization.objects.get_or_create(
+            code='BENCH',
+            defaults={'name': 'Benchmark Engineering', 'description': 'Created by benchmark_exam_flow'},
+        )
+        instructor = User.objects.create_user(
+            email=f'bench-{run_id}-instructor@bench.local', role=User.Role.INSTRUCTOR,
+        )
+        exam = Exam.objects.create(
+            title=f'Benchmark exam {run_id}',
+            instructor=instructor,
+            specialization=spec,
+            duration_minutes=60,
+        )
+
+        questions = Question.objects.bulk_create([
+            Question(
+                exam=exam,
+                question_text=f'Benchmark question {i}',
+                question_type=Question.QuestionType.MULTIPLE_CHOICE,
+                points=1,
+                order_index=i,
+            )
+            for i in range(options['questions'])
+        ])
+        option_rows = [
+            QuestionOption(question=question, option_text=f'Option {j}', is_correct=(j == 0), order_index=j)
+            for question in questions
+            for j in range(options['options'])
+        ]
+        QuestionOption.objects.bulk_create(option_rows)
+        exam.total_points = len(questions)
+        exam.save(update_fields=['total_points'])
+
+        option_ids = defaultdict(list)
+        for option in option_rows:
+            option_ids[option.question_id].append(option.id)
+
+        students = []
+        for i in range(options['students']):
+            student = User(
+                email=f'bench-{run_id}-student-{i}@bench.local',
+                role=User.Role.STUDENT,
+                specialization=spec,
+            )
+            student.set_unusable_password()
+            students.append(student)
+        User.objects.bulk_create(students)
+
+        return {
+            'spec': spec,
+            'spec_created': spec_created,
+            'instructor': instructor,
+            'exam': exam,
+            'students': students,
+            'questions': [(q.id, option_ids[q.id]) for q in questions],
+        }
+
+    def delete_fixture(self, fixture):
+        fixture['exam'].delete()
+        User.objects.filter(id__in=[s.id for s in fixture['students']]).delete()
+        fixture['instructor'].delete()
+        if fixture['spec_created']:
+            fixture['spec'].delete()
+
+    def run_student_in_thread(self, student, exam, answers, recorder, async_submit):
+        try:
+            self.run_student(student, exam, answers, recorder, async_submit)
+        finally:
+            # Each pool thread owns its own connection; release it between flows.
+            connections.close_all()
+
+    def run_student(self, student, exam, answers, recorder, async_submit=False):
+        client = APIClient(HTTP_HOST='localhost')
+        client.force_authenticate(user=student)
+        # The async view authenticates the JWT itself, outside DRF.
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(student)}')
+        submit_endpoint = 'submit_answer_async' if async_submit else 'submit_answer'
+        submit_url_name = 'examassignment-submit-answer-async' if async_submit else 'examassignment-submit-answer'
+
+        response = self.timed(recorder, 'start_exam', client, reverse('examassignment-start-exam'), {'exam_id': str(exam.id)})
+        if response.status_code != 201:
+            return
+        assignment_id = response.data['id']
+
+        for question_id, option_id in answers:
+            self.timed(
+                recorder, submit_endpoint, client,
+                reverse(submit_url_name, args=[assignment_id]),
+                {'question_id': str(question_id), 'answer_options': [option_id]},
+            )
+
+        self.timed(recorder, 'submit_exam', client, reverse('examassignment-submit-exam', args=[assignment_id]), {})
+
+    def timed(self, recorder, endpoint, client, url, data):
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            response = client.post(url, data, format='json', secure=True)
+            elapsed = time.perf_counter() - start
+        recorder.record(endpoint, elapsed, len(ctx.captured_queries), response.status_code < 400)
+        return response
+
+    def print_report(self, report):
+        run = report['run']
+        self.stdout.write(
+            f"{run['students']} students x {run['questions']} questions, concurrency {run['concurrency']} "
+            f"on {run['database']}: {run['requests']} requests in {run['wall_seconds']}s "
+            f"({run['throughput_rps']} req/s)"
+        )
+        self.stdout.write(f"{'endpoint':<20}{'reqs':>7}{'errs':>6}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'queries':>9}")
+        for endpoint, stats in report['endpoints'].items():
+            latency = stats['latency_ms']
+            self.stdout.write(
+                f"{endpoint:<20}{stats['requests']:>7}{stats['errors']:>6}{stats['throughput_rps']:>9}"
+                f"{latency['p50']:>9}{latency['p95']:>9}{latency['p99']:>9}{stats['queries_per_request']['mean']:>9}"
+            )
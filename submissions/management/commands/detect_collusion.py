@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from submissions import similarity
+from submissions.services import CollusionService
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare submitted essay answers per question and record near-identical pairs as '
+        'POSSIBLE_COLLUSION proctoring events.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--exam', action='append', default=[], help='Only compare answers given in this exam or its variants.')
+        parser.add_argument('--question', action='append', default=[], help='Only scan this essay question and its copies in variants.')
+        parser.add_argument(
+            '--threshold', type=float, default=similarity.DEFAULT_THRESHOLD,
+            help='Minimum TF-IDF cosine similarity for a pair to be flagged.',
+        )
+        parser.add_argument('--top-k', type=int, default=similarity.DEFAULT_TOP_K, help='Neighbours kept per essay.')
+
+    def handle(self, *args, **options):
+        if not 0 < options['threshold'] <= 1:
+            raise CommandError('--threshold must be in (0, 1].')
+        if options['top_k'] < 1:
+            raise CommandError('--top-k must be at least 1.')
+        questions = CollusionService.essay_questions(options['exam'])
+        if options['question']:
+            questions = questions.filter(id__in=options['question'])
+
+        flagged = scanned = 0
+        for question in questions.iterator():
+            started = time.perf_counter()
+            pairs = CollusionService.scan(question, options['threshold'], options['top_k'])
+            scanned += 1
+            flagged += pairs
+            if pairs:
+                self.stdout.write(f'{question.id}: {pairs} new pairs ({time.perf_counter() - started:.1f}s)')
+        self.stdout.write(self.style.SUCCESS(f'Scanned {scanned} essay questions; flagged {flagged} new pairs.'))
@@ -0,0 +1,328 @@
+import math
+import random
+import time
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import EngineeringSpecialization
+from exams.models import Exam, Question, QuestionOption
+from mysite.bulk import RowWriter
+from submissions.models import ExamAssignment, StudentResponse, SuspiciousActivity
+
+User = get_user_model()
+
+WORDS = (
+    'beam load stress strain torque voltage current circuit fluid pressure heat flow rate '
+    'design system signal model control energy power force mass density friction material '
+    'structure bridge steel concrete motor gear pump valve sensor network frequency phase'
+).split()
+
+
+class BulkWriter:
+    """Buffers unsaved model instances and writes them with bulk_create.
+
+    Parent writers are flushed first so foreign keys always point at rows
+    that already exist, whichever buffer fills up first.
+    """
+
+    def __init__(self, model, batch_size, parents=()):
+        self.model = model
+        self.batch_size = batch_size
+        self.parents = parents
+        self.buffer = []
+        self.written = 0
+
+    def add(self, obj):
+        self.buffer.append(obj)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        for parent in self.parents:
+            parent.flush()
+        if self.buffer:
+            self.model.objects.bulk_create(self.buffer, batch_size=self.batch_size)
+            self.written += len(self.buffer)
+            self.buffer = []
+
+
+class ResponseWriter(BulkWriter):
+    """executemany writer for StudentResponse, the table that dominates volume.
+
+    bulk_create spends most of its time building and preparing a model
+    instance per row; at millions of rows that alone blows the time budget,
+    so responses are written as plain parameter tuples instead. Values are
+    adapted for the active backend the same way the model fields would.
+    """
+
+    columns = (
+        'id', 'exam_assignment', 'question', 'student', 'answer_text', 'answer_options',
+        'is_flagged', 'is_answered', 'auto_score', 'manual_score',
+        'submitted_at', 'created_at', 'updated_at',
+    )
+
+    def __init__(self, batch_size, parents=()):
+        super().__init__(StudentResponse, batch_size, parents)
+        self.rows = RowWriter(StudentResponse, self.columns, batch_size=batch_size)
+        self.timestamp = self.rows.prepare('created_at', timezone.now())
+        self.scores = {None: None}
+        # Answers are all distinct; skip the field layer and adapt directly.
+        self.adapt_json = self.rows.connection.ops.adapt_json_value
+        self.options_encoder = StudentResponse._meta.get_field('answer_options').encoder
+
+    def add(self, response_id, assignment_id, question_id, student_id,
+            answer_text, answer_options, auto_score, manual_score):
+        uuid = self.rows.uuid
+        super().add((
+            uuid(response_id), uuid(assignment_id), uuid(question_id), uuid(student_id),
+            answer_text,
+            self.adapt_json(answer_options, self.options_encoder),
+            False, True,
+            self.score(auto_score), self.score(manual_score),
+            self.timestamp, self.timestamp, self.timestamp,
+        ))
+
+    def score(self, value):
+        # Scores take a handful of distinct values, so adapt each one once.
+        if value not in self.scores:
+            self.scores[value] = self.rows.prepare('auto_score', value)
+        return self.scores[value]
+
+    def flush(self):
+        for parent in self.parents:
+            parent.flush()
+        if self.buffer:
+            self.rows.write(self.buffer)
+            self.written += len(self.buffer)
+            self.buffer = []
+
+
+class Command(BaseCommand):
+    help = 'Generate a deterministic, production-sized synthetic dataset for performance work.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--instructors', type=int, default=20)
+        parser.add_argument('--students-per-specialization', type=int, default=200)
+        parser.add_argument('--exams-per-instructor', type=int, default=5)
+        parser.add_argument('--questions-per-exam', type=int, default=50)
+        parser.add_argument('--options-per-question', type=int, default=4)
+        parser.add_argument('--assignments-per-exam', type=int, default=100,
+                            help='Capped at the number of students in the exam specialization.')
+        parser.add_argument('--events-per-assignment', type=float, default=1.0,
+                            help='Average proctoring events per assignment.')
+        parser.add_argument('--days', type=int, default=365, help='Spread exam dates over this many past days.')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--prefix', help='Email prefix for generated users (defaults to gen<seed>).')
+        parser.add_argument('--password', default='password', help='Password shared by all generated users.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        prefix = options['prefix'] or f"gen{options['seed']}"
+        # Seeding on the prefix too keeps primary keys distinct between datasets.
+        self.rng = random.Random(f"{options['seed']}:{prefix}")
+        self.batch_size = options['batch_size']
+        if User.objects.filter(email__startswith=f'{prefix}-').exists():
+            raise CommandError(f"Users with prefix '{prefix}' already exist; pass a different --seed or --prefix.")
+
+        self.now = timezone.now()
+        started = time.perf_counter()
+        with transaction.atomic():
+            specializations = self.ensure_specializations()
+            # One hash shared by every generated account: hashing is deliberately
+            # slow, so doing it per user would dominate the whole run.
+            password_hash = make_password(options['password'])
+            instructors = self.create_users(prefix, 'instructor', User.Role.INSTRUCTOR, options['instructors'],
+                                            specializations, password_hash)
+            students = {}
+            for spec in specializations:
+                students[spec.id] = self.create_users(
+                    f'{prefix}-{spec.code.lower()}', 'student', User.Role.STUDENT,
+                    options['students_per_specialization'], [spec], password_hash,
+                )
+            counts = self.create_exams(instructors, students, options)
+
+        elapsed = time.perf_counter() - started
+        counts['users'] = len(instructors) + sum(len(s) for s in students.values())
+        summary = ', '.join(f'{n} {name}' for name, n in counts.items())
+        self.stdout.write(self.style.SUCCESS(f'Generated {summary} in {elapsed:.1f}s'))
+
+    def uuid(self):
+        return uuid.UUID(int=self.rng.getrandbits(128), version=4)
+
+    def ensure_specializations(self):
+        if not EngineeringSpecialization.objects.exists():
+            call_command('populate_specializations', stdout=StringIO())
+        return list(EngineeringSpecialization.objects.order_by('code'))
+
+    def create_users(self, prefix, label, role, count, specializations, password_hash):
+        users = [
+            User(
+                id=self.uuid(),
+                email=f'{prefix}-{label}-{i}@example.com',
+                first_name=label.title(),
+                last_name=str(i),
+                role=role,
+                specialization=specializations[i % len(specializations)],
+                password=password_hash,
+            )
+            for i in range(count)
+        ]
+        User.objects.bulk_create(users, batch_size=self.batch_size)
+        return users
+
+    def create_exams(self, instructors, students, options):
+        rng = self.rng
+        exams = BulkWriter(Exam, self.batch_size)
+        questions = BulkWriter(Question, self.batch_size, parents=(exams,))
+        question_options = BulkWriter(QuestionOption, self.batch_size, parents=(questions,))
+        assignments = BulkWriter(ExamAssignment, self.batch_size, parents=(exams,))
+        responses = ResponseWriter(self.batch_size, parents=(questions, assignments))
+        events = BulkWriter(SuspiciousActivity, self.batch_size, parents=(assignments,))
+        exam_dates = {}
+
+        question_types = [Question.QuestionType.MULTIPLE_CHOICE] * 7 + [
+            Question.QuestionType.MULTIPLE_SELECT,
+            Question.QuestionType.SHORT_ANSWER,
+            Question.QuestionType.ESSAY,
+        ]
+
+        for instructor in instructors:
+            for e in range(options['exams_per_instructor']):
+                exam = Exam(
+                    id=self.uuid(),
+                    title=f'{instructor.specialization.name} exam {e}',
+                    instructor=instructor,
+                    specialization=instructor.specialization,
+                    duration_minutes=rng.choice([30, 60, 90, 120]),
+                )
+                exam_dates[exam.id] = self.now - timedelta(days=rng.uniform(0, options['days']))
+
+                paper = []
+                for q in range(options['questions_per_exam']):
+                    question = Question(
+                        id=self.uuid(),
+                        exam=exam,
+                        question_text=self.sentence(8, 20) + '?',
+                        question_type=rng.choice(question_types),
+                        points=Decimal(rng.choice([1, 2, 5])),
+                        order_index=q,
+                    )
+                    choices = []
+                    if question.question_type in (Question.QuestionType.MULTIPLE_CHOICE,
+                                                  Question.QuestionType.MULTIPLE_SELECT):
+                        correct = rng.randrange(options['options_per_question'])
+                        choices = [
+                            QuestionOption(
+                                id=self.uuid(),
+                                question=question,
+                                option_text=self.sentence(1, 5),
+                                is_correct=(o == correct),
+                                order_index=o,
+                            )
+                            for o in range(options['options_per_question'])
+                        ]
+                    paper.append((question, choices))
+
+                exam.total_points = sum(int(question.points) for question, _ in paper)
+                exams.add(exam)
+                for question, choices in paper:
+                    questions.add(question)
+                    for option in choices:
+                        question_options.add(option)
+
+                pool = students[exam.specialization_id]
+                takers = rng.sample(pool, min(options['assignments_per_exam'], len(pool)))
+                for student in takers:
+                    self.create_attempt(exam, exam_dates[exam.id], student, paper, assignments, responses, events,
+                                        options['events_per_assignment'])
+
+        for writer in (question_options, responses, events):
+            writer.flush()
+
+        # created_at is auto_now_add, so back-date exams after insert.
+        for exam_id, created_at in exam_dates.items():
+            Exam.objects.filter(id=exam_id).update(created_at=created_at, updated_at=created_at)
+
+        return {
+            'exams': exams.written,
+            'questions': questions.written,
+            'options': question_options.written,
+            'assignments': assignments.written,
+            'responses': responses.written,
+            'events': events.written,
+        }
+
+    def create_attempt(self, exam, exam_date, student, paper, assignments, responses, events, event_rate):
+        rng = self.rng
+        status = rng.choices(
+            [ExamAssignment.Status.GRADED, ExamAssignment.Status.SUBMITTED,
+             ExamAssignment.Status.IN_PROGRESS, ExamAssignment.Status.NOT_STARTED],
+            weights=[70, 15, 10, 5],
+        )[0]
+        assignment = ExamAssignment(id=self.uuid(), exam=exam, student=student, status=status)
+        if status == ExamAssignment.Status.NOT_STARTED:
+            assignments.add(assignment)
+            return
+
+        assignment.started_at = exam_date + timedelta(minutes=rng.uniform(0, 30))
+        score = Decimal(0)
+        answers = []
+        for question, choices in paper:
+            answer_text, answer_options, auto_score, manual_score = None, [], None, None
+            if choices:
+                if question.question_type == Question.QuestionType.MULTIPLE_CHOICE:
+                    picked = [rng.choice(choices)]
+                else:
+                    picked = rng.sample(choices, rng.randint(1, len(choices)))
+                answer_options = [str(option.id) for option in picked]
+                all_correct = {o.id for o in picked} == {o.id for o in choices if o.is_correct}
+                auto_score = question.points if all_correct else Decimal(0)
+                score += auto_score
+            else:
+                length = (5, 15) if question.question_type == Question.QuestionType.SHORT_ANSWER else (60, 200)
+                answer_text = self.sentence(*length)
+                if status == ExamAssignment.Status.GRADED:
+                    manual_score = Decimal(rng.randint(0, int(question.points)))
+                    score += manual_score
+            answers.append((self.uuid(), question.id, answer_text, answer_options, auto_score, manual_score))
+
+        if status != ExamAssignment.Status.IN_PROGRESS:
+            assignment.time_taken_seconds = rng.randint(60, exam.duration_minutes * 60)
+            assignment.submitted_at = assignment.started_at + timedelta(seconds=assignment.time_taken_seconds)
+            assignment.score = score
+        assignments.add(assignment)
+
+        for response_id, question_id, answer_text, answer_options, auto_score, manual_score in answers:
+            responses.add(response_id, assignment.id, question_id, student.id,
+                          answer_text, answer_options, auto_score, manual_score)
+
+        for _ in range(self.poisson(event_rate)):
+            events.add(SuspiciousActivity(
+                id=self.uuid(),
+                exam_assignment=assignment,
+                student=student,
+                activity_type=rng.choice(SuspiciousActivity.ActivityType.values),
+                severity=rng.choices(SuspiciousActivity.Severity.values, weights=[60, 25, 10, 5])[0],
+                metadata={'generated': True},
+            ))
+
+    def sentence(self, low, high):
+        return ' '.join(self.rng.choices(WORDS, k=self.rng.randint(low, high)))
+
+    def poisson(self, mean):
+        # Knuth's method; the means used here are small.
+        threshold, k, p = math.exp(-mean), 0, 1.0
+        while True:
+            p *= self.rng.random()
+            if p <= threshold:
+                return k
+            k += 1
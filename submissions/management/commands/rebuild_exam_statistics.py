@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from exams.models import Exam
+from submissions.services import StatisticsService
+
+
+class Command(BaseCommand):
+    help = (
+        'Recount ExamStatistics from assignments. Only needed after a regrade or after '
+        'assignments were changed outside the exam-taking and grading endpoints.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('exam_ids', nargs='*', help='Template exams to rebuild; defaults to all of them.')
+
+    def handle(self, *args, **options):
+        exams = Exam.objects.filter(parent__isnull=True)
+        if options['exam_ids']:
+            exams = exams.filter(id__in=options['exam_ids'])
+        rebuilt = 0
+        for exam_id in exams.values_list('id', flat=True).iterator():
+            StatisticsService.rebuild(exam_id)
+            rebuilt += 1
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt statistics for {rebuilt} exams.'))
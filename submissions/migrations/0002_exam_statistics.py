@@ -0,0 +1,45 @@
+# Generated by Django 5.0 on 2026-10-19 17:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0004_question_signature'),
+        ('submissions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExamStatistics',
+            fields=[
+                ('exam', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='statistics', serialize=False, to='exams.exam')),
+                ('not_started_count', models.IntegerField(default=0)),
+                ('in_progress_count', models.IntegerField(default=0)),
+                ('submitted_count', models.IntegerField(default=0)),
+                ('graded_count', models.IntegerField(default=0)),
+                ('scored_count', models.IntegerField(default=0)),
+                ('score_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('percent_total', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'exam statistics',
+            },
+        ),
+        migrations.CreateModel(
+            name='ExamScoreBin',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveSmallIntegerField()),
+                ('count', models.IntegerField(default=0)),
+                ('statistics', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bins', to='submissions.examstatistics')),
+            ],
+            options={
+                'ordering': ['index'],
+                'unique_together': {('statistics', 'index')},
+            },
+        ),
+    ]
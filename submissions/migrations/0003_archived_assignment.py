@@ -0,0 +1,36 @@
+# Generated by Django 5.0 on 2026-10-19 18:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0006_exam_scheduled_start'),
+        ('submissions', '0002_exam_statistics'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedAssignment',
+            fields=[
+                ('id', models.UUIDField(editable=False, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('not_started', 'Not Started'), ('in_progress', 'In Progress'), ('submitted', 'Submitted'), ('graded', 'Graded')], max_length=20)),
+                ('score', models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True)),
+                ('submitted_at', models.DateTimeField(blank=True, null=True)),
+                ('segment', models.CharField(help_text='Segment file, relative to ARCHIVE_ROOT.', max_length=255)),
+                ('offset', models.BigIntegerField()),
+                ('length', models.IntegerField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('exam', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_assignments', to='exams.exam')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_assignments', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-submitted_at'],
+                'indexes': [models.Index(fields=['exam'], name='submissions_exam_id_38290f_idx'), models.Index(fields=['student'], name='submissions_student_dae944_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.0 on 2026-10-19 18:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submissions', '0003_archived_assignment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResponseDocument',
+            fields=[
+                ('assignment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='response_document', serialize=False, to='submissions.examassignment')),
+                ('answers', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
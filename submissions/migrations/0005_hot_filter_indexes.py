@@ -0,0 +1,36 @@
+# Generated by Django 5.0 on 2026-10-19 18:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0008_hot_filter_indexes'),
+        ('submissions', '0004_response_document'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='examassignment',
+            name='submissions_status_8bca68_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='suspiciousactivity',
+            name='submissions_exam_as_f4ef01_idx',
+        ),
+        migrations.AddIndex(
+            model_name='examassignment',
+            index=models.Index(fields=['status', 'started_at'], name='submissions_status_0edb43_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentresponse',
+            index=models.Index(fields=['exam_assignment', 'is_answered'], name='submissions_exam_as_5cabca_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='suspiciousactivity',
+            index=models.Index(fields=['exam_assignment', '-timestamp'], name='submissions_exam_as_91c27a_idx'),
+        ),
+    ]
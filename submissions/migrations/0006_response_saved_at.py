@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-19 18:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submissions', '0005_hot_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentresponse',
+            name='saved_at',
+            field=models.DateTimeField(blank=True, help_text="When the answer was given; the client's time for offline uploads.", null=True),
+        ),
+    ]
@@ -30,12 +30,27 @@ class ExamAssignment(models.Model):
         ordering = ['-assigned_at']
         indexes = [
             models.Index(fields=['exam', 'student']),
-            models.Index(fields=['status']),
+            models.Index(fields=['status', 'started_at']),
         ]
 
     def __str__(self):
         return f"{self.student}'s assignment for {self.exam}"
 
+class ResponseDocument(models.Model):
+    """All answers of an in-progress attempt on an exam with ``compact_responses``.
+
+    ``answers`` maps question id to ``{answer_text, answer_options, auto_score,
+    saved_at}``, with ``auto_score`` as a decimal string. Each autosave sets
+    one key with a single UPDATE; ``ExamAssignmentService.submit_exam`` turns
+    the document into StudentResponse rows and deletes it.
+    """
+    assignment = models.OneToOneField(ExamAssignment, on_delete=models.CASCADE, primary_key=True, related_name='response_document')
+    answers = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Answers for {self.assignment_id}"
+
 class StudentResponse(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     exam_assignment = models.ForeignKey(ExamAssignment, on_delete=models.CASCADE, related_name='responses')
@@ -49,12 +64,18 @@ class StudentResponse(models.Model):
     manual_score = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
     instructor_feedback = models.TextField(null=True, blank=True)
     submitted_at = models.DateTimeField(auto_now_add=True)
+    saved_at = models.DateTimeField(
+        null=True, blank=True, help_text="When the answer was given; the client's time for offline uploads.",
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ('exam_assignment', 'question')
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['exam_assignment', 'is_answered']),
+        ]
 
     def __str__(self):
         return f"Response by {self.student} to {self.question}"
@@ -92,7 +113,7 @@ class SuspiciousActivity(models.Model):
     class Meta:
         ordering = ['-timestamp']
         indexes = [
-            models.Index(fields=['exam_assignment']),
+            models.Index(fields=['exam_assignment', '-timestamp']),
             models.Index(fields=['activity_type']),
             models.Index(fields=['severity']),
         ]
@@ -121,3 +142,68 @@ class AuditLog(models.Model):
 
     def __str__(self):
         return f"{self.action} on {self.entity_type} {self.entity_id} by {self.user}"
+
+class ExamStatistics(models.Model):
+    """Running score summary for a template exam and its generated variants.
+
+    Kept current with F() updates by ``StatisticsService.record``; scores are
+    binned by percentage of the assignment's own exam total, so variants with
+    different totals share one histogram.
+    """
+    BINS = 20
+
+    exam = models.OneToOneField(Exam, on_delete=models.CASCADE, primary_key=True, related_name='statistics')
+    not_started_count = models.IntegerField(default=0)
+    in_progress_count = models.IntegerField(default=0)
+    submitted_count = models.IntegerField(default=0)
+    graded_count = models.IntegerField(default=0)
+    scored_count = models.IntegerField(default=0)
+    score_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    percent_total = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'exam statistics'
+
+    def __str__(self):
+        return f"Statistics for {self.exam}"
+
+class ExamScoreBin(models.Model):
+    statistics = models.ForeignKey(ExamStatistics, on_delete=models.CASCADE, related_name='bins')
+    index = models.PositiveSmallIntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('statistics', 'index')
+        ordering = ['index']
+
+    def __str__(self):
+        return f"Bin {self.index} of {self.statistics_id}"
+
+class ArchivedAssignment(models.Model):
+    """Index entry for a graded attempt moved to a cold-storage segment.
+
+    The attempt, its responses and its proctoring events are one gzip member
+    of the exam's segment file under ARCHIVE_ROOT, at ``offset`` for
+    ``length`` bytes. The id is the original assignment id.
+    """
+    id = models.UUIDField(primary_key=True, editable=False)
+    exam = models.ForeignKey(Exam, on_delete=models.CASCADE, related_name='archived_assignments')
+    student = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='archived_assignments')
+    status = models.CharField(max_length=20, choices=ExamAssignment.Status.choices)
+    score = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
+    submitted_at = models.DateTimeField(null=True, blank=True)
+    segment = models.CharField(max_length=255, help_text="Segment file, relative to ARCHIVE_ROOT.")
+    offset = models.BigIntegerField()
+    length = models.IntegerField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-submitted_at']
+        indexes = [
+            models.Index(fields=['exam']),
+            models.Index(fields=['student']),
+        ]
+
+    def __str__(self):
+        return f"Archived attempt {self.id} of {self.exam_id}"
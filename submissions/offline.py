@@ -0,0 +1,73 @@
+"""
+Signed exam packages for centres with intermittent connectivity.
+
+``download_package`` returns one token made with ``django.core.signing``:
+zlib-compressed JSON holding the attempt, the student's redacted paper (in
+this attempt's order) and the deadline, plus an HMAC over it. The payload is
+readable by the client (base64 before the first ``:``) but cannot be altered
+or reused for another attempt. The client answers offline and sends the
+whole answer set back with ``upload_answers`` together with the token; the
+signature is checked before anything is written.
+"""
+import copy
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+
+SALT = 'submissions.offline.package'
+VERSION = 1
+
+
+def deadline(assignment, exam):
+    return assignment.started_at + timedelta(minutes=exam.duration_minutes)
+
+
+def upload_closes(assignment, exam):
+    return deadline(assignment, exam) + timedelta(seconds=settings.OFFLINE_UPLOAD_GRACE_SECONDS)
+
+
+def attempt_paper(paper, assignment, exam):
+    """The paper in this attempt's order.
+
+    Generated variants were shuffled when they were drawn. A shared exam with
+    randomisation turned on is shuffled here from the attempt's seed, so every
+    download of one attempt gets the same order.
+    """
+    if exam.parent_id is not None or not (exam.randomize_questions or exam.randomize_answers):
+        return paper
+    rng = random.Random(assignment.question_randomization_seed or str(assignment.id))
+    paper = copy.deepcopy(paper)
+    if exam.randomize_questions:
+        rng.shuffle(paper['questions'])
+    if exam.randomize_answers:
+        for question in paper['questions']:
+            rng.shuffle(question['options'])
+    return paper
+
+
+def build(assignment, exam, paper):
+    payload = {
+        'v': VERSION,
+        'assignment': str(assignment.id),
+        'student': str(assignment.student_id),
+        'started_at': assignment.started_at.isoformat(),
+        'deadline': deadline(assignment, exam).isoformat(),
+        'issued_at': timezone.now().isoformat(),
+        'exam': attempt_paper(paper, assignment, exam),
+    }
+    return signing.dumps(payload, salt=SALT, compress=True)
+
+
+def open_package(token, assignment_id, student_id):
+    """The package payload, after checking its signature and that it is this student's attempt."""
+    try:
+        package = signing.loads(token, salt=SALT)
+    except signing.BadSignature:
+        raise ValidationError("The exam package signature is invalid.")
+    if package.get('assignment') != str(assignment_id) or package.get('student') != str(student_id):
+        raise ValidationError("This exam package belongs to another attempt.")
+    return package
@@ -0,0 +1,126 @@
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict
+from itertools import chain
+
+from django.core.cache import cache
+from django.db.models import Q
+
+from .models import ArchivedAssignment, ExamAssignment
+
+# Exams whose score arrays a process keeps; the least recently used go first.
+MAX_EXAMS = 256
+# How often a process re-reads an exam's shared version to notice score
+# changes made by other processes.
+VERSION_CHECK_SECONDS = 5
+
+
+class ScoreRanks:
+    """Process-wide sorted arrays of scored percentages, one per template exam.
+
+    A score is kept as a percentage of its own exam's total, so a template and
+    its variants rank together. Lookups are two bisections. Grade changes in
+    this process are applied in place by bisect removal and insertion and bump
+    a version in the shared Django cache; other processes see the new version
+    and reload the exam's scores with two queries (live and archived attempts).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._exams = OrderedDict()
+
+    @staticmethod
+    def version_key(exam_id):
+        return f'submissions:ranks:{exam_id}:version'
+
+    @staticmethod
+    def _shared_version(exam_id):
+        key = ScoreRanks.version_key(exam_id)
+        version = cache.get(key)
+        if version is None:
+            cache.add(key, 0, None)
+            version = cache.get(key, 0)
+        return version
+
+    def _load(self, exam_id, version):
+        from .services import StatisticsService
+
+        rows = chain.from_iterable(
+            model.objects.filter(
+                Q(exam_id=exam_id) | Q(exam__parent_id=exam_id),
+                status__in=StatisticsService.SCORED, score__isnull=False,
+            ).values_list('score', 'exam__total_points')
+            for model in (ExamAssignment, ArchivedAssignment)
+        )
+        scores = sorted(StatisticsService.bin_for(score, total)[0] for score, total in rows)
+        entry = {'version': version, 'checked_at': time.monotonic(), 'scores': scores}
+        with self._lock:
+            self._exams[exam_id] = entry
+            self._exams.move_to_end(exam_id)
+            while len(self._exams) > MAX_EXAMS:
+                self._exams.popitem(last=False)
+        return entry
+
+    def _scores(self, exam_id):
+        entry = self._exams.get(exam_id)
+        now = time.monotonic()
+        if entry is not None and now - entry['checked_at'] < VERSION_CHECK_SECONDS:
+            return entry['scores']
+        version = self._shared_version(exam_id)
+        if entry is None or entry['version'] != version:
+            entry = self._load(exam_id, version)
+        entry['checked_at'] = now
+        return entry['scores']
+
+    def rank(self, exam_id, percent):
+        """Return ``{'rank', 'of', 'percentile'}`` for a score of ``percent``.
+
+        ``rank`` counts strictly higher scores plus one, so ties share a rank;
+        ``percentile`` is the share of scores below, counting ties as half.
+        """
+        scores = self._scores(exam_id)
+        if not scores:
+            return None
+        below, through = bisect_left(scores, percent), bisect_right(scores, percent)
+        return {
+            'rank': len(scores) - through + 1,
+            'of': len(scores),
+            'percentile': round((below + (through - below) / 2) * 100 / len(scores), 2),
+        }
+
+    def replace(self, exam_id, old_percent, new_percent):
+        """Move one score; either side may be None for a score appearing or disappearing."""
+        try:
+            version = cache.incr(self.version_key(exam_id))
+        except ValueError:
+            cache.set(self.version_key(exam_id), time.time_ns(), None)
+            version = None
+        with self._lock:
+            entry = self._exams.get(exam_id)
+            if entry is None:
+                return
+            if version is None or version != entry['version'] + 1:
+                # Another process changed scores too, or the version was evicted.
+                del self._exams[exam_id]
+                return
+            scores = entry['scores']
+            if old_percent is not None:
+                index = bisect_left(scores, old_percent)
+                if index < len(scores) and scores[index] == old_percent:
+                    scores.pop(index)
+            if new_percent is not None:
+                insort(scores, new_percent)
+            entry['version'] = version
+
+    def invalidate(self, exam_id):
+        cache.add(self.version_key(exam_id), 0, None)
+        try:
+            cache.incr(self.version_key(exam_id))
+        except ValueError:
+            cache.set(self.version_key(exam_id), time.time_ns(), None)
+        with self._lock:
+            self._exams.pop(exam_id, None)
+
+
+score_ranks = ScoreRanks()
@@ -1,32 +1,148 @@
 
 from rest_framework import serializers
-from .models import ExamAssignment, StudentResponse, SuspiciousActivity, AuditLog
+from .models import ArchivedAssignment, ExamAssignment, ResponseDocument, StudentResponse, SuspiciousActivity, AuditLog
 from accounts.serializers import CustomUserSerializer
+from exams.models import Exam
 from exams.serializers import ExamDetailSerializer
+from exams.services import ExamPaperService
+from .ranking import score_ranks
+from .services import StatisticsService
 
 class StudentResponseSerializer(serializers.ModelSerializer):
     class Meta:
         model = StudentResponse
         fields = ('id', 'exam_assignment', 'question', 'answer_text', 'answer_options', 'is_answered', 'auto_score', 'manual_score')
 
+def attempt_rank(obj, context):
+    """Rank among graded attempts, from the process score cache; only when the view asks for it."""
+    if not context.get('include_rank') or obj.status != ExamAssignment.Status.GRADED or obj.score is None:
+        return None
+    request = context.get('request')
+    if request is not None and request.user.role == 'student' and not obj.exam.allow_review_after_submit:
+        return None
+    percent, _ = StatisticsService.bin_for(obj.score, obj.exam.total_points)
+    return score_ranks.rank(StatisticsService.key(obj.exam), percent)
+
+def exam_paper(exam, request):
+    hide_answers = not ExamPaperService.answers_visible(request.user)
+    return ExamPaperService.get_paper(
+        exam.id, exam.version, hide_answers,
+        lambda: Exam.objects.prefetch_related('questions__options').get(pk=exam.id),
+    )
+
 class ExamAssignmentSerializer(serializers.ModelSerializer):
     student = CustomUserSerializer(read_only=True)
     exam = ExamDetailSerializer(read_only=True)
     responses = StudentResponseSerializer(many=True, read_only=True)
+    rank = serializers.SerializerMethodField()
 
     class Meta:
         model = ExamAssignment
-        fields = ('id', 'student', 'exam', 'started_at', 'submitted_at', 'score', 'status', 'responses', 'time_taken_seconds', 'retake_count')
+        fields = ('id', 'student', 'exam', 'started_at', 'submitted_at', 'score', 'status', 'responses', 'time_taken_seconds', 'retake_count', 'rank')
+
+    def get_rank(self, obj):
+        return attempt_rank(obj, self.context)
+
+    def to_representation(self, obj):
+        data = super().to_representation(obj)
+        if obj.exam.compact_responses and obj.status == ExamAssignment.Status.IN_PROGRESS:
+            # Autosaved answers are still in the attempt's ResponseDocument.
+            try:
+                answers = obj.response_document.answers
+            except ResponseDocument.DoesNotExist:
+                answers = {}
+            data['responses'] = [
+                {'id': None, 'exam_assignment': obj.pk, 'question': question_id,
+                 'answer_text': entry['answer_text'], 'answer_options': entry['answer_options'],
+                 'is_answered': True, 'auto_score': entry['auto_score'], 'manual_score': None}
+                for question_id, entry in answers.items()
+            ]
+        return data
+
+class StartedAssignmentSerializer(ExamAssignmentSerializer):
+    """start_exam's response: the exam is the cached paper, redacted for students."""
+    exam = serializers.SerializerMethodField()
+
+    def get_exam(self, obj):
+        return exam_paper(obj.exam, self.context['request'])
+
+class ArchivedAssignmentSerializer(serializers.ModelSerializer):
+    exam_title = serializers.CharField(source='exam.title', read_only=True)
+
+    class Meta:
+        model = ArchivedAssignment
+        fields = ('id', 'exam', 'exam_title', 'status', 'score', 'submitted_at', 'archived_at')
+
+class ArchivedAttemptSerializer(serializers.ModelSerializer):
+    """An archived attempt in ExamAssignmentSerializer's shape, from the record the view loaded."""
+    RESPONSE_FIELDS = ('id', 'answer_text', 'answer_options', 'is_answered', 'auto_score', 'manual_score')
+
+    student = CustomUserSerializer(read_only=True)
+    exam = serializers.SerializerMethodField()
+    started_at = serializers.SerializerMethodField()
+    responses = serializers.SerializerMethodField()
+    time_taken_seconds = serializers.SerializerMethodField()
+    retake_count = serializers.SerializerMethodField()
+    rank = serializers.SerializerMethodField()
+    archived = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ArchivedAssignment
+        fields = ('id', 'student', 'exam', 'started_at', 'submitted_at', 'score', 'status', 'responses',
+                  'time_taken_seconds', 'retake_count', 'rank', 'archived')
+
+    def get_exam(self, obj):
+        return exam_paper(obj.exam, self.context['request'])
+
+    def get_started_at(self, obj):
+        return obj.record['started_at']
+
+    def get_responses(self, obj):
+        return [
+            {**{name: row[name] for name in self.RESPONSE_FIELDS},
+             'exam_assignment': row['exam_assignment_id'], 'question': row['question_id']}
+            for row in obj.record['responses']
+        ]
+
+    def get_time_taken_seconds(self, obj):
+        return obj.record['time_taken_seconds']
+
+    def get_retake_count(self, obj):
+        return obj.record['retake_count']
+
+    def get_rank(self, obj):
+        return attempt_rank(obj, self.context)
+
+    def get_archived(self, obj):
+        return True
+
+class ResponseGradeSerializer(serializers.Serializer):
+    response = serializers.UUIDField()
+    manual_score = serializers.DecimalField(max_digits=5, decimal_places=2, min_value=0)
+    instructor_feedback = serializers.CharField(required=False, allow_blank=True)
+
+class ManualGradingSerializer(serializers.Serializer):
+    grades = ResponseGradeSerializer(many=True, allow_empty=False)
+
+class UploadedAnswerSerializer(serializers.Serializer):
+    question_id = serializers.UUIDField()
+    answer_text = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    answer_options = serializers.ListField(child=serializers.CharField(), required=False)
+    saved_at = serializers.DateTimeField()
+
+class AnswerUploadSerializer(serializers.Serializer):
+    package = serializers.CharField()
+    answers = UploadedAnswerSerializer(many=True, allow_empty=False, max_length=1000)
 
 class SuspiciousActivitySerializer(serializers.ModelSerializer):
-    assignment = ExamAssignmentSerializer(read_only=True)
+    assignment = ExamAssignmentSerializer(source='exam_assignment', read_only=True)
 
     class Meta:
         model = SuspiciousActivity
         fields = ('id', 'assignment', 'activity_type', 'timestamp', 'metadata', 'severity')
 
 class SuspiciousActivityCreateSerializer(serializers.ModelSerializer):
-    assignment_id = serializers.UUIDField()
+    assignment_id = serializers.UUIDField(source='exam_assignment_id')
 
     class Meta:
         model = SuspiciousActivity
@@ -1,8 +1,21 @@
+from collections import defaultdict
+from decimal import Decimal
+from itertools import chain
+
 from django.utils import timezone
-from django.db import transaction
+from django.utils.dateparse import parse_datetime
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.db.models.functions import Coalesce
 from django.core.exceptions import ValidationError, ObjectDoesNotExist
-from .models import ExamAssignment, StudentResponse
-from exams.models import Exam, Question, QuestionOption
+from .models import (ArchivedAssignment, ExamAssignment, ExamScoreBin, ExamStatistics, ResponseDocument,
+                     StudentResponse, SuspiciousActivity)
+from . import archive, events, offline, similarity
+from .ranking import score_ranks
+from exams.models import Exam, Question
+from exams.services import ExamPrewarmService
+from mysite.expressions import JSONSet
 from django.contrib.auth import get_user_model
 import random
 
@@ -10,13 +23,16 @@ User = get_user_model()
 
 class AnswerValidationService:
     @staticmethod
-    def validate_answer(question, answer_data):
+    def validate_answer(question, answer_data, options=None):
+        if options is None:
+            options = list(question.options.all())
+        option_ids = {str(option.id) for option in options}
+
         if question.question_type == Question.QuestionType.MULTIPLE_CHOICE:
             if not answer_data.get('answer_options') or len(answer_data['answer_options']) != 1:
                 return False, "Multiple choice requires exactly one selected option."
             try:
-                option_id = answer_data['answer_options'][0]
-                if not QuestionOption.objects.filter(id=option_id, question=question).exists():
+                if str(answer_data['answer_options'][0]) not in option_ids:
                     return False, "Invalid option selected."
             except (ValueError, TypeError):
                  return False, "Invalid option format."
@@ -24,11 +40,10 @@ class AnswerValidationService:
         elif question.question_type == Question.QuestionType.MULTIPLE_SELECT:
             if not answer_data.get('answer_options'):
                 return False, "At least one option must be selected."
-            option_ids = answer_data['answer_options']
-            if not isinstance(option_ids, list):
+            selected = answer_data['answer_options']
+            if not isinstance(selected, list):
                 return False, "Answer options must be a list."
-            count = QuestionOption.objects.filter(id__in=option_ids, question=question).count()
-            if count != len(option_ids):
+            if len(set(map(str, selected))) != len(selected) or not set(map(str, selected)) <= option_ids:
                 return False, "One or more invalid options selected."
 
         elif question.question_type in [Question.QuestionType.SHORT_ANSWER, Question.QuestionType.ESSAY]:
@@ -38,83 +53,304 @@ class AnswerValidationService:
         return True, None
 
     @staticmethod
-    def auto_grade_answer(question, answer_data):
+    def auto_grade_answer(question, answer_data, options=None):
+        if options is None:
+            options = list(question.options.all())
+        correct_options = {str(option.id) for option in options if option.is_correct}
+
         if question.question_type == Question.QuestionType.MULTIPLE_CHOICE:
-            selected_option_id = answer_data['answer_options'][0]
-            selected_option = QuestionOption.objects.get(id=selected_option_id)
-            return question.points if selected_option.is_correct else 0
+            return question.points if str(answer_data['answer_options'][0]) in correct_options else 0
 
         elif question.question_type == Question.QuestionType.MULTIPLE_SELECT:
             selected_ids = set(map(str, answer_data['answer_options']))
-            correct_options = set(map(str, QuestionOption.objects.filter(question=question, is_correct=True).values_list('id', flat=True)))
             return question.points if selected_ids == correct_options else 0
 
         return None
 
 
 class ExamAssignmentService:
+    # Written when an answer is saved again, online or by an offline upload.
+    ANSWER_FIELDS = ['answer_text', 'answer_options', 'is_answered', 'auto_score', 'saved_at', 'updated_at']
+
     @staticmethod
-    def start_exam(exam_id, student_id):
+    def start_exam(exam_id, student_id, student=None):
+        """Start or resume an attempt; ``student`` may be passed to save loading it.
+
+        Exams readied by ``ExamPrewarmService`` are read from the cache.
+        """
         try:
-            exam = Exam.objects.get(id=exam_id)
-            student = User.objects.get(id=student_id)
-        except ObjectDoesNotExist:
+            exam = ExamPrewarmService.cached_exam(exam_id) or Exam.objects.get(id=exam_id)
+            if student is None:
+                student = User.objects.get(id=student_id)
+        except (ObjectDoesNotExist, ValueError):
             raise ValidationError("Invalid exam or student ID.")
 
-        if student.specialization != exam.specialization:
+        if student.specialization_id != exam.specialization_id:
             raise ValidationError("This exam is not available for your specialization.")
 
-        assignment, created = ExamAssignment.objects.get_or_create(
-            exam=exam, 
-            student=student,
-            defaults={
-                'status': ExamAssignment.Status.IN_PROGRESS,
-                'started_at': timezone.now()
-            }
-        )
+        assignment = ExamAssignment.objects.filter(exam=exam, student=student).first()
+        created = False
+        if assignment is None:
+            # archive_attempts deletes graded attempts; they must not reopen.
+            if ArchivedAssignment.objects.filter(exam=exam, student=student).exists():
+                raise ValidationError("Exam already submitted and cannot be retaken.")
+            if exam.parent_id is not None:
+                # Generated variants are only open to the student they were drawn for.
+                raise ValidationError("This exam is not assigned to you.")
+            if ExamAssignment.objects.filter(exam__parent=exam, student=student).exists():
+                # A student with a drawn variant takes that paper, not the template.
+                raise ValidationError("Start the variant of this exam that was generated for you.")
+            assignment, created = ExamAssignment.objects.get_or_create(
+                exam=exam,
+                student=student,
+                defaults={
+                    'status': ExamAssignment.Status.IN_PROGRESS,
+                    'started_at': timezone.now()
+                }
+            )
 
         if not created and assignment.status not in [ExamAssignment.Status.NOT_STARTED, ExamAssignment.Status.IN_PROGRESS]:
              raise ValidationError("Exam already submitted and cannot be retaken.")
 
+        previous = None if created else assignment.status
         if assignment.status == ExamAssignment.Status.NOT_STARTED:
             assignment.status = ExamAssignment.Status.IN_PROGRESS
             assignment.started_at = timezone.now()
             assignment.save()
+            created = True
 
+        if created:
+            StatisticsService.record(exam, previous, assignment.status)
+            events.publish_assignment(assignment)
         return assignment
 
     @staticmethod
     def submit_answer(assignment_id, question_id, student_id, answer_data):
         try:
-            assignment = ExamAssignment.objects.get(id=assignment_id, student_id=student_id)
-            question = Question.objects.get(id=question_id, exam=assignment.exam)
+            assignment = ExamAssignment.objects.annotate(compact_responses=F('exam__compact_responses')).get(
+                id=assignment_id, student_id=student_id
+            )
+            question = Question.objects.get(id=question_id, exam_id=assignment.exam_id)
         except ObjectDoesNotExist:
             raise ValidationError("Invalid assignment or question ID.")
 
         if assignment.status != ExamAssignment.Status.IN_PROGRESS:
             raise ValidationError("Exam is not in progress.")
 
-        is_valid, error = AnswerValidationService.validate_answer(question, answer_data)
-        if not is_valid:
-            raise ValidationError(error)
-
+        options = list(question.options.all())
+        defaults = ExamAssignmentService._response_defaults(question, answer_data, options)
+        if assignment.compact_responses:
+            ExamAssignmentService._save_to_document(assignment, question, defaults)
+            return StudentResponse(id=None, exam_assignment=assignment, question=question,
+                                   student_id=assignment.student_id, **defaults)
         response, _ = StudentResponse.objects.update_or_create(
             exam_assignment=assignment,
             question=question,
-            student=assignment.student,
-            defaults={
-                'answer_text': answer_data.get('answer_text'),
-                'answer_options': answer_data.get('answer_options', []),
-                'is_answered': True,
-                'auto_score': AnswerValidationService.auto_grade_answer(question, answer_data)
-            }
+            student_id=assignment.student_id,
+            defaults=defaults,
+        )
+        return response
+
+    @staticmethod
+    async def asubmit_answer(assignment_id, question_id, student_id, answer_data):
+        """Async-ORM twin of submit_answer for the ASGI autosave view."""
+        try:
+            assignment = await ExamAssignment.objects.annotate(compact_responses=F('exam__compact_responses')).aget(
+                id=assignment_id, student_id=student_id
+            )
+            # Options are prefetched inside the same thread hop as the question.
+            question = await Question.objects.prefetch_related('options').aget(id=question_id, exam_id=assignment.exam_id)
+        except ObjectDoesNotExist:
+            raise ValidationError("Invalid assignment or question ID.")
+
+        if assignment.status != ExamAssignment.Status.IN_PROGRESS:
+            raise ValidationError("Exam is not in progress.")
+
+        options = list(question.options.all())
+        defaults = ExamAssignmentService._response_defaults(question, answer_data, options)
+        if assignment.compact_responses:
+            await sync_to_async(ExamAssignmentService._save_to_document)(assignment, question, defaults)
+            return StudentResponse(id=None, exam_assignment=assignment, question=question,
+                                   student_id=assignment.student_id, **defaults)
+        response, _ = await StudentResponse.objects.aupdate_or_create(
+            exam_assignment=assignment,
+            question=question,
+            student_id=assignment.student_id,
+            defaults=defaults,
         )
         return response
 
     @staticmethod
+    def _save_to_document(assignment, question, defaults):
+        """Set one answer in the attempt's ResponseDocument with a single UPDATE."""
+        key = str(question.id)
+        entry = ExamAssignmentService._document_entry(defaults)
+        documents = ResponseDocument.objects.filter(pk=assignment.pk)
+        if documents.update(answers=JSONSet('answers', key, entry), updated_at=timezone.now()):
+            return
+        try:
+            with transaction.atomic():
+                ResponseDocument.objects.create(assignment=assignment, answers={key: entry})
+        except IntegrityError:
+            # Another autosave created the document first.
+            documents.update(answers=JSONSet('answers', key, entry), updated_at=timezone.now())
+
+    @staticmethod
+    def _document_entry(defaults):
+        return {
+            'answer_text': defaults['answer_text'],
+            'answer_options': [str(option) for option in defaults['answer_options']],
+            'auto_score': None if defaults['auto_score'] is None else str(defaults['auto_score']),
+            'saved_at': defaults['saved_at'].isoformat(),
+        }
+
+    @staticmethod
+    def materialize_document(assignment):
+        """Write an attempt's ResponseDocument out as StudentResponse rows and delete it.
+
+        ``compact_responses`` may have been switched during the attempt, so an
+        answer saved as a row after its document entry is kept.
+        """
+        document = ResponseDocument.objects.filter(pk=assignment.pk).first()
+        if document is None:
+            return 0
+        questions = set(map(str, Question.objects.filter(exam_id=assignment.exam_id).values_list('id', flat=True)))
+        stored = {
+            str(question_id): saved_at
+            for question_id, saved_at in StudentResponse.objects.filter(exam_assignment=assignment).values_list(
+                'question_id', Coalesce('saved_at', 'updated_at')
+            )
+        }
+        rows = [
+            StudentResponse(
+                exam_assignment=assignment, question_id=question_id, student_id=assignment.student_id,
+                answer_text=entry['answer_text'], answer_options=entry['answer_options'], is_answered=True,
+                auto_score=None if entry['auto_score'] is None else Decimal(entry['auto_score']),
+                saved_at=parse_datetime(entry['saved_at']),
+            )
+            for question_id, entry in document.answers.items()
+            if question_id in questions
+            and (question_id not in stored or stored[question_id] < parse_datetime(entry['saved_at']))
+        ]
+        StudentResponse.objects.bulk_create(
+            rows, update_conflicts=True, unique_fields=['exam_assignment', 'question'],
+            update_fields=ExamAssignmentService.ANSWER_FIELDS,
+        )
+        document.delete()
+        return len(rows)
+
+    @staticmethod
+    def _response_defaults(question, answer_data, options):
+        is_valid, error = AnswerValidationService.validate_answer(question, answer_data, options)
+        if not is_valid:
+            raise ValidationError(error)
+        return {
+            'answer_text': answer_data.get('answer_text'),
+            'answer_options': answer_data.get('answer_options', []),
+            'is_answered': True,
+            'auto_score': AnswerValidationService.auto_grade_answer(question, answer_data, options),
+            'saved_at': timezone.now(),
+        }
+
+    @staticmethod
+    def upload_answers(assignment_id, student_id, token, answers):
+        """Apply an offline answer set: ``[{question_id, answer_text, answer_options, saved_at}]``.
+
+        ``token`` is the attempt's signed package from ``offline.build``. Every
+        answer is applied in one transaction, last write wins per question by
+        ``saved_at``: an answer older than the one already stored is skipped as
+        stale. Answers saved after the deadline, to unknown questions, or that
+        fail validation are rejected. Uploads are accepted until
+        ``OFFLINE_UPLOAD_GRACE_SECONDS`` after the deadline.
+        """
+        offline.open_package(token, assignment_id, student_id)
+        with transaction.atomic():
+            try:
+                assignment = ExamAssignment.objects.select_for_update().select_related('exam').get(
+                    id=assignment_id, student_id=student_id
+                )
+            except ObjectDoesNotExist:
+                raise ValidationError("Invalid assignment ID.")
+            if assignment.status != ExamAssignment.Status.IN_PROGRESS:
+                raise ValidationError("Exam is not in progress.")
+            if timezone.now() > offline.upload_closes(assignment, assignment.exam):
+                raise ValidationError("The upload window for this exam has closed.")
+            deadline = offline.deadline(assignment, assignment.exam)
+
+            # Late edits are dropped first, so they cannot hide an in-time answer to the same question.
+            latest, rejected = {}, []
+            for answer in answers:
+                if answer['saved_at'] > deadline:
+                    rejected.append({'question_id': answer['question_id'], 'error': "Answer was saved after the deadline."})
+                    continue
+                current = latest.get(answer['question_id'])
+                if current is None or answer['saved_at'] > current['saved_at']:
+                    latest[answer['question_id']] = answer
+            questions = Question.objects.filter(exam_id=assignment.exam_id, id__in=latest).prefetch_related('options')
+            questions = {question.id: question for question in questions}
+
+            accepted = {}
+            for question_id, answer in latest.items():
+                question = questions.get(question_id)
+                if question is None:
+                    rejected.append({'question_id': question_id, 'error': "Question is not part of this exam."})
+                    continue
+                try:
+                    defaults = ExamAssignmentService._response_defaults(question, answer, list(question.options.all()))
+                except ValidationError as e:
+                    rejected.append({'question_id': question_id, 'error': e.messages[0]})
+                    continue
+                defaults['saved_at'] = answer['saved_at']
+                accepted[question_id] = defaults
+
+            if assignment.exam.compact_responses:
+                stale = ExamAssignmentService._upload_to_document(assignment, accepted)
+            else:
+                stale = ExamAssignmentService._upload_to_rows(assignment, accepted)
+        return {'applied': len(accepted) - len(stale), 'stale': sorted(stale, key=str), 'rejected': rejected}
+
+    @staticmethod
+    def _upload_to_rows(assignment, accepted):
+        stored = dict(
+            StudentResponse.objects.select_for_update()
+            .filter(exam_assignment=assignment, question_id__in=accepted)
+            .values_list('question_id', Coalesce('saved_at', 'updated_at'))
+        )
+        stale = [question_id for question_id, defaults in accepted.items()
+                 if question_id in stored and stored[question_id] >= defaults['saved_at']]
+        StudentResponse.objects.bulk_create(
+            [
+                StudentResponse(exam_assignment=assignment, question_id=question_id,
+                                student_id=assignment.student_id, **defaults)
+                for question_id, defaults in accepted.items()
+                if question_id not in stale
+            ],
+            update_conflicts=True, unique_fields=['exam_assignment', 'question'],
+            update_fields=ExamAssignmentService.ANSWER_FIELDS,
+        )
+        return stale
+
+    @staticmethod
+    def _upload_to_document(assignment, accepted):
+        document, _ = ResponseDocument.objects.select_for_update().get_or_create(assignment=assignment)
+        stale = []
+        for question_id, defaults in accepted.items():
+            stored = document.answers.get(str(question_id))
+            if stored is not None and parse_datetime(stored['saved_at']) >= defaults['saved_at']:
+                stale.append(question_id)
+            else:
+                document.answers[str(question_id)] = ExamAssignmentService._document_entry(defaults)
+        document.save()
+        return stale
+
+    @staticmethod
+    @transaction.atomic
     def submit_exam(assignment_id, student_id):
         try:
-            assignment = ExamAssignment.objects.get(id=assignment_id, student_id=student_id)
+            # Locked so a double submit cannot be counted twice in the statistics.
+            assignment = ExamAssignment.objects.select_for_update().select_related('exam').get(
+                id=assignment_id, student_id=student_id
+            )
         except ObjectDoesNotExist:
             raise ValidationError("Invalid assignment ID.")
 
@@ -123,9 +359,12 @@ class ExamAssignmentService:
 
         assignment.status = ExamAssignment.Status.SUBMITTED
         assignment.submitted_at = timezone.now()
+        # Whatever compact_responses is now, answers autosaved while it was set
+        # are still in the document.
+        ExamAssignmentService.materialize_document(assignment)
 
         total_score = 0
-        responses = assignment.responses.filter(is_answered=True)
+        responses = assignment.responses.filter(is_answered=True).select_related('question')
         needs_manual_grading = False
         
         for resp in responses:
@@ -140,4 +379,362 @@ class ExamAssignmentService:
              assignment.status = ExamAssignment.Status.GRADED
 
         assignment.save()
+        StatisticsService.record(assignment.exam, ExamAssignment.Status.IN_PROGRESS, assignment.status,
+                                 new_score=assignment.score)
+        events.publish_assignment(assignment)
+        return assignment
+
+    @staticmethod
+    @transaction.atomic
+    def grade_responses(assignment_id, grades):
+        """Record manual scores and re-total the assignment.
+
+        ``grades`` is a list of ``{'response', 'manual_score', 'instructor_feedback'}``.
+        A manual score replaces the auto score; the assignment becomes GRADED
+        once every answered essay and short answer has one.
+        """
+        try:
+            assignment = ExamAssignment.objects.select_for_update().select_related('exam').get(id=assignment_id)
+        except ObjectDoesNotExist:
+            raise ValidationError("Invalid assignment ID.")
+        if assignment.status not in StatisticsService.SCORED:
+            raise ValidationError("Only submitted exams can be graded.")
+
+        responses = {
+            response.id: response
+            for response in assignment.responses.filter(is_answered=True).select_related('question')
+        }
+        now = timezone.now()
+        for grade in grades:
+            response = responses.get(grade['response'])
+            if response is None:
+                raise ValidationError("Response does not belong to this assignment.")
+            if grade['manual_score'] > response.question.points:
+                raise ValidationError("Manual score exceeds the question's points.")
+            response.manual_score = grade['manual_score']
+            response.updated_at = now
+            if 'instructor_feedback' in grade:
+                response.instructor_feedback = grade['instructor_feedback']
+        StudentResponse.objects.bulk_update(
+            [responses[grade['response']] for grade in grades], ['manual_score', 'instructor_feedback', 'updated_at']
+        )
+
+        old_status, old_score = assignment.status, assignment.score
+        manual_types = (Question.QuestionType.ESSAY, Question.QuestionType.SHORT_ANSWER)
+        assignment.score = sum(
+            (response.manual_score if response.manual_score is not None else response.auto_score or 0)
+            for response in responses.values()
+        )
+        pending = any(
+            response.manual_score is None and response.question.question_type in manual_types
+            for response in responses.values()
+        )
+        assignment.status = ExamAssignment.Status.SUBMITTED if pending else ExamAssignment.Status.GRADED
+        assignment.save(update_fields=['score', 'status', 'updated_at'])
+        StatisticsService.record(assignment.exam, old_status, assignment.status, old_score, assignment.score)
+        events.publish_assignment(assignment)
         return assignment
+
+
+class StatisticsService:
+    """Maintains ``ExamStatistics`` incrementally and summarises it.
+
+    Every status or score change made through the services is applied as a
+    delta with F() arithmetic, so reading the summary never scans
+    ``ExamAssignment``. A template's row and bins are created with the exam
+    (see ``submissions.signals``), so its first attempts only add to them. Changes made elsewhere (admin edits, deletions, a
+    regrade that rewrites scores in bulk) need ``rebuild``. The same deltas
+    keep ``score_ranks`` in step once the transaction commits.
+    """
+    SCORED = (ExamAssignment.Status.SUBMITTED, ExamAssignment.Status.GRADED)
+    PERCENTILES = (25, 50, 75, 90)
+
+    @staticmethod
+    def key(exam):
+        return exam.parent_id or exam.id
+
+    @staticmethod
+    def bin_for(score, total_points):
+        """Return ``(percent, bin index)`` for a score on an exam worth ``total_points``."""
+        percent = float(score) * 100 / total_points if total_points else 0.0
+        index = min(ExamStatistics.BINS - 1, max(0, int(percent * ExamStatistics.BINS // 100)))
+        return percent, index
+
+    @staticmethod
+    def record(exam, old_status, new_status, old_score=None, new_score=None):
+        """Apply one assignment's transition; ``old_status`` is None for a new assignment."""
+        changes = {}
+        if old_status != new_status:
+            if old_status is not None:
+                changes[f'{old_status}_count'] = F(f'{old_status}_count') - 1
+            changes[f'{new_status}_count'] = F(f'{new_status}_count') + 1
+
+        bins = {}
+        percents = {-1: None, 1: None}
+        for status, score, sign in ((old_status, old_score, -1), (new_status, new_score, 1)):
+            if status not in StatisticsService.SCORED or score is None:
+                continue
+            percent, index = StatisticsService.bin_for(score, exam.total_points)
+            percents[sign] = percent
+            bins[index] = bins.get(index, 0) + sign
+            for field, value in (('scored_count', sign), ('score_total', sign * Decimal(score)),
+                                 ('percent_total', sign * percent)):
+                changes[field] = changes.get(field, F(field)) + value
+
+        key = StatisticsService.key(exam)
+        with transaction.atomic():
+            if not ExamStatistics.objects.filter(pk=key).update(updated_at=timezone.now(), **changes):
+                # An exam created before the table was added: count what is there.
+                StatisticsService.rebuild(key)
+                return
+            for index, delta in bins.items():
+                if delta:
+                    ExamScoreBin.objects.filter(statistics_id=key, index=index).update(count=F('count') + delta)
+            if percents[-1] != percents[1]:
+                transaction.on_commit(lambda: score_ranks.replace(key, percents[-1], percents[1]))
+
+    @staticmethod
+    def record_assigned(template, count):
+        """Count ``count`` new NOT_STARTED assignments of ``template`` or its variants."""
+        if not count:
+            return
+        field = f'{ExamAssignment.Status.NOT_STARTED}_count'
+        updated = ExamStatistics.objects.filter(pk=template.id).update(
+            updated_at=timezone.now(), **{field: F(field) + count}
+        )
+        if not updated:
+            StatisticsService.rebuild(template.id)
+
+    @staticmethod
+    def create(exam_id):
+        """Add the empty statistics row and bins of a new template exam."""
+        statistics = ExamStatistics.objects.create(exam_id=exam_id)
+        ExamScoreBin.objects.bulk_create(
+            ExamScoreBin(statistics=statistics, index=index) for index in range(ExamStatistics.BINS)
+        )
+        return statistics
+
+    @staticmethod
+    @transaction.atomic
+    def rebuild(exam_id):
+        """Recount the statistics of a template exam from its assignments."""
+        # Holding the row lock while reading makes a concurrent record() apply
+        # its delta after this count instead of being overwritten by it, and
+        # makes concurrent rebuilds run one after another. The row is created
+        # first, as a missing row cannot be locked.
+        ExamStatistics.objects.get_or_create(exam_id=exam_id)
+        list(ExamStatistics.objects.select_for_update().filter(pk=exam_id).values_list('pk'))
+        values = {f'{status}_count': 0 for status in ExamAssignment.Status.values}
+        values.update(scored_count=0, score_total=Decimal(0), percent_total=0.0)
+        counts = [0] * ExamStatistics.BINS
+        rows = chain.from_iterable(
+            model.objects.filter(Q(exam_id=exam_id) | Q(exam__parent_id=exam_id)).values_list(
+                'status', 'score', 'exam__total_points'
+            ).iterator()
+            for model in (ExamAssignment, ArchivedAssignment)
+        )
+        for status, score, total_points in rows:
+            values[f'{status}_count'] += 1
+            if status in StatisticsService.SCORED and score is not None:
+                percent, index = StatisticsService.bin_for(score, total_points)
+                counts[index] += 1
+                values['scored_count'] += 1
+                values['score_total'] += score
+                values['percent_total'] += percent
+
+        transaction.on_commit(lambda: score_ranks.invalidate(exam_id))
+        ExamStatistics.objects.filter(pk=exam_id).update(updated_at=timezone.now(), **values)
+        statistics = ExamStatistics.objects.get(pk=exam_id)
+        ExamScoreBin.objects.filter(statistics=statistics).delete()
+        ExamScoreBin.objects.bulk_create(
+            ExamScoreBin(statistics=statistics, index=index, count=count) for index, count in enumerate(counts)
+        )
+        return statistics
+
+    @staticmethod
+    def percentile(counts, p):
+        """Estimate the ``p``th percentile, in percent of total points, from bin counts.
+
+        Linear interpolation inside the bin holding the target rank, so the
+        error is at most one bin width.
+        """
+        total = sum(counts)
+        if not total:
+            return None
+        width = 100 / len(counts)
+        target = total * p / 100
+        seen = 0
+        for index, count in enumerate(counts):
+            if count and seen + count >= target:
+                return round(index * width + (target - seen) / count * width, 2)
+            seen += count
+        return 100.0
+
+    @staticmethod
+    def summary(exam):
+        key = StatisticsService.key(exam)
+        statistics = ExamStatistics.objects.filter(pk=key).first() or StatisticsService.rebuild(key)
+        counts = list(ExamScoreBin.objects.filter(statistics=statistics).values_list('count', flat=True))
+        width = 100 / ExamStatistics.BINS
+        scored = statistics.scored_count
+        percentiles = {f'p{p}': StatisticsService.percentile(counts, p) for p in StatisticsService.PERCENTILES}
+        return {
+            'exam': key,
+            'status_counts': {status: getattr(statistics, f'{status}_count') for status in ExamAssignment.Status.values},
+            'submitted': scored,
+            'mean_score': round(statistics.score_total / scored, 2) if scored else None,
+            'mean_percent': round(statistics.percent_total / scored, 2) if scored else None,
+            'median_percent': percentiles['p50'],
+            'percentiles': percentiles,
+            'histogram': [
+                {'lower': round(index * width, 2), 'upper': round((index + 1) * width, 2), 'count': count}
+                for index, count in enumerate(counts)
+            ],
+            'updated_at': statistics.updated_at,
+        }
+
+
+class ArchiveService:
+    """Moves graded attempts of old exams to cold storage and reads them back.
+
+    Each attempt becomes one record in its exam's segment (see
+    ``submissions.archive``) holding the assignment row, its responses and its
+    proctoring events, and an ``ArchivedAssignment`` index row. Segments are
+    written and synced before the chunk's index rows are committed and its
+    database rows deleted, one transaction per chunk. Statistics and ranks
+    keep counting archived attempts.
+    """
+
+    @staticmethod
+    def candidates(cutoff):
+        return ExamAssignment.objects.filter(status=ExamAssignment.Status.GRADED, exam__created_at__lt=cutoff)
+
+    @staticmethod
+    def archive(cutoff, chunk_size=500):
+        """Archive GRADED attempts of exams created before ``cutoff``; returns how many moved."""
+        moved = 0
+        exam_ids = list(ArchiveService.candidates(cutoff).order_by().values_list('exam_id', flat=True).distinct())
+        for exam_id in exam_ids:
+            while True:
+                ids = list(
+                    ArchiveService.candidates(cutoff).filter(exam_id=exam_id).order_by().values_list('id', flat=True)[:chunk_size]
+                )
+                if not ids:
+                    break
+                moved += ArchiveService.archive_chunk(exam_id, ids)
+        return moved
+
+    @staticmethod
+    def archive_chunk(exam_id, ids):
+        records = list(ExamAssignment.objects.filter(id__in=ids).order_by().values())
+        responses, activities = defaultdict(list), defaultdict(list)
+        for row in StudentResponse.objects.filter(exam_assignment_id__in=ids).order_by('created_at').values():
+            responses[row['exam_assignment_id']].append(row)
+        for row in SuspiciousActivity.objects.filter(exam_assignment_id__in=ids).order_by('timestamp').values():
+            activities[row['exam_assignment_id']].append(row)
+        for record in records:
+            record['responses'] = responses[record['id']]
+            record['suspicious_activities'] = activities[record['id']]
+
+        segment = archive.segment_name(exam_id)
+        slices = archive.append(segment, records)
+        with transaction.atomic():
+            ArchivedAssignment.objects.bulk_create([
+                ArchivedAssignment(
+                    id=record['id'], exam_id=record['exam_id'], student_id=record['student_id'],
+                    status=record['status'], score=record['score'], submitted_at=record['submitted_at'],
+                    segment=segment, offset=offset, length=length,
+                )
+                for record, (offset, length) in zip(records, slices)
+            ])
+            StudentResponse.objects.filter(exam_assignment_id__in=ids).delete()
+            SuspiciousActivity.objects.filter(exam_assignment_id__in=ids).delete()
+            ExamAssignment.objects.filter(id__in=ids).delete()
+        return len(records)
+
+    @staticmethod
+    def visible_to(user):
+        queryset = ArchivedAssignment.objects.select_related('exam', 'student')
+        if user.role == 'instructor':
+            return queryset.filter(exam__instructor=user)
+        elif user.role == 'student':
+            return queryset.filter(student=user)
+        return ArchivedAssignment.objects.none()
+
+    @staticmethod
+    def load(archived):
+        """The archived record of one attempt, read from its slice of the segment."""
+        return archive.read(archived.segment, archived.offset, archived.length)
+
+
+class CollusionService:
+    """Flags essay answers to the same question that are near copies of each other.
+
+    Submitted essays are compared with TF-IDF cosine similarity (see
+    ``submissions.similarity``). Answers to the copies of a bank question in
+    generated variants are compared with each other and with answers to the
+    bank question itself. Each pair at or above the threshold becomes a
+    POSSIBLE_COLLUSION event on both attempts, with the peer and the score in
+    ``metadata``. Pairs that already have an event are left alone, so reruns
+    only add new pairs and never touch reviewed events.
+    """
+
+    @staticmethod
+    def essay_questions(exam_ids=None):
+        """Original essay questions with submitted answers, to their copies included.
+
+        ``exam_ids`` limits this to answers given in those exams or their variants.
+        """
+        answered = StudentResponse.objects.filter(
+            question__question_type=Question.QuestionType.ESSAY,
+            is_answered=True,
+            exam_assignment__status__in=StatisticsService.SCORED,
+        )
+        if exam_ids:
+            answered = answered.filter(
+                Q(exam_assignment__exam_id__in=exam_ids) | Q(exam_assignment__exam__parent_id__in=exam_ids)
+            )
+        return Question.objects.filter(id__in=answered.values(root=Coalesce('question__source_id', 'question_id')))
+
+    @staticmethod
+    def scan(question, threshold=similarity.DEFAULT_THRESHOLD, top_k=similarity.DEFAULT_TOP_K):
+        """Record events for one question's similar essays; returns how many pairs were new."""
+        rows = []
+        for assignment_id, student_id, exam_id, text in StudentResponse.objects.filter(
+            Q(question=question) | Q(question__source=question),
+            is_answered=True, exam_assignment__status__in=StatisticsService.SCORED,
+        ).values_list(
+            'exam_assignment_id', 'student_id',
+            Coalesce('exam_assignment__exam__parent_id', 'exam_assignment__exam_id'), 'answer_text',
+        ).iterator(chunk_size=2000):
+            words = similarity.tokenize(text)
+            if len(words) >= similarity.MIN_WORDS:
+                rows.append((assignment_id, student_id, exam_id, words))
+        if len(rows) < 2:
+            return 0
+
+        pairs = similarity.similar_pairs(similarity.tfidf([row[3] for row in rows]), threshold, top_k)
+        existing = {
+            (assignment_id, peer)
+            for assignment_id, peer in SuspiciousActivity.objects.filter(
+                activity_type=SuspiciousActivity.ActivityType.POSSIBLE_COLLUSION, metadata__question=str(question.id),
+            ).values_list('exam_assignment_id', 'metadata__peer_assignment')
+        }
+        activities, exam_ids = [], []
+        for (i, j), score in sorted(pairs.items(), key=lambda item: -item[1]):
+            if (rows[i][0], str(rows[j][0])) in existing:
+                continue
+            severity = SuspiciousActivity.Severity.HIGH if score >= 0.95 else SuspiciousActivity.Severity.MEDIUM
+            for this, peer in ((rows[i], rows[j]), (rows[j], rows[i])):
+                activities.append(SuspiciousActivity(
+                    exam_assignment_id=this[0], student_id=this[1], severity=severity,
+                    activity_type=SuspiciousActivity.ActivityType.POSSIBLE_COLLUSION,
+                    metadata={'question': str(question.id), 'peer_assignment': str(peer[0]),
+                              'peer_student': str(peer[1]), 'similarity': score},
+                ))
+                exam_ids.append(this[2])
+        with transaction.atomic():
+            SuspiciousActivity.objects.bulk_create(activities, batch_size=1000)
+            for activity, exam_id in zip(activities, exam_ids):
+                events.publish_activity(activity, exam_id)
+        return len(activities) // 2
@@ -0,0 +1,13 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from exams.models import Exam
+
+from .services import StatisticsService
+
+
+@receiver(post_save, sender=Exam)
+def exam_created(sender, instance, created, raw=False, **kwargs):
+    # Variants count towards their template's row.
+    if created and not raw and instance.parent_id is None:
+        StatisticsService.create(instance.pk)
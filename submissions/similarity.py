@@ -0,0 +1,87 @@
+"""
+Essay similarity with sparse TF-IDF vectors.
+
+Each essay becomes a row of a CSR matrix over the vocabulary of its
+question's essays: sublinear term frequency (``1 + log tf``) times smoothed
+inverse document frequency, normalised to unit length, so a dot product of
+two rows is their cosine similarity. Common English function words are not
+counted. Terms used in only one essay cannot link two essays and are dropped
+once the rows are normalised; they still count towards each essay's length,
+so essays that share only a few words score low.
+
+Neighbours are found blockwise: ``BLOCK_SIZE`` rows at a time are multiplied
+against the whole matrix, giving a dense ``BLOCK_SIZE x n`` slab of
+similarities, and only each row's ``top_k`` best matches above the threshold
+are kept. Memory stays bounded by the block while the work is a handful of
+sparse products, which covers several thousand essays per question in
+seconds.
+"""
+import re
+
+import numpy as np
+from scipy import sparse
+
+BLOCK_SIZE = 512
+DEFAULT_THRESHOLD = 0.8
+DEFAULT_TOP_K = 5
+# Essays shorter than this many words are too generic to compare.
+MIN_WORDS = 5
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+STOP_WORDS = frozenset(
+    'a about above after again against all am an and any are as at be because been before being below between '
+    'both but by can could did do does doing down during each few for from further had has have having he her '
+    'here hers him his how i if in into is it its itself just me more most my no nor not of off on once only or '
+    'other our ours out over own same she should so some such than that the their theirs them then there these '
+    'they this those through to too under until up very was we were what when where which while who whom why '
+    'will with would you your yours'.split()
+)
+
+
+def tokenize(text):
+    return [word for word in _WORD.findall((text or '').lower()) if word not in STOP_WORDS]
+
+
+def tfidf(documents):
+    """Unit-length TF-IDF rows for tokenised ``documents`` as a CSR matrix."""
+    vocabulary = {}
+    terms = np.fromiter(
+        (vocabulary.setdefault(word, len(vocabulary)) for words in documents for word in words), dtype=np.int64,
+    )
+    rows = np.repeat(np.arange(len(documents)), [len(words) for words in documents])
+    # Duplicate (row, term) entries are summed into term counts.
+    counts = sparse.csr_matrix(
+        (np.ones(len(terms), dtype=np.float32), (rows, terms)), shape=(len(documents), len(vocabulary))
+    )
+    counts.sum_duplicates()
+
+    document_frequency = np.bincount(counts.indices, minlength=len(vocabulary))
+    counts.data = 1 + np.log(counts.data)
+    idf = 1 + np.log((1 + len(documents)) / (1 + document_frequency)).astype(np.float32)
+    matrix = counts @ sparse.diags(idf)
+
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    matrix = sparse.csr_matrix(sparse.diags(1 / norms) @ matrix)
+    return matrix[:, np.flatnonzero(document_frequency > 1)]
+
+
+def similar_pairs(matrix, threshold=DEFAULT_THRESHOLD, top_k=DEFAULT_TOP_K, block_size=BLOCK_SIZE):
+    """``{(i, j): similarity}`` with ``i < j`` for each row's ``top_k`` neighbours at or above ``threshold``."""
+    transposed = matrix.T.tocsc()
+    n = matrix.shape[0]
+    k = min(top_k, n - 1)
+    pairs = {}
+    if k <= 0:
+        return pairs
+    for start in range(0, n, block_size):
+        block = (matrix[start:start + block_size] @ transposed).toarray()
+        block[np.arange(block.shape[0]), np.arange(start, start + block.shape[0])] = 0
+        best = np.argpartition(-block, k - 1, axis=1)[:, :k]
+        for offset, neighbours in enumerate(best):
+            i = start + offset
+            for j in map(int, neighbours):
+                score = float(block[offset, j])
+                if score >= threshold:
+                    pairs[(min(i, j), max(i, j))] = round(min(score, 1.0), 4)
+    return pairs
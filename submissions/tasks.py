@@ -0,0 +1,38 @@
+from datetime import timedelta
+
+from django.utils import timezone
+
+from exams.models import Exam
+from jobs.registry import task
+
+from . import similarity
+from .services import ArchiveService, CollusionService, StatisticsService
+
+
+@task('submissions.rebuild_statistics')
+def rebuild_statistics(exam_ids=None):
+    exams = Exam.objects.filter(parent__isnull=True)
+    if exam_ids:
+        exams = exams.filter(id__in=exam_ids)
+    rebuilt = 0
+    for exam_id in exams.values_list('id', flat=True).iterator():
+        StatisticsService.rebuild(exam_id)
+        rebuilt += 1
+    return {'rebuilt': rebuilt}
+
+
+@task('submissions.archive_attempts', max_attempts=5)
+def archive_attempts(days=365, chunk_size=500):
+    # Each chunk commits on its own, so a retry only moves what is left.
+    moved = ArchiveService.archive(timezone.now() - timedelta(days=days), chunk_size=chunk_size)
+    return {'archived': moved}
+
+
+@task('submissions.detect_collusion')
+def detect_collusion(exam_ids=None, threshold=similarity.DEFAULT_THRESHOLD, top_k=similarity.DEFAULT_TOP_K):
+    questions = CollusionService.essay_questions(exam_ids)
+    flagged = scanned = 0
+    for question in questions.iterator():
+        flagged += CollusionService.scan(question, threshold, top_k)
+        scanned += 1
+    return {'scanned': scanned, 'flagged': flagged}
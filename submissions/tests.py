@@ -1,11 +1,46 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import json
+import os
+import msgpack
+import tempfile
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+from asgiref.sync import sync_to_async
+from django.test import TestCase, RequestFactory, override_settings
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core import signing
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 from rest_framework.test import APIClient
 from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken
+from accounts.cache import specialization_cache
 from accounts.models import EngineeringSpecialization
-from exams.models import Exam, Question, QuestionOption
-from submissions.models import ExamAssignment
-from submissions.services import ExamAssignmentService
+from exams.models import Exam, Question, QuestionBank, QuestionOption
+from exams.services import ExamGeneratorService, ExamPrewarmService
+from exams.tests import ExamFixtureMixin
+from submissions.models import (ArchivedAssignment, ExamAssignment, ExamStatistics, ResponseDocument, StudentResponse,
+                                SuspiciousActivity)
+from submissions import offline
+from submissions.admission import AdmissionGate
+from submissions.events import hub
+from submissions.ranking import score_ranks
+from submissions.throttling import TokenBucket
+from submissions.services import CollusionService, ExamAssignmentService, StatisticsService
+from mysite.db_router import PIN_COOKIE, PrimaryReplicaRouter, ReplicaRoutingMiddleware
+from mysite import index_advisor, querylog
+from mysite.messagepack import decode_ext
 
 User = get_user_model()
 
@@ -79,3 +114,967 @@ class ExamFlowTests(TestCase):
         # Test idempotency
         assignment2 = ExamAssignmentService.start_exam(self.exam.id, self.student.id)
         self.assertEqual(assignment.id, assignment2.id)
+
+
+class BenchmarkCommandTests(TestCase):
+    def test_benchmark_reports_every_endpoint(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, 'bench.json')
+            call_command('benchmark_exam_flow', students=2, questions=3, concurrency=1, output=output, stdout=StringIO())
+            with open(output) as fh:
+                report = json.load(fh)
+
+        self.assertEqual(report['run']['requests'], 2 * (3 + 2))
+        self.assertEqual(set(report['endpoints']), {'start_exam', 'submit_answer', 'submit_exam'})
+        self.assertEqual(report['endpoints']['submit_answer']['errors'], 0)
+        self.assertIn('p99', report['endpoints']['submit_answer']['latency_ms'])
+        self.assertFalse(User.objects.filter(email__startswith='bench-').exists())
+
+
+class GenerateDatasetCommandTests(TestCase):
+    def test_generates_consistent_volumes(self):
+        call_command(
+            'generate_dataset', instructors=2, students_per_specialization=3, exams_per_instructor=2,
+            questions_per_exam=4, assignments_per_exam=3, batch_size=7, stdout=StringIO(),
+        )
+        self.assertEqual(Exam.objects.count(), 4)
+        self.assertEqual(ExamAssignment.objects.count(), 12)
+        started = ExamAssignment.objects.exclude(status=ExamAssignment.Status.NOT_STARTED).count()
+        self.assertEqual(StudentResponse.objects.count(), started * 4)
+        response = StudentResponse.objects.select_related('exam_assignment', 'question').first()
+        self.assertEqual(response.exam_assignment.exam_id, response.question.exam_id)
+        self.assertTrue(User.objects.get(email='gen42-instructor-0@example.com').check_password('password'))
+
+
+class SubmissionQueryBudgetTests(ExamFixtureMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.spec = EngineeringSpecialization.objects.create(name="Mechanical Engineering", code="ME")
+        self.instructor = User.objects.create_user(email='inst@test.com', password='password', role='instructor')
+        self.student = User.objects.create_user(
+            email='student@test.com', password='password', role='student', specialization=self.spec
+        )
+        self.exams = self.create_exams(self.instructor, self.spec, exams=3)
+        self.students = [self.student] + [
+            User.objects.create_user(email=f'student{i}@test.com', password='password', role='student', specialization=self.spec)
+            for i in range(4)
+        ]
+        for exam in self.exams:
+            self.assign(exam, self.students)
+        # Test transactions never commit, so announce the new rows by hand.
+        specialization_cache.invalidate()
+        specialization_cache.all()
+
+    def assign(self, exam, students):
+        questions = list(exam.questions.prefetch_related('options'))
+        for student in students:
+            assignment = ExamAssignment.objects.create(
+                exam=exam, student=student, status=ExamAssignment.Status.IN_PROGRESS
+            )
+            StudentResponse.objects.bulk_create([
+                StudentResponse(
+                    exam_assignment=assignment,
+                    question=question,
+                    student=student,
+                    answer_options=[str(question.options.all()[0].id)],
+                    is_answered=True,
+                )
+                for question in questions
+            ])
+            SuspiciousActivity.objects.create(
+                exam_assignment=assignment,
+                student=student,
+                activity_type=SuspiciousActivity.ActivityType.TAB_SWITCH,
+                severity=SuspiciousActivity.Severity.LOW,
+            )
+
+    def assertQueryBudget(self, user, url, budget):
+        self.client.force_authenticate(user=User.objects.get(pk=user.pk))
+        with self.assertNumQueries(budget):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def grow(self):
+        for exam in self.exams:
+            self.add_questions(exam, questions=15, options=5)
+        self.assign_new_exams = self.create_exams(self.instructor, self.spec, exams=3, questions=10, start=3)
+        for exam in self.assign_new_exams:
+            self.assign(exam, self.students)
+
+    def test_instructor_assignment_list_budget_is_constant(self):
+        self.assertQueryBudget(self.instructor, '/api/submissions/exam_assignments/', 5)
+        self.grow()
+        response = self.assertQueryBudget(self.instructor, '/api/submissions/exam_assignments/', 5)
+        self.assertEqual(len(response.data['results']), 20)
+
+    def test_student_assignment_list_budget_is_constant(self):
+        self.assertQueryBudget(self.student, '/api/submissions/exam_assignments/', 5)
+        self.grow()
+        self.assertQueryBudget(self.student, '/api/submissions/exam_assignments/', 5)
+
+    def test_assignment_detail_budget_is_constant(self):
+        assignment = ExamAssignment.objects.filter(student=self.student).first()
+        url = f'/api/submissions/exam_assignments/{assignment.id}/'
+        self.assertQueryBudget(self.student, url, 4)
+        self.add_questions(assignment.exam, questions=30, options=5)
+        self.assertQueryBudget(self.student, url, 4)
+
+    def test_summary_is_one_query(self):
+        ExamAssignment.objects.filter(student=self.student).update(started_at=timezone.now() - timedelta(minutes=15))
+        response = self.assertQueryBudget(self.student, '/api/submissions/exam_assignments/summary/', 1)
+        self.grow()
+        response = self.assertQueryBudget(self.student, '/api/submissions/exam_assignments/summary/', 1)
+        self.assertEqual(len(response.data), 6)
+        row = next(r for r in response.data if r['started_at'] is not None)
+        self.assertEqual(row['exam_title'], ExamAssignment.objects.get(pk=row['id']).exam.title)
+        self.assertAlmostEqual(row['remaining_seconds'], 45 * 60, delta=5)
+
+    def test_response_list_budget_is_constant(self):
+        self.assertQueryBudget(self.student, '/api/submissions/responses/', 2)
+        self.grow()
+        self.assertQueryBudget(self.student, '/api/submissions/responses/', 2)
+
+    def test_suspicious_activity_list_budget_is_constant(self):
+        self.assertQueryBudget(self.instructor, '/api/submissions/suspicious-activity/', 5)
+        self.grow()
+        self.assertQueryBudget(self.instructor, '/api/submissions/suspicious-activity/', 5)
+
+    def test_suspicious_activity_create(self):
+        assignment = ExamAssignment.objects.filter(student=self.student).first()
+        self.client.force_authenticate(user=self.student)
+        response = self.client.post('/api/submissions/suspicious-activity/', {
+            'assignment_id': str(assignment.id),
+            'activity_type': 'tab_switch',
+            'severity': 'low',
+            'metadata': {'count': 1},
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(assignment.suspicious_activities.count(), 2)
+
+
+@override_settings(DATABASES={**settings.DATABASES, 'replica': settings.DATABASES['default']})
+class ReplicaRoutingTests(TestCase):
+    """Routing decisions only; the test run has no separate replica connection."""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.router = PrimaryReplicaRouter()
+
+    def route(self, request, write=False):
+        seen = {}
+
+        def view(request):
+            seen['before'] = self.router.db_for_read(ExamAssignment)
+            if write:
+                self.router.db_for_write(ExamAssignment)
+            seen['after'] = self.router.db_for_read(ExamAssignment)
+            return HttpResponse()
+
+        def handler(request):
+            # Stands in for Django's handler, which runs process_view inside the middleware call.
+            middleware.process_view(request, view, (), {})
+            return view(request)
+
+        middleware = ReplicaRoutingMiddleware(handler)
+        return seen, middleware(request)
+
+    def test_safe_requests_read_from_replica(self):
+        seen, response = self.route(self.factory.get('/api/exams/'))
+        self.assertEqual(seen, {'before': 'replica', 'after': 'replica'})
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_writes_pin_request_and_client_to_primary(self):
+        seen, response = self.route(self.factory.post('/api/submissions/exam_assignments/1/submit_answer/'), write=True)
+        self.assertEqual(seen, {'before': 'default', 'after': 'default'})
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+        request = self.factory.get('/api/submissions/exam_assignments/1/')
+        request.COOKIES[PIN_COOKIE] = response.cookies[PIN_COOKIE].value
+        seen, _ = self.route(request)
+        self.assertEqual(seen, {'before': 'default', 'after': 'default'})
+
+    def test_write_during_safe_request_pins_rest_of_request(self):
+        seen, response = self.route(self.factory.get('/api/exams/'), write=True)
+        self.assertEqual(seen, {'before': 'replica', 'after': 'default'})
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+    def test_reads_outside_requests_use_primary(self):
+        self.assertEqual(self.router.db_for_read(ExamAssignment), 'default')
+
+
+class MessagePackTests(ExamFixtureMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.spec = EngineeringSpecialization.objects.create(name="Chemical Engineering", code="CH")
+        self.instructor = User.objects.create_user(email='inst@test.com', password='password', role='instructor')
+        self.student = User.objects.create_user(
+            email='student@test.com', password='password', role='student', specialization=self.spec
+        )
+        self.exam = self.create_exams(self.instructor, self.spec, exams=1, questions=20)[0]
+        self.client.force_authenticate(user=self.student)
+
+    def unpack(self, response):
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        return msgpack.unpackb(response.content, ext_hook=decode_ext)
+
+    def test_exam_paper_round_trips_and_is_smaller(self):
+        url = f'/api/exams/{self.exam.id}/'
+        as_json = self.client.get(url)
+        as_msgpack = self.client.get(url, HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(self.unpack(as_msgpack), json.loads(as_json.content))
+        self.assertLess(len(as_msgpack.content), len(as_json.content) * 0.8)
+
+    def test_submit_answer_accepts_msgpack_body(self):
+        assignment = ExamAssignmentService.start_exam(self.exam.id, self.student.id)
+        question = self.exam.questions.first()
+        option = question.options.get(is_correct=True)
+        body = msgpack.packb({'question_id': str(question.id), 'answer_options': [str(option.id)]})
+        response = self.client.post(
+            f'/api/submissions/exam_assignments/{assignment.id}/submit_answer/',
+            data=body, content_type='application/msgpack', HTTP_ACCEPT='application/msgpack',
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = self.unpack(response)
+        self.assertEqual(data['question'], str(question.id))
+        self.assertEqual(data['auto_score'], '1.00')
+
+
+class AsyncSubmitAnswerTests(ExamFixtureMixin, TestCase):
+    def setUp(self):
+        self.spec = EngineeringSpecialization.objects.create(name="Mining Engineering", code="MN")
+        self.instructor = User.objects.create_user(email='inst@test.com', password='password', role='instructor')
+        self.student = User.objects.create_user(
+            email='student@test.com', password='password', role='student', specialization=self.spec
+        )
+        self.exam = self.create_exams(self.instructor, self.spec, exams=1)[0]
+        self.assignment = ExamAssignmentService.start_exam(self.exam.id, self.student.id)
+        self.question = self.exam.questions.first()
+        self.url = reverse('examassignment-submit-answer-async', args=[self.assignment.id])
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.student)}')
+
+    def test_matches_the_sync_action(self):
+        option = self.question.options.get(is_correct=True)
+        body = {'question_id': str(self.question.id), 'answer_options': [str(option.id)]}
+        response = self.client.post(self.url, body, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        stored = StudentResponse.objects.get(exam_assignment=self.assignment, question=self.question)
+        self.assertEqual(stored.auto_score, 1)
+        self.client.force_authenticate(user=self.student)
+        sync = self.client.post(
+            reverse('examassignment-submit-answer', args=[self.assignment.id]), body, format='json'
+        )
+        self.assertEqual(json.loads(response.content), json.loads(sync.content))
+
+    def test_rejects_missing_token_and_finished_exam(self):
+        response = APIClient().post(self.url, {'question_id': str(self.question.id)}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        ExamAssignment.objects.filter(pk=self.assignment.pk).update(status=ExamAssignment.Status.SUBMITTED)
+        response = self.client.post(
+            self.url, {'question_id': str(self.question.id), 'answer_text': 'x'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('not in progress', response.json()['error'])
+
+
+class ProctoringEventStreamTests(ExamFixtureMixin, TestCase):
+    def setUp(self):
+        self.spec = EngineeringSpecialization.objects.create(name="Marine Engineering", code="MA")
+        self.instructor = User.objects.create_user(email='inst@test.com', password='password', role='instructor')
+        self.other_instructor = User.objects.create_user(email='inst2@test.com', password='password', role='instructor')
+        self.student = User.objects.create_user(
+            email='student@test.com', password='password', role='student', specialization=self.spec
+        )
+        self.exam = self.create_exams(self.instructor, self.spec, exams=1)[0]
+        self.url = reverse('exam-events', args=[self.exam.id])
+
+    def start_exam(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return ExamAssignmentService.start_exam(self.exam.id, self.student.id)
+
+    def test_hub_encodes_each_event_once(self):
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        subscriptions = [hub.subscribe(self.exam.id, loop, asyncio.Queue()) for _ in range(3)]
+        # Published from this thread, delivered on the subscribers' loop.
+        self.start_exam()
+        async def drain():
+            return [await s.queue.get() for s in subscriptions]
+
+        received = loop.run_until_complete(drain())
+        for subscription in subscriptions:
+            hub.unsubscribe(self.exam.id, subscription)
+
+        self.assertTrue(all(event is received[0] for event in received))
+        self.assertEqual(received[0][1], 'assignment')
+        self.assertEqual(json.loads(received[0][2])['status'], 'in_progress')
+        self.assertFalse(hub.has_subscribers(self.exam.id))
+
+    async def test_owner_streams_events(self):
+        token = str(AccessToken.for_user(self.instructor))
+        response = await self.async_client.get(self.url, {'token': token})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertTrue((await anext(stream)).startswith(b'retry:'))
+
+        await sync_to_async(self.start_exam)()
+        frame = (await asyncio.wait_for(anext(stream), 1)).decode()
+        # A client disconnect cancels the pending read.
+        pending = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0)
+        pending.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await pending
+        self.assertIn('event: assignment\n', frame)
+        self.assertIn('"status":"in_progress"', frame)
+        self.assertFalse(hub.has_subscribers(self.exam.id))
+
+    def test_activity_is_only_looked_up_for_watchers(self):
+        assignment = self.start_exam()
+        client = APIClient()
+        client.force_authenticate(user=self.student)
+        event = {'assignment_id': str(assignment.id), 'activity_type': 'tab_switch', 'severity': 'low'}
+        with CaptureQueriesContext(connection) as queries:
+            response = client.post(reverse('suspiciousactivity-list'), event, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        sql = ' '.join(query['sql'] for query in queries.captured_queries)
+        self.assertNotIn('SELECT COALESCE("exams_exam"."parent_id", "submissions_examassignment"."exam_id")', sql)
+
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        subscription = hub.subscribe(self.exam.id, loop, asyncio.Queue())
+        self.addCleanup(hub.unsubscribe, self.exam.id, subscription)
+        with self.captureOnCommitCallbacks(execute=True):
+            client.post(reverse('suspiciousactivity-list'), event, format='json')
+        received = loop.run_until_complete(subscription.queue.get())
+        self.assertEqual(received[1], 'activity')
+
+    def test_variant_attempts_reach_the_templates_watchers(self):
+        template = self.create_exams(self.instructor, self.spec, exams=1, questions=0)[0]
+        bank = QuestionBank.objects.create(instructor=self.instructor, specialization=self.spec, name='Hulls', topic='hull')
+        bank.questions.add(self.exam.questions.first())
+        ExamGeneratorService.generate(template, [(('hull', ''), 1)], [bank], [self.student], seed=1)
+        variant = Exam.objects.get(parent=template)
+
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        subscription = hub.subscribe(template.id, loop, asyncio.Queue())
+        self.addCleanup(hub.unsubscribe, template.id, subscription)
+        with self.captureOnCommitCallbacks(execute=True):
+            assignment = ExamAssignmentService.start_exam(variant.id, self.student.id)
+        client = APIClient()
+        client.force_authenticate(user=self.student)
+        event = {'assignment_id': str(assignment.id), 'activity_type': 'tab_switch', 'severity': 'low'}
+        with self.captureOnCommitCallbacks(execute=True):
+            client.post(reverse('suspiciousactivity-list'), event, format='json')
+
+        async def drain():
+            return [await subscription.queue.get() for _ in range(2)]
+
+        received = loop.run_until_complete(drain())
+        self.assertEqual([event[1] for event in received], ['assignment', 'activity'])
+        self.assertEqual(json.loads(received[0][2])['id'], str(assignment.id))
+
+    def test_only_the_exam_owner_may_watch(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.client.get(self.url, {'token': str(AccessToken.for_user(self.other_instructor))})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ExamStatisticsTests(ExamFixtureMixin, TestCase):
+    def setUp(self):
+        self.spec = EngineeringSpecialization.objects.create(name="Nuclear Engineering", code="NE")
+        self.instructor = User.objects.create_user(email='inst@test.com', password='password', role='instructor')
+        self.students = [
+            User.objects.create_user(email=f's{i}@test.com', password='password', role='student', specialization=self.spec)
+            for i in range(4)
+        ]
+        self.exam = self.create_exams(self.instructor, self.spec, exams=1, questions=4)[0]
+        self.essay = Question.objects.create(
+            exam=self.exam, question_text='Explain.', question_type=Question.QuestionType.ESSAY, points=4, order_index=4
+        )
+        Exam.objects.filter(pk=self.exam.pk).update(total_points=8)
+        self.exam.refresh_from_db()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.instructor)
+
+    def take(self, student, correct, essay=False):
+        assignment = ExamAssignmentService.start_exam(self.exam.id, student.id)
+        for question in self.exam.questions.filter(question_type=Question.QuestionType.MULTIPLE_CHOICE)[:correct]:
+            option = question.options.get(is_correct=True)
+            ExamAssignmentService.submit_answer(assignment.id, question.id, student.id, {'answer_options': [str(option.id)]})
+        if essay:
+            ExamAssignmentService.submit_answer(assignment.id, self.essay.id, student.id, {'answer_text': 'Because.'})
+        return ExamAssignmentService.submit_exam(assignment.id, student.id)
+
+    def summary(self):
+        response = self.client.get(reverse('exam-statistics', args=[self.exam.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_incremental_updates_match_a_rebuild(self):
+        for student, correct in zip(self.students[:3], (4, 2, 1)):
+            self.take(student, correct)
+        essay = self.take(self.students[3], 0, essay=True)
+        data = self.summary()
+        self.assertEqual(data['status_counts']['graded'], 3)
+        self.assertEqual(data['status_counts']['submitted'], 1)
+        self.assertEqual(data['submitted'], 4)
+        self.assertEqual(data['mean_score'], Decimal('1.75'))
+        self.assertEqual(sum(row['count'] for row in data['histogram']), 4)
+
+        response = self.client.post(reverse('examassignment-grade', args=[essay.id]), {'grades': [
+            {'response': str(essay.responses.get().id), 'manual_score': '3.5'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'graded')
+
+        incremental = self.summary()
+        call_command('rebuild_exam_statistics', stdout=StringIO())
+        rebuilt = self.summary()
+        incremental.pop('updated_at'), rebuilt.pop('updated_at')
+        self.assertEqual(incremental, rebuilt)
+        self.assertEqual(incremental['status_counts']['graded'], 4)
+        self.assertEqual(incremental['mean_score'], Decimal('2.62'))
+        # Scores are 12.5, 25, 43.75 and 50 percent; the estimate is within one bin.
+        self.assertAlmostEqual(incremental['median_percent'], 34.375, delta=100 / ExamStatistics.BINS)
+
+    def test_new_exams_start_without_a_rebuild(self):
+        self.assertEqual(self.exam.statistics.bins.count(), ExamStatistics.BINS)
+        with mock.patch.object(StatisticsService, 'rebuild') as rebuild:
+            ExamAssignmentService.start_exam(self.exam.id, self.students[0].id)
+        rebuild.assert_not_called()
+        self.assertEqual(self.summary()['status_counts']['in_progress'], 1)
+
+        # Exams older than the table are counted on their first activity.
+        ExamStatistics.objects.all().delete()
+        ExamAssignmentService.start_exam(self.exam.id, self.students[1].id)
+        self.assertEqual(self.summary()['status_counts']['in_progress'], 2)
+
+    def test_percentile_interpolates_within_a_bin(self):
+        counts = [0] * 20
+        counts[10] = 4
+        self.assertEqual(StatisticsService.percentile(counts, 50), 52.5)
+        self.assertIsNone(StatisticsService.percentile([0] * 20, 50))
+
+    def test_grading_rejects_scores_above_the_question_points(self):
+        assignment = self.take(self.students[0], 0, essay=True)
+        response = self.client.post(reverse('examassignment-grade', args=[assignment.id]), {'grades': [
+            {'response': str(assignment.responses.get().id), 'manual_score': '5'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.summary()['status_counts']['submitted'], 1)
+
+    def test_retrieve_reports_rank_from_the_score_cache(self):
+        for student, correct in zip(self.students[:3], (4, 2, 1)):
+            self.take(student, correct)
+        assignment = ExamAssignment.objects.get(student=self.students[1])
+        client = APIClient()
+        client.force_authenticate(user=self.students[1])
+        url = reverse('examassignment-detail', args=[assignment.id])
+        self.assertEqual(client.get(url).data['rank'], {'rank': 2, 'of': 3, 'percentile': 50.0})
+
+        # Later grades are inserted into the cached array instead of reloading it.
+        with mock.patch.object(score_ranks, '_load', side_effect=AssertionError('reloaded')):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.take(self.students[3], 4)
+            self.assertEqual(client.get(url).data['rank'], {'rank': 3, 'of': 4, 'percentile': 37.5})
+
+        Exam.objects.filter(pk=self.exam.pk).update(allow_review_after_submit=False)
+        self.assertIsNone(client.get(url).data['rank'])
+
+
+class ThrottlingTests(ExamFixtureMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.spec = EngineeringSpecialization.objects.create(name="Textile Engineering", code="TX")
+        self.instructor = User.objects.create_user(email='inst@test.com', password='password', role='instructor')
+        self.student = User.objects.create_user(
+            email='student@test.com', password='password', role='student', specialization=self.spec
+        )
+        self.exam = self.create_exams(self.instructor, self.spec, exams=1)[0]
+        # Two tokens per attempt with the default 30 second burst.
+        Exam.objects.filter(pk=self.exam.pk).update(answer_rate_limit=4, activity_rate_limit=2)
+        self.assignment = ExamAssignmentService.start_exam(self.exam.id, self.student.id)
+        self.question = self.exam.questions.first()
+        self.body = {'question_id': str(self.question.id), 'answer_options': [str(self.question.options.first().id)]}
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.student)
+
+    def test_submit_answer_is_rejected_before_any_query(self):
+        url = reverse('examassignment-submit-answer', args=[self.assignment.id])
+        for _ in range(2):
+            self.assertEqual(self.client.post(url, self.body, format='json').status_code, status.HTTP_200_OK)
+        with self.assertNumQueries(0):
+            response = self.client.post(url, self.body, format='json')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+
+        # The async autosave path shares the same bucket.
+        async_client = APIClient()
+        async_client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.student)}')
+        response = async_client.post(
+            reverse('examassignment-submit-answer-async', args=[self.assignment.id]), self.body, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_idempotent_retries_are_not_charged(self):
+        url = reverse('examassignment-submit-answer', args=[self.assignment.id])
+        async_client = APIClient()
+        async_client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.student)}')
+        async_url = reverse('examassignment-submit-answer-async', args=[self.assignment.id])
+        first = self.client.post(url, self.body, format='json', HTTP_IDEMPOTENCY_KEY='save-1')
+        for _ in range(3):
+            retry = self.client.post(url, self.body, format='json', HTTP_IDEMPOTENCY_KEY='save-1')
+            self.assertEqual(retry['Idempotent-Replayed'], 'true')
+            retry = async_client.post(async_url, self.body, format='json', HTTP_IDEMPOTENCY_KEY='save-1')
+            self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json(), first.json())
+        # The second token is still there for a new request.
+        self.assertEqual(self.client.post(url, self.body, format='json').status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.post(url, self.body, format='json').status_code,
+                         status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_activity_limit_is_per_exam(self):
+        url = '/api/submissions/suspicious-activity/'
+        body = {'assignment_id': str(self.assignment.id), 'activity_type': 'tab_switch', 'severity': 'low', 'metadata': {}}
+        codes = [self.client.post(url, body, format='json').status_code for _ in range(2)]
+        self.assertEqual(codes, [status.HTTP_201_CREATED, status.HTTP_429_TOO_MANY_REQUESTS])
+        self.assertEqual(SuspiciousActivity.objects.count(), 1)
+
+    def test_bucket_refills_at_its_rate(self):
+        bucket = TokenBucket('test:bucket', 60)
+        with mock.patch('submissions.throttling.time.time', return_value=1000.0):
+            waits = [bucket.consume() for _ in range(bucket.burst + 1)]
+        self.assertEqual(waits[:-1], [None] * bucket.burst)
+        self.assertAlmostEqual(waits[-1], 1.0)
+        with mock.patch('submissions.throttling.time.time', return_value=1001.0):
+            self.assertIsNone(bucket.consume())
+            self.assertIsNotNone(bucket.consume())
+        # A long idle spell refills one bucket, not more.
+        with mock.patch('submissions.throttling.time.time', return_value=5000.0):
+            waits = [bucket.consume() for _ in range(bucket.burst + 1)]
+        self.assertEqual(waits.count(None), bucket.burst)
+
+
+class IdempotencyTests(ExamFixtureMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.spec = EngineeringSpecialization.objects.create(name="Petroleum Engineering", code="PE")
+        self.instructor = User.objects.create_user(email='inst@test.com', password='password', role='instructor')
+        self.student = User.objects.create_user(
+            email='student@test.com', password='password', role='student', specialization=self.spec
+        )
+        self.exam = self.create_exams(self.instructor, self.spec, exams=1)[0]
+        self.assignment = ExamAssignmentService.start_exam(self.exam.id, self.student.id)
+        self.question = self.exam.questions.first()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.student)
+
+    def answer(self, option, key, url_name='examassignment-submit-answer', client=None):
+        body = {'question_id': str(self.question.id), 'answer_options': [str(option.id)]}
+        return (client or self.client).post(
+            reverse(url_name, args=[self.assignment.id]), body, format='json', HTTP_IDEMPOTENCY_KEY=key
+        )
+
+    def test_retried_submit_exam_is_replayed_without_queries(self):
+        url = reverse('examassignment-submit-exam', args=[self.assignment.id])
+        first = self.client.post(url, HTTP_IDEMPOTENCY_KEY='submit-1')
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        with self.assertNumQueries(0):
+            retry = self.client.post(url, HTTP_IDEMPOTENCY_KEY='submit-1')
+        self.assertEqual(retry.status_code, status.HTTP_200_OK)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json(), first.json())
+        # Without a key the retry still runs and is refused.
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_key_reused_with_another_body_is_rejected(self):
+        options = list(self.question.options.all())
+        self.assertEqual(self.answer(options[0], 'save-1').status_code, status.HTTP_200_OK)
+        self.assertEqual(self.answer(options[1], 'save-1').status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        stored = StudentResponse.objects.get(exam_assignment=self.assignment, question=self.question)
+        self.assertEqual(stored.answer_options, [str(options[0].id)])
+
+    def test_async_path_replays_the_sync_response(self):
+        option = self.question.options.first()
+        first = self.answer(option, 'save-2')
+        async_client = APIClient()
+        async_client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.student)}')
+        StudentResponse.objects.all().delete()
+        retry = self.answer(option, 'save-2', 'examassignment-submit-answer-async', async_client)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json(), first.json())
+        self.assertFalse(StudentResponse.objects.exists())
+
+
+class StartExamAdmissionTests(ExamFixtureMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.spec = EngineeringSpecialization.objects.create(name="Aerospace Engineering", code="AE")
+        self.instructor = User.objects.create_user(email='inst@test.com', password='password', role='instructor')
+        self.student = User.objects.create_user(
+            email='student@test.com', password='password', role='student', specialization=self.spec
+        )
+        self.exam, self.later = self.create_exams(self.instructor, self.spec, exams=2)
+        Exam.objects.filter(pk=self.exam.pk).update(scheduled_start=timezone.now() + timedelta(minutes=5))
+        Exam.objects.filter(pk=self.later.pk).update(scheduled_start=timezone.now() + timedelta(hours=2))
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.student)
+        self.url = '/api/submissions/exam_assignments/start_exam/'
+
+    def test_prewarmed_start_reads_no_exam_or_paper_rows(self):
+        out = StringIO()
+        call_command('prewarm_exams', minutes=10, stdout=out)
+        self.assertIn('Exam 0: pre-warmed.', out.getvalue())
+        self.assertNotIn('Exam 1', out.getvalue())
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {'exam_id': str(self.exam.id)}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        tables = ' '.join(query['sql'] for query in queries.captured_queries)
+        for table in ('"exams_exam"', '"exams_question"', '"accounts_customuser"'):
+            self.assertNotIn(f'FROM {table}', tables)
+        self.assertEqual(len(response.data['exam']['questions']), 5)
+        self.assertNotIn('is_correct', response.data['exam']['questions'][0]['options'][0])
+
+    def test_editing_the_exam_drops_the_cached_row(self):
+        ExamPrewarmService.prewarm(self.exam.id)
+        self.exam.bump_version()
+        self.assertIsNone(ExamPrewarmService.cached_exam(self.exam.id))
+
+    def test_excess_starts_wait_then_get_503(self):
+        gate = AdmissionGate(1, 0.01)
+        with mock.patch('submissions.views.start_gate', gate), gate.admit():
+            response = self.client.post(self.url, {'exam_id': str(self.exam.id)}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertFalse(ExamAssignment.objects.exists())
+
+
+class ArchiveAttemptsTests(ExamFixtureMixin, TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.enterContext(override_settings(ARCHIVE_ROOT=tmp.name))
+        self.spec = EngineeringSpecialization.objects.create(name="Agricultural Engineering", code="AG")
+        self.instructor = User.objects.create_user(email='inst@test.com', password='password', role='instructor')
+        self.students = [
+            User.objects.create_user(email=f's{i}@test.com', password='password', role='student', specialization=self.spec)
+            for i in range(4)
+        ]
+        self.exam = self.create_exams(self.instructor, self.spec, exams=1)[0]
+        Exam.objects.filter(pk=self.exam.pk).update(total_points=5, created_at=timezone.now() - timedelta(days=400))
+        self.exam.refresh_from_db()
+        for student in self.students:
+            assignment = ExamAssignmentService.start_exam(self.exam.id, student.id)
+            for question in self.exam.questions.all()[:2]:
+                option = question.options.get(is_correct=True)
+                ExamAssignmentService.submit_answer(assignment.id, question.id, student.id, {'answer_options': [str(option.id)]})
+            if student != self.students[-1]:
+                ExamAssignmentService.submit_exam(assignment.id, student.id)
+            SuspiciousActivity.objects.create(exam_assignment=assignment, student=student, activity_type='tab_switch', severity='low')
+
+    def test_graded_attempts_move_to_segments_and_read_back(self):
+        graded = ExamAssignment.objects.get(student=self.students[0])
+        out = StringIO()
+        call_command('archive_attempts', chunk_size=2, stdout=out)
+        self.assertIn('Archived 3 attempts.', out.getvalue())
+        self.assertEqual(list(ExamAssignment.objects.values_list('student', flat=True)), [self.students[-1].id])
+        self.assertEqual(StudentResponse.objects.count(), 2)
+        self.assertEqual(SuspiciousActivity.objects.count(), 1)
+
+        archived = ArchivedAssignment.objects.get(pk=graded.pk)
+        with gzip.open(os.path.join(settings.ARCHIVE_ROOT, archived.segment), 'rt') as segment:
+            self.assertEqual(len(segment.readlines()), 3)
+
+        client = APIClient()
+        client.force_authenticate(user=self.students[0])
+        response = client.get(reverse('examassignment-detail', args=[graded.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['archived'])
+        self.assertEqual(response.data['score'], '2.00')
+        self.assertEqual(len(response.data['responses']), 2)
+        self.assertEqual(response.data['rank'], {'rank': 1, 'of': 3, 'percentile': 50.0})
+        self.assertEqual(len(client.get(reverse('examassignment-archived')).data['results']), 1)
+
+        client.force_authenticate(user=self.students[1])
+        self.assertEqual(client.get(reverse('examassignment-detail', args=[graded.id])).status_code, status.HTTP_404_NOT_FOUND)
+
+        # Archived attempts still count after a statistics rebuild.
+        self.assertEqual(StatisticsService.rebuild(self.exam.id).graded_count, 3)
+
+    def test_archived_attempts_cannot_be_started_again(self):
+        call_command('archive_attempts', stdout=StringIO())
+        with self.assertRaisesMessage(ValidationError, 'Exam already submitted'):
+            ExamAssignmentService.start_exam(self.exam.id, self.students[0].id)
+        self.assertFalse(ExamAssignment.objects.filter(student=self.students[0]).exists())
+        self.assertEqual(ExamStatistics.objects.get(exam=self.exam).in_progress_count, 1)
+
+
+class CompactResponseTests(ExamFixtureMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.spec = EngineeringSpecialization.objects.create(name="Marine Engineering", code="MR")
+        self.instructor = User.objects.create_user(email='inst@test.com', password='password', role='instructor')
+        self.student = User.objects.create_user(
+            email='student@test.com', password='password', role='student', specialization=self.spec
+        )
+        self.exam = self.create_exams(self.instructor, self.spec, exams=1)[0]
+        Exam.objects.filter(pk=self.exam.pk).update(compact_responses=True)
+        self.assignment = ExamAssignmentService.start_exam(self.exam.id, self.student.id)
+        self.questions = list(self.exam.questions.all()[:2])
+
+    def answer(self, question, correct=True):
+        option = question.options.filter(is_correct=correct).first()
+        return {'answer_options': [str(option.id)]}
+
+    def test_autosave_writes_one_document_row(self):
+        client = APIClient()
+        client.force_authenticate(user=self.student)
+        url = reverse('examassignment-submit-answer', args=[self.assignment.id])
+        for question in self.questions:
+            body = {'question_id': str(question.id), **self.answer(question)}
+            with CaptureQueriesContext(connection) as queries:
+                response = client.post(url, body, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+            self.assertIsNone(response.data['id'])
+            writes = [q['sql'] for q in queries if q['sql'].startswith(('INSERT', 'UPDATE'))]
+            self.assertTrue(all('submissions_responsedocument' in sql for sql in writes))
+
+        # Answering again replaces the entry instead of adding one.
+        client.post(url, {'question_id': str(self.questions[0].id), **self.answer(self.questions[0], False)}, format='json')
+        self.assertFalse(StudentResponse.objects.exists())
+        answers = ResponseDocument.objects.get(pk=self.assignment.pk).answers
+        self.assertEqual(answers[str(self.questions[0].id)]['auto_score'], '0')
+        self.assertEqual(answers[str(self.questions[1].id)]['auto_score'], '1.00')
+
+        detail = client.get(reverse('examassignment-detail', args=[self.assignment.id]))
+        self.assertEqual(len(detail.data['responses']), 2)
+
+    def test_submit_materialises_rows_and_scores_them(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.student)}')
+        response = client.post(
+            reverse('examassignment-submit-answer-async', args=[self.assignment.id]),
+            {'question_id': str(self.questions[0].id), **self.answer(self.questions[0])}, format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ExamAssignmentService.submit_answer(
+            self.assignment.id, self.questions[1].id, self.student.id, self.answer(self.questions[1])
+        )
+        assignment = ExamAssignmentService.submit_exam(self.assignment.id, self.student.id)
+        self.assertEqual(assignment.score, 2)
+        self.assertEqual(assignment.responses.filter(is_answered=True).count(), 2)
+        self.assertFalse(ResponseDocument.objects.filter(pk=self.assignment.pk).exists())
+
+    def test_answers_autosaved_before_the_flag_was_cleared_are_scored(self):
+        for question in self.questions:
+            ExamAssignmentService.submit_answer(self.assignment.id, question.id, self.student.id, self.answer(question))
+        Exam.objects.filter(pk=self.exam.pk).update(compact_responses=False)
+        # Saved as a row after the document entry, so it wins.
+        ExamAssignmentService.submit_answer(
+            self.assignment.id, self.questions[1].id, self.student.id, self.answer(self.questions[1], False)
+        )
+        assignment = ExamAssignmentService.submit_exam(self.assignment.id, self.student.id)
+        self.assertEqual(assignment.score, 1)
+        self.assertEqual(assignment.responses.filter(is_answered=True).count(), 2)
+        self.assertFalse(ResponseDocument.objects.filter(pk=self.assignment.pk).exists())
+
+
+class CollusionDetectionTests(ExamFixtureMixin, TestCase):
+    ESSAYS = [
+        'Reinforced concrete beams fail in shear when the stirrup spacing exceeds the effective depth limit',
+        'Reinforced concrete beams fail in shear when stirrup spacing exceeds the effective depth limit',
+        'Heat exchangers transfer thermal energy between two fluids separated by a conducting wall',
+        'Pump cavitation occurs when local pressure drops below the vapour pressure of the liquid',
+    ]
+
+    def setUp(self):
+        self.spec = EngineeringSpecialization.objects.create(name="Chemical Engineering", code="CH")
+        self.instructor = User.objects.create_user(email='inst@test.com', password='password', role='instructor')
+        self.exam = self.create_exams(self.instructor, self.spec, exams=1, questions=1)[0]
+        self.question = self.exam.questions.get()
+        Question.objects.filter(pk=self.question.pk).update(question_type=Question.QuestionType.ESSAY)
+        self.assignments = []
+        for i, text in enumerate(self.ESSAYS):
+            student = User.objects.create_user(email=f's{i}@test.com', password='password', role='student')
+            assignment = ExamAssignment.objects.create(exam=self.exam, student=student, status=ExamAssignment.Status.SUBMITTED)
+            StudentResponse.objects.create(exam_assignment=assignment, question=self.question, student=student,
+                                           answer_text=text, is_answered=True)
+            self.assignments.append(assignment)
+
+    def test_copied_essays_are_flagged_once(self):
+        out = StringIO()
+        call_command('detect_collusion', stdout=out)
+        self.assertIn('flagged 1 new pairs', out.getvalue())
+        events = SuspiciousActivity.objects.filter(activity_type=SuspiciousActivity.ActivityType.POSSIBLE_COLLUSION)
+        self.assertEqual({event.exam_assignment_id for event in events}, {a.id for a in self.assignments[:2]})
+        event = events.get(exam_assignment=self.assignments[0])
+        self.assertEqual(event.metadata['peer_assignment'], str(self.assignments[1].id))
+        self.assertGreater(event.metadata['similarity'], 0.8)
+
+        call_command('detect_collusion', stdout=StringIO())
+        self.assertEqual(events.count(), 2)
+
+    def test_unrelated_essays_sharing_common_words_are_not_flagged(self):
+        essays = [
+            'The bridge is designed so that the load of the deck is carried to the piers by the steel girders',
+            'The reactor is designed so that the heat of the reaction is carried to the jacket by the coolant flow',
+            'The algorithm is designed so that the cost of the search is carried to the caller by the priority queue',
+        ]
+        StudentResponse.objects.all().delete()
+        for assignment, text in zip(self.assignments, essays):
+            StudentResponse.objects.create(exam_assignment=assignment, question=self.question,
+                                           student=assignment.student, answer_text=text, is_answered=True)
+        self.assertEqual(CollusionService.scan(self.question), 0)
+        self.assertFalse(SuspiciousActivity.objects.exists())
+
+    def test_copies_in_generated_variants_are_compared(self):
+        template = self.create_exams(self.instructor, self.spec, exams=1, questions=0)[0]
+        bank = QuestionBank.objects.create(instructor=self.instructor, specialization=self.spec, name='Essays', topic='shear')
+        bank.questions.add(self.question)
+        students = [User.objects.create_user(email=f'v{i}@test.com', password='password', role='student') for i in range(2)]
+        ExamGeneratorService.generate(template, [(('shear', ''), 1)], [bank], students, seed=1)
+        for student, text in zip(students, self.ESSAYS[:2]):
+            assignment = ExamAssignment.objects.get(student=student)
+            assignment.status = ExamAssignment.Status.SUBMITTED
+            assignment.save()
+            copy = assignment.exam.questions.get()
+            self.assertEqual(copy.source_id, self.question.id)
+            StudentResponse.objects.create(exam_assignment=assignment, question=copy, student=student,
+                                           answer_text=text, is_answered=True)
+
+        self.assertEqual(list(CollusionService.essay_questions([template.id])), [self.question])
+        # The two variant attempts match each other and both original copiers.
+        self.assertEqual(CollusionService.scan(self.question), 6)
+        flagged = SuspiciousActivity.objects.filter(activity_type=SuspiciousActivity.ActivityType.POSSIBLE_COLLUSION)
+        self.assertEqual(flagged.filter(exam_assignment__exam__parent=template).count(), 2 * 3)
+
+
+class IndexAdvisorTests(TestCase):
+    def test_normalize_groups_executions_of_one_query(self):
+        self.assertEqual(
+            querylog.normalize('SELECT * FROM "t" WHERE "t"."id" IN (%s, %s) AND "t"."n" > 10 LIMIT 21'),
+            querylog.normalize("SELECT * FROM \"t\" WHERE \"t\".\"id\" IN (%s) AND \"t\".\"n\" > 'x' LIMIT 5"),
+        )
+
+    def test_proposes_an_index_only_for_unindexed_filters(self):
+        stats = querylog.QueryStats()
+        with querylog.capture(stats):
+            list(StudentResponse.objects.filter(exam_assignment_id=uuid.uuid4(), is_answered=True).order_by())
+            list(StudentResponse.objects.filter(is_flagged=True).order_by('-updated_at'))
+            list(ExamAssignment.objects.filter(pk=uuid.uuid4(), student_id=uuid.uuid4()))
+        proposals = index_advisor.propose(stats.top(10))
+        self.assertEqual([(p.model, p.fields) for p in proposals], [(StudentResponse, ['is_flagged', '-updated_at'])])
+
+        [(migration, writer)] = index_advisor.migrations(proposals)
+        self.assertEqual(migration.app_label, 'submissions')
+        self.assertIn("fields=['is_flagged', '-updated_at']", writer.as_string())
+
+
+class SubmissionsAdminTests(ExamFixtureMixin, TestCase):
+    def setUp(self):
+        self.spec = EngineeringSpecialization.objects.create(name="Textile Engineering", code="TX")
+        self.instructor = User.objects.create_user(email='inst@test.com', password='password', role='instructor')
+        self.admin = User.objects.create_superuser(email='admin@test.com', password='password')
+        self.client.force_login(self.admin)
+        self.exam = self.create_exams(self.instructor, self.spec, exams=1)[0]
+        for i in range(3):
+            student = User.objects.create_user(email=f's{i}@test.com', password='password', role='student', specialization=self.spec)
+            assignment = ExamAssignmentService.start_exam(self.exam.id, student.id)
+            for question in self.exam.questions.all():
+                option = question.options.get(is_correct=True)
+                ExamAssignmentService.submit_answer(assignment.id, question.id, student.id, {'answer_options': [str(option.id)]})
+        self.assignment = assignment
+
+    def test_changelists_do_not_query_per_row_or_count_whole_tables(self):
+        url = reverse('admin:submissions_studentresponse_changelist')
+        with mock.patch('submissions.admin.estimated_count', return_value=5_000_000):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.context['cl'].result_count, 5_000_000)
+        self.assertFalse([q for q in queries if 'COUNT(' in q['sql'] and 'studentresponse' in q['sql']])
+        self.assertLess(len(queries), 10)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('admin:submissions_examassignment_changelist'))
+        self.assertLess(len(queries), 10)
+
+    def test_assignment_page_shows_one_read_only_page_of_responses(self):
+        url = reverse('admin:submissions_examassignment_change', args=[self.assignment.id])
+        with mock.patch('submissions.admin.StudentResponseInline.per_page', 2):
+            first = self.client.get(url)
+            last = self.client.get(url, {'responses_page': 3})
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertContains(first, '5 responses in 3 pages of 2')
+        self.assertEqual(first.context['inline_admin_formsets'][0].formset.initial_form_count(), 2)
+        self.assertEqual(last.context['inline_admin_formsets'][0].formset.initial_form_count(), 1)
+
+
+class OfflinePackageTests(ExamFixtureMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.spec = EngineeringSpecialization.objects.create(name="Geomatics Engineering", code="GE")
+        self.instructor = User.objects.create_user(email='inst@test.com', password='password', role='instructor')
+        self.student = User.objects.create_user(
+            email='student@test.com', password='password', role='student', specialization=self.spec
+        )
+        self.exam = self.create_exams(self.instructor, self.spec, exams=1)[0]
+        self.assignment = ExamAssignmentService.start_exam(self.exam.id, self.student.id)
+        self.questions = list(self.exam.questions.all())
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.student)
+
+    def answer(self, question, saved_at, correct=True):
+        option = question.options.filter(is_correct=correct).first()
+        return {'question_id': str(question.id), 'answer_options': [str(option.id)], 'saved_at': saved_at.isoformat()}
+
+    def test_upload_applies_the_latest_answer_per_question(self):
+        response = self.client.get(reverse('examassignment-download-package', args=[self.assignment.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        package = signing.loads(response.data['package'], salt=offline.SALT)
+        self.assertEqual(package['assignment'], str(self.assignment.id))
+        self.assertEqual(len(package['exam']['questions']), 5)
+        self.assertNotIn('is_correct', package['exam']['questions'][0]['options'][0])
+
+        ExamAssignmentService.submit_answer(self.assignment.id, self.questions[0].id, self.student.id,
+                                            {'answer_options': [str(self.questions[0].options.get(is_correct=True).id)]})
+        started = self.assignment.started_at
+        answers = [
+            self.answer(self.questions[0], started, correct=False),  # older than the online save
+            self.answer(self.questions[1], started + timedelta(minutes=2)),
+            self.answer(self.questions[1], started + timedelta(minutes=1), correct=False),
+            self.answer(self.questions[2], started + timedelta(minutes=61)),  # after the deadline
+            self.answer(self.questions[3], started + timedelta(minutes=3)),
+            self.answer(self.questions[3], started + timedelta(minutes=62), correct=False),  # late edit
+        ]
+        response = self.client.post(reverse('examassignment-upload-answers', args=[self.assignment.id]),
+                                    {'package': response.data['package'], 'answers': answers}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['applied'], 2)
+        self.assertEqual(response.data['stale'], [self.questions[0].id])
+        self.assertEqual([r['question_id'] for r in response.data['rejected']], [self.questions[2].id, self.questions[3].id])
+
+        scores = dict(StudentResponse.objects.values_list('question_id', 'auto_score'))
+        self.assertEqual(scores, {self.questions[0].id: 1, self.questions[1].id: 1, self.questions[3].id: 1})
+
+    def test_rejects_a_tampered_package(self):
+        token = self.client.get(reverse('examassignment-download-package', args=[self.assignment.id])).data['package']
+        response = self.client.post(
+            reverse('examassignment-upload-answers', args=[self.assignment.id]),
+            {'package': token[:-2] + 'xx', 'answers': [self.answer(self.questions[0], timezone.now())]}, format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('signature', response.data['error'])
+        self.assertFalse(StudentResponse.objects.exists())
@@ -0,0 +1,162 @@
+"""
+Token-bucket throttles for answer autosave and proctoring ingestion.
+
+Each request takes a token from a per-user bucket and a per-attempt bucket.
+The per-attempt rate comes from the exam (``Exam.answer_rate_limit`` /
+``activity_rate_limit``) and falls back to settings; a rate of 0 disables
+that bucket. A full bucket holds ``THROTTLE_BURST_SECONDS`` worth of tokens.
+
+Buckets live in the Django cache and only use ``add``/``incr``/``decr``, so
+there is no read-modify-write race. With ``CACHE_URL`` set every process
+shares one Redis cache and sees the same counts; without it each process
+keeps its own buckets and a limit applies per process. A
+bucket is an epoch timestamp and a counter of tokens taken since then; the
+tokens available are ``burst + rate * (now - epoch) - taken``. When that
+would exceed one full bucket the bucket is rebased to a fresh epoch, so idle
+time never banks more than ``burst``. Concurrent rebases can each let a
+request through, so the bound is approximate by the number of racing
+requests.
+
+Throttles run before the view touches the ORM. The per-attempt rate is cached
+per assignment after one narrow lookup on its first request.
+"""
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from rest_framework.throttling import BaseThrottle
+
+from . import idempotency
+from .models import ExamAssignment
+
+# How long an assignment's exam rates are cached; edits to an exam's limits
+# reach running attempts within this time.
+LIMITS_CACHE_SECONDS = 300
+# Idle buckets expire after this long and start again full.
+BUCKET_TTL_SECONDS = 3600
+
+KINDS = {
+    # kind: (per-attempt exam field, per-attempt setting, per-user setting)
+    'answer': ('answer_rate_limit', 'ANSWER_RATE_PER_MINUTE', 'ANSWER_USER_RATE_PER_MINUTE'),
+    'activity': ('activity_rate_limit', 'ACTIVITY_RATE_PER_MINUTE', 'ACTIVITY_USER_RATE_PER_MINUTE'),
+}
+
+
+class TokenBucket:
+    def __init__(self, key, rate_per_minute):
+        self.key = key
+        self.rate = rate_per_minute / 60
+        self.burst = max(1, round(self.rate * settings.THROTTLE_BURST_SECONDS))
+
+    def _counter_key(self, epoch):
+        return f'{self.key}:{epoch}'
+
+    def consume(self):
+        """Take a token; return None when allowed, else the seconds until one is available."""
+        now_ms = int(time.time() * 1000)
+        epoch_key = f'{self.key}:epoch'
+        if cache.add(epoch_key, now_ms, BUCKET_TTL_SECONDS):
+            epoch = now_ms
+        else:
+            epoch = cache.get(epoch_key, now_ms)
+        counter_key = self._counter_key(epoch)
+        cache.add(counter_key, 0, BUCKET_TTL_SECONDS)
+        try:
+            taken = cache.incr(counter_key)
+        except ValueError:
+            cache.set(counter_key, 1, BUCKET_TTL_SECONDS)
+            taken = 1
+
+        allowance = self.burst + (now_ms - epoch) / 1000 * self.rate
+        if taken > allowance:
+            # Rejected requests do not spend tokens.
+            self.refund(epoch)
+            return (taken - allowance) / self.rate
+        if allowance - taken > self.burst - 1:
+            cache.set(epoch_key, now_ms, BUCKET_TTL_SECONDS)
+            cache.add(self._counter_key(now_ms), 1, BUCKET_TTL_SECONDS)
+        return None
+
+    def refund(self, epoch=None):
+        if epoch is None:
+            epoch = cache.get(f'{self.key}:epoch')
+        try:
+            cache.decr(self._counter_key(epoch))
+        except ValueError:
+            pass
+
+
+def attempt_rates(assignment_id):
+    """``{kind: exam rate or None}`` for an assignment, cached."""
+    key = f'submissions:throttle:rates:{assignment_id}'
+    rates = cache.get(key)
+    if rates is None:
+        fields = [f'exam__{field}' for field, _, _ in KINDS.values()]
+        try:
+            row = ExamAssignment.objects.filter(pk=assignment_id).values_list(*fields).first()
+        except (TypeError, ValueError, ValidationError):
+            row = None
+        rates = dict(zip(KINDS, row or [None] * len(KINDS)))
+        cache.set(key, rates, LIMITS_CACHE_SECONDS)
+    return rates
+
+
+def check(kind, user_id, assignment_id):
+    """Take a ``kind`` token for the user and the attempt; None if allowed, else seconds to wait."""
+    _, attempt_setting, user_setting = KINDS[kind]
+    user_rate = getattr(settings, user_setting)
+    user_bucket = TokenBucket(f'submissions:throttle:{kind}:user:{user_id}', user_rate) if user_rate else None
+    if user_bucket is not None:
+        wait = user_bucket.consume()
+        if wait is not None:
+            return wait
+
+    if assignment_id is not None:
+        rate = attempt_rates(assignment_id)[kind]
+        if rate is None:
+            rate = getattr(settings, attempt_setting)
+        if rate:
+            wait = TokenBucket(f'submissions:throttle:{kind}:attempt:{assignment_id}', rate).consume()
+            if wait is not None:
+                if user_bucket is not None:
+                    user_bucket.refund()
+                return wait
+    return None
+
+
+def retry_after(wait):
+    return max(1, math.ceil(wait))
+
+
+class _BucketThrottle(BaseThrottle):
+    kind = None
+
+    def get_assignment_id(self, request, view):
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        key = request.headers.get(idempotency.HEADER)
+        if key and idempotency.existing(request.user.pk, idempotency.action_scope(view), key) is not None:
+            # @idempotent replays this retry without running the view.
+            return True
+        self.seconds = check(self.kind, request.user.pk, self.get_assignment_id(request, view))
+        return self.seconds is None
+
+    def wait(self):
+        return retry_after(self.seconds)
+
+
+class AnswerThrottle(_BucketThrottle):
+    kind = 'answer'
+
+    def get_assignment_id(self, request, view):
+        return view.kwargs.get('pk')
+
+
+class ActivityThrottle(_BucketThrottle):
+    kind = 'activity'
+
+    def get_assignment_id(self, request, view):
+        return request.data.get('assignment_id') if isinstance(request.data, dict) else None
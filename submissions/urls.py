@@ -1,6 +1,7 @@
 
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from . import async_views
 from .views import (
     ExamAssignmentViewSet, 
     StudentResponseViewSet, 
@@ -13,5 +14,8 @@ router.register(r'responses', StudentResponseViewSet)
 router.register(r'suspicious-activity', SuspiciousActivityViewSet)
 
 urlpatterns = [
+    path('exam_assignments/<uuid:pk>/submit_answer_async/', async_views.submit_answer,
+         name='examassignment-submit-answer-async'),
+    path('exams/<uuid:exam_id>/events/', async_views.exam_events, name='exam-events'),
     path('', include(router.urls)),
 ]
@@ -1,10 +1,22 @@
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models.functions import Coalesce
+from django.http import Http404
+from django.utils import timezone
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from .models import ExamAssignment, StudentResponse, SuspiciousActivity
-from .serializers import (ExamAssignmentSerializer, StudentResponseSerializer, 
-                          SuspiciousActivitySerializer, SuspiciousActivityCreateSerializer)
-from .services import ExamAssignmentService
+from .models import ArchivedAssignment, ExamAssignment, StudentResponse, SuspiciousActivity
+from .serializers import (AnswerUploadSerializer, ArchivedAssignmentSerializer, ArchivedAttemptSerializer,
+                          ExamAssignmentSerializer, StudentResponseSerializer, ManualGradingSerializer,
+                          StartedAssignmentSerializer, SuspiciousActivitySerializer, SuspiciousActivityCreateSerializer,
+                          exam_paper)
+from . import events, offline
+from .admission import Overloaded, start_gate
+from .services import ArchiveService, ExamAssignmentService, StatisticsService
+from .idempotency import idempotent
+from .throttling import ActivityThrottle, AnswerThrottle
 
 class ExamAssignmentViewSet(viewsets.ModelViewSet):
     queryset = ExamAssignment.objects.all()
@@ -13,26 +25,93 @@ class ExamAssignmentViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
+        queryset = ExamAssignment.objects.all()
+        if self.action in ('list', 'retrieve'):
+            # The exam-taking actions only need the assignment row itself.
+            queryset = queryset.select_related('student', 'exam__instructor', 'response_document').prefetch_related('exam__questions__options', 'responses')
         if user.role == 'instructor':
-            return ExamAssignment.objects.filter(exam__instructor=user)
+            return queryset.filter(exam__instructor=user)
         elif user.role == 'student':
-            return ExamAssignment.objects.filter(student=user)
+            return queryset.filter(student=user)
         return ExamAssignment.objects.none()
 
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            # Old results may have been moved to cold storage by archive_attempts.
+            try:
+                archived = ArchiveService.visible_to(request.user).get(pk=kwargs['pk'])
+            except (ArchivedAssignment.DoesNotExist, ValueError, DjangoValidationError):
+                raise Http404
+        archived.record = ArchiveService.load(archived)
+        return Response(ArchivedAttemptSerializer(archived, context=self.get_serializer_context()).data)
+
+    @action(detail=False, methods=['get'])
+    def archived(self, request):
+        page = self.paginate_queryset(ArchiveService.visible_to(request.user))
+        return self.get_paginated_response(ArchivedAssignmentSerializer(page, many=True).data)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['include_rank'] = self.action == 'retrieve'
+        return context
+
+    def perform_create(self, serializer):
+        assignment = serializer.save()
+        StatisticsService.record(assignment.exam, None, assignment.status, new_score=assignment.score)
+
+    @action(detail=False, methods=['get'])
+    def summary(self, request):
+        """The student's dashboard: one row per assignment from a single joined query."""
+        if request.user.role != 'student':
+            return Response({'error': 'Only students have an assignment summary.'}, status=status.HTTP_403_FORBIDDEN)
+        rows = ExamAssignment.objects.filter(student=request.user).values(
+            'id', 'status', 'score', 'started_at', 'submitted_at',
+            'exam_id', 'exam__title', 'exam__total_points', 'exam__duration_minutes',
+        )
+        now = timezone.now()
+        results = []
+        for row in rows:
+            deadline = remaining = None
+            if row['started_at'] is not None:
+                deadline = row['started_at'] + timedelta(minutes=row['exam__duration_minutes'])
+                if row['status'] == ExamAssignment.Status.IN_PROGRESS:
+                    remaining = max(0, int((deadline - now).total_seconds()))
+            results.append({
+                'id': row['id'],
+                'exam': row['exam_id'],
+                'exam_title': row['exam__title'],
+                'status': row['status'],
+                'score': row['score'],
+                'total_points': row['exam__total_points'],
+                'started_at': row['started_at'],
+                'submitted_at': row['submitted_at'],
+                'deadline': deadline,
+                'remaining_seconds': remaining,
+            })
+        return Response(results)
+
     @action(detail=False, methods=['post'], url_path='start_exam')
+    @idempotent
     def start_exam(self, request):
         exam_id = request.data.get('exam_id')
         if not exam_id:
             return Response({'error': 'exam_id is required'}, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            assignment = ExamAssignmentService.start_exam(exam_id, request.user.id)
-            serializer = self.get_serializer(assignment)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+            with start_gate.admit():
+                assignment = ExamAssignmentService.start_exam(exam_id, request.user.id, student=request.user)
+                serializer = StartedAssignmentSerializer(assignment, context=self.get_serializer_context())
+                return Response(serializer.data, status=status.HTTP_201_CREATED)
+        except Overloaded as e:
+            return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            headers={'Retry-After': str(e.retry_after)})
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-    @action(detail=True, methods=['post'], url_path='submit_answer')
+    @action(detail=True, methods=['post'], url_path='submit_answer', throttle_classes=[AnswerThrottle])
+    @idempotent
     def submit_answer(self, request, pk=None):
         assignment = self.get_object()
         question_id = request.data.get('question_id')
@@ -45,6 +124,7 @@ class ExamAssignmentViewSet(viewsets.ModelViewSet):
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
     @action(detail=True, methods=['post'], url_path='submit_exam')
+    @idempotent
     def submit_exam(self, request, pk=None):
         assignment = self.get_object()
         try:
@@ -53,6 +133,48 @@ class ExamAssignmentViewSet(viewsets.ModelViewSet):
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=True, methods=['get'], url_path='download_package')
+    def download_package(self, request, pk=None):
+        """The attempt's paper and deadline as one signed token for answering offline."""
+        assignment = self.get_object()
+        if assignment.student_id != request.user.id:
+            return Response({'error': 'Only the student taking the exam can download it.'}, status=status.HTTP_403_FORBIDDEN)
+        if assignment.status != ExamAssignment.Status.IN_PROGRESS:
+            return Response({'error': 'Start the exam before downloading its package.'}, status=status.HTTP_400_BAD_REQUEST)
+        exam = assignment.exam
+        return Response({
+            'assignment': assignment.id,
+            'deadline': offline.deadline(assignment, exam),
+            'package': offline.build(assignment, exam, exam_paper(exam, request)),
+        })
+
+    @action(detail=True, methods=['post'], url_path='upload_answers')
+    @idempotent
+    def upload_answers(self, request, pk=None):
+        assignment = self.get_object()
+        serializer = AnswerUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            result = ExamAssignmentService.upload_answers(
+                assignment.id, request.user.id, serializer.validated_data['package'], serializer.validated_data['answers']
+            )
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result)
+
+    @action(detail=True, methods=['post'])
+    def grade(self, request, pk=None):
+        assignment = self.get_object()
+        if assignment.exam.instructor_id != request.user.id:
+            return Response({'error': 'Only the exam owner can grade it.'}, status=status.HTTP_403_FORBIDDEN)
+        serializer = ManualGradingSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            assignment = ExamAssignmentService.grade_responses(assignment.id, serializer.validated_data['grades'])
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'id': assignment.id, 'status': assignment.status, 'score': assignment.score})
+
 class StudentResponseViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = StudentResponse.objects.all()
     serializer_class = StudentResponseSerializer
@@ -63,13 +185,28 @@ class StudentResponseViewSet(viewsets.ReadOnlyModelViewSet):
         return StudentResponse.objects.filter(student=user)
 
 class SuspiciousActivityViewSet(viewsets.ModelViewSet):
-    queryset = SuspiciousActivity.objects.all()
+    queryset = SuspiciousActivity.objects.select_related(
+        'exam_assignment__student', 'exam_assignment__exam__instructor'
+    ).prefetch_related('exam_assignment__exam__questions__options', 'exam_assignment__responses')
     permission_classes = [permissions.IsAuthenticated]
 
+    def get_throttles(self):
+        if self.action == 'create':
+            return [ActivityThrottle()]
+        return super().get_throttles()
+
     def get_serializer_class(self):
         if self.action == 'create':
             return SuspiciousActivityCreateSerializer
         return SuspiciousActivitySerializer
 
     def perform_create(self, serializer):
-        serializer.save(student=self.request.user)
+        activity = serializer.save(student=self.request.user)
+        # The exam id is only needed to reach watchers, and most processes have none.
+        if not events.hub.has_subscribers():
+            return
+        exam_id = ExamAssignment.objects.filter(pk=activity.exam_assignment_id).values_list(
+            Coalesce('exam__parent_id', 'exam_id'), flat=True
+        ).first()
+        if events.hub.has_subscribers(exam_id):
+            events.publish_activity(activity, exam_id)